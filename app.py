@@ -1,13 +1,40 @@
-from flask import Flask, render_template, send_from_directory, jsonify, request, session, redirect, url_for, Response
+from flask import Flask, render_template, send_from_directory, jsonify, request, session, redirect, url_for, Response, g, make_response, send_file, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from markupsafe import Markup
 from flask_cors import CORS
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, TimestampSigner, BadSignature
+from werkzeug.datastructures import CallbackDict
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import sys
 import time
 from dotenv import load_dotenv
+from build_assets import ASSET_BUNDLES, DIST_DIR, MANIFEST_PATH
 import traceback
 import re
 import datetime
 import json
+import sqlite3
+import threading
+import math
+import heapq
+import bisect
+import random
+import secrets
+import gzip
+import hashlib
+import mimetypes
+import logging
+import queue
+import copy
+import atexit
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict
 
 # Load environment variables
 load_dotenv()
@@ -22,10 +49,158 @@ CORS(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///disastrous.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///disastrous.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['A4F_API_KEY'] = os.getenv('A4F_API_KEY', 'your-a4f-api-key')
+# Any OpenAI-compatible endpoint; benchmarks/llm_stub.py serves one locally for load tests
+app.config['A4F_BASE_URL'] = os.getenv('A4F_BASE_URL', 'https://api.a4f.co/v1')
 app.config['MAPS_API_KEY'] = os.getenv('MAPS_API_KEY', 'your-maps-api-key')
+APP_VERSION = '1.0.0'
+# Changes on every deploy so version-based ETags never outlive the code that produced them
+BUILD_ID = f"{APP_VERSION}-{int(os.path.getmtime(os.path.abspath(__file__)))}"
+# Small SQLite file for runtime counters that must be shared by all gunicorn workers
+app.config['RUNTIME_DB_PATH'] = os.getenv('RUNTIME_DB_PATH', os.path.join(app.instance_path, 'runtime.db'))
+# Token buckets per route: (burst capacity, tokens refilled per second). Anonymous callers are
+# keyed by IP, and a whole NAT or shelter network can share one, so SOS only stops floods.
+app.config['RATE_LIMITS'] = {
+    'sos': (120, 1.0),
+    'chat': (20, 20 / 60),
+    'translate': (30, 30 / 60),
+    'upload': (20, 20 / 600),
+    'report': (10, 10 / 600)
+}
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+# Reverse proxies in front of the app; their X-Forwarded-For gives the real client address
+app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                            x_proto=app.config['TRUSTED_PROXY_COUNT'])
+# Metrics are buffered per worker and flushed into the runtime DB, where /metrics sums them.
+# Scrapers send 'Authorization: Bearer <METRICS_TOKEN>'; admins can also view it when signed in.
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+app.config['METRICS_FLUSH_SECONDS'] = 5.0
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+# Requests slower than SLOW_REQUEST_SECONDS are kept (route, SQL, LLM calls) for admins to inspect;
+# the SLOW_REQUEST_BUFFER slowest are retained.
+# Single requests can be profiled with a signed X-Profile-Request header or an admin toggle.
+app.config['SLOW_REQUEST_SECONDS'] = float(os.getenv('SLOW_REQUEST_SECONDS', '1.0'))
+app.config['SLOW_REQUEST_BUFFER'] = 100
+app.config['SLOW_REQUEST_MAX_QUERIES'] = 50
+app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+app.config['PROFILE_INTERVAL_SECONDS'] = 0.002
+app.config['PROFILE_TOKEN_MAX_AGE'] = 3600
+app.config['PROFILE_HISTORY'] = 50
+# SQL statements allowed per request, by endpoint; other endpoints get QUERY_BUDGET_DEFAULT.
+# Over-budget requests are logged and counted in /metrics; QUERY_BUDGET_STRICT (on by default with
+# FLASK_ENV=development) makes them raise QueryBudgetExceeded. tests/test_query_budgets.py checks them all.
+app.config['QUERY_BUDGET_DEFAULT'] = 20
+app.config['QUERY_BUDGETS'] = {
+    'handle_sos': 5,
+    'rescue': 8,  # one probe per dispatch tier when nearby responders are full
+    'update_sos_status': 8,
+    'sos_requests': 1,
+    'rescue_profile': 1,
+    'rescue_assignments': 1,
+    'sos_stats': 1,
+    'alerts': 3,  # plus the next-expiry probe after each alerts write
+    'get_emergency_alerts': 2,
+    'sos_updates': 1,  # the replay at connect, counted inside the stream
+    'admin_rescue_management': 2,
+    'get_rescue_personnel': 2,
+    'get_resource_summary': 2,
+    'admin_forecasts': 4,
+    'get_forecasts': 4,
+    'resources': 6
+}
+app.config['QUERY_BUDGET_STRICT'] = os.getenv(
+    'QUERY_BUDGET_STRICT', 'true' if os.getenv('FLASK_ENV') == 'development' else 'false').lower() == 'true'
+# JSON logs to stdout. LOG_LEVELS overrides single loggers ("disastrous.sse=DEBUG,disastrous.llm=WARNING");
+# LOG_SAMPLE_RATES keeps only that fraction of a logger's DEBUG records ("disastrous.sse=0.05").
+app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+app.config['LOG_LEVELS'] = dict(item.split('=', 1) for item in os.getenv('LOG_LEVELS', '').split(',') if '=' in item)
+app.config['LOG_SAMPLE_RATES'] = {
+    'disastrous.sse': 0.1,
+    **{name: float(rate) for name, rate in
+       (item.split('=', 1) for item in os.getenv('LOG_SAMPLE_RATES', '').split(',') if '=' in item)}
+}
+app.config['LOG_QUEUE_SIZE'] = 10000
+# Admission control: endpoint -> route class. Unlisted endpoints are 'normal';
+# None means the endpoint is never tracked (long-lived streams).
+app.config['ROUTE_CLASSES'] = {
+    'handle_sos': 'critical',
+    'sos_requests': 'critical',
+    'update_sos_status': 'critical',
+    'delete_sos_request': 'critical',
+    'health': 'critical',
+    'prometheus_metrics': 'critical',
+    'translate': 'best_effort',
+    'chat': 'best_effort',
+    'sos_updates': None,
+    'static': None,
+    'assets': None,
+    'data_pack_file': None,
+    'media_file': None,
+    'media_derivative': None
+}
+# Grid cell size for the alert geo-fence index; fences are filed under every cell they overlap
+app.config['ALERT_GRID_DEGREES'] = 0.5
+# How often each worker marks alerts past expires_at as expired, giving them a new change seq
+app.config['ALERT_EXPIRY_SWEEP_SECONDS'] = int(os.getenv('ALERT_EXPIRY_SWEEP_SECONDS', '30'))
+# Forecast feeds: shared-secret bearer token for machine ingestion, batch sizes and admin page size
+app.config['FORECAST_INGEST_TOKEN'] = os.getenv('FORECAST_INGEST_TOKEN', '')
+app.config['FORECAST_INGEST_BATCH_SIZE'] = 500
+app.config['FORECAST_INGEST_MAX_ITEMS'] = 10000
+app.config['FORECAST_PAGE_SIZE'] = 50
+# Crowdsourced report clustering: neighbours are same-type reports within this distance and time
+app.config['REPORT_CLUSTER_RADIUS_KM'] = 5.0
+app.config['REPORT_CLUSTER_WINDOW_HOURS'] = 6
+app.config['REPORT_CLUSTER_MIN_REPORTS'] = 3
+# SOS chart rollups: how long each granularity is kept (None = forever) and the widest window served
+app.config['SOS_ROLLUP_RETENTION_DAYS'] = {'minute': 2, 'hour': 90, 'day': None}
+app.config['SOS_ROLLUP_MAX_BUCKETS'] = 1440
+# Rescue dispatch: a responder at this many open requests is skipped for the next region tier
+app.config['RESCUE_MAX_OPEN_PER_RESPONDER'] = 10
+# Report media: resumable chunked uploads stored under MEDIA_DIR, limits per media type
+app.config['MEDIA_DIR'] = os.path.join(app.instance_path, 'media')
+app.config['MEDIA_UPLOAD_LIMITS'] = {
+    'photo': 5 * 1024 * 1024,
+    'video': 50 * 1024 * 1024,
+    'audio': 10 * 1024 * 1024
+}
+app.config['MEDIA_CHUNK_SIZE'] = 256 * 1024  # suggested to clients; small enough to finish on 2G
+app.config['MEDIA_MAX_CHUNK_BYTES'] = 8 * 1024 * 1024
+app.config['MEDIA_UPLOAD_EXPIRY_HOURS'] = 24
+# Media worker (media_worker.py): retries with exponential backoff, a lease after which a
+# crashed worker's job runs again, and the queue depth at which new uploads are refused
+app.config['MEDIA_JOB_MAX_ATTEMPTS'] = 5
+app.config['MEDIA_JOB_RETRY_SECONDS'] = 30
+app.config['MEDIA_JOB_LEASE_SECONDS'] = 600
+app.config['MEDIA_JOB_QUEUE_LIMIT'] = 500
+app.config['MEDIA_THUMBNAIL_SIZE'] = 320
+app.config['MEDIA_LOW_VIDEO_HEIGHT'] = 360
+app.config['MEDIA_LOW_AUDIO_BITRATE'] = '48k'
+# Let the front server (nginx X-Accel-Redirect / Apache X-Sendfile) send media files
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+# Offline district data packs; earlier versions are kept to answer delta requests
+app.config['DATA_PACK_DIR'] = os.path.join(app.instance_path, 'data_packs')
+app.config['DATA_PACK_HISTORY'] = 5
+# Rendered page cache (per worker, LRU bounded by entry count and total bytes)
+app.config['PAGE_CACHE_MAX_ENTRIES'] = 256
+app.config['PAGE_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+# Pre-serialized facility fragments (per worker, same LRU bounds)
+app.config['FACILITY_FRAGMENT_CACHE_MAX_ENTRIES'] = 512
+app.config['FACILITY_FRAGMENT_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+# Response compression and its per-worker cache of compressed bodies
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['GZIP_LEVEL'] = 6
+app.config['BROTLI_QUALITY'] = 5
+app.config['COMPRESSED_CACHE_MAX_ENTRIES'] = 512
+app.config['COMPRESSED_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+# Per-worker shedding thresholds; critical traffic is always admitted
+app.config['ADMISSION_LIMITS'] = {
+    'normal': {'max_in_flight': 32, 'max_queue_seconds': 5.0},
+    'best_effort': {'max_in_flight': 4, 'max_total_in_flight': 8, 'max_queue_seconds': 1.0}
+}
 
 db = SQLAlchemy(app)
 
@@ -38,10 +213,29 @@ class SOSRequest(db.Model):
     message = db.Column(db.Text, nullable=False)
     location = db.Column(db.String(500))
     status = db.Column(db.String(20), default='pending')  # pending, handled, closed
+    region = db.Column(db.String(100))  # rollup region, derived once from location on ingest
+    is_emergency = db.Column(db.Boolean, default=True)
     
     def __repr__(self):
         return f'<SOSRequest {self.id}>'
 
+class SOSRollupMixin:
+    """SOS requests created in one time bucket, by current status, region and emergency flag."""
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    region = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    is_emergency = db.Column(db.Boolean, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class SOSRollupMinute(SOSRollupMixin, db.Model):
+    __tablename__ = 'sos_rollup_minute'
+
+class SOSRollupHour(SOSRollupMixin, db.Model):
+    __tablename__ = 'sos_rollup_hour'
+
+class SOSRollupDay(SOSRollupMixin, db.Model):
+    __tablename__ = 'sos_rollup_day'
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -56,20 +250,457 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.email}>'
 
+RESOURCE_CATEGORIES = ('hospitals', 'ambulances', 'fire_stations', 'police_stations')
+
+class ResourceCount(db.Model):
+    """Resources managed by one rescue user, one row per category."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    category = db.Column(db.String(20), primary_key=True)  # see RESOURCE_CATEGORIES
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ResourceCount {self.user_id} {self.category}={self.count}>'
+
+class ResourceSummary(db.Model):
+    """Materialized totals per region and category, adjusted by the delta of every ResourceCount write.
+
+    Region keys are the normalized state/city used by the dispatch index ('' when unknown).
+    """
+    state = db.Column(db.String(100), primary_key=True)
+    city = db.Column(db.String(100), primary_key=True)
+    category = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResourceSummary {self.state}/{self.city} {self.category}={self.total}>'
+
+class RescueRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    emergency_type = db.Column(db.String(20), nullable=False)  # flood, fire, collapse, landslide, medical, other
+    victim_count = db.Column(db.Integer)
+    address = db.Column(db.String(500))
+    city = db.Column(db.String(100))
+    state = db.Column(db.String(100))
+    pincode = db.Column(db.String(6))
+    contact = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, assigned, resolved, cancelled
+    assigned_to = db.Column(db.Integer, db.ForeignKey('user.id'))
+    match_level = db.Column(db.String(20))  # region tier the responder was found in, see DISPATCH_TIERS
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    assigned_at = db.Column(db.DateTime)
+    closed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_rescue_request_assigned_to_status', 'assigned_to', 'status'),
+        db.Index('ix_rescue_request_status_created_at', 'status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<RescueRequest {self.id} {self.status}>'
+
+class ResponderLoad(db.Model):
+    """Dispatch index: one row per rescue user with normalized region keys and open workload.
+
+    Each index leads with a region key and then open_count, so the least-loaded
+    responder in a region is a single index seek however many rows there are.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    pincode = db.Column(db.String(6))
+    pincode_area = db.Column(db.String(3))  # first three PIN digits: the postal sorting district
+    city = db.Column(db.String(100))
+    state = db.Column(db.String(100))
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_responder_load_pincode', 'pincode', 'open_count', 'user_id'),
+        db.Index('ix_responder_load_pincode_area', 'pincode_area', 'open_count', 'user_id'),
+        db.Index('ix_responder_load_city', 'city', 'open_count', 'user_id'),
+        db.Index('ix_responder_load_state', 'state', 'open_count', 'user_id'),
+        db.Index('ix_responder_load_open_count', 'open_count', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<ResponderLoad {self.user_id} {self.open_count}>'
+
+class FacilityType(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)  # hospital, ambulance, fire, police
+    group_key = db.Column(db.String(40), nullable=False)  # key used in resources_data, e.g. fire_stations
+    label = db.Column(db.String(80), nullable=False)
+    icon = db.Column(db.String(40), nullable=False)
+
+    def __repr__(self):
+        return f'<FacilityType {self.code}>'
+
+class Facility(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    type_id = db.Column(db.Integer, db.ForeignKey('facility_type.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow)
+
+    facility_type = db.relationship('FacilityType', lazy='joined')
+    location = db.relationship('FacilityLocation', uselist=False, cascade='all, delete-orphan',
+                               back_populates='facility')
+    contacts = db.relationship('FacilityContact', cascade='all, delete-orphan',
+                               order_by='FacilityContact.id')
+    features = db.relationship('FacilityFeature', cascade='all, delete-orphan',
+                               order_by='FacilityFeature.id')
+
+    def __repr__(self):
+        return f'<Facility {self.name}>'
+
+class FacilityLocation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), unique=True, nullable=False)
+    address = db.Column(db.String(500))
+    district = db.Column(db.String(100), nullable=False, index=True)
+    state = db.Column(db.String(100))
+    pincode = db.Column(db.String(6), index=True)
+    latitude = db.Column(db.Float)  # optional; geocoded from pincode/place/district when missing
+    longitude = db.Column(db.Float)
+
+    facility = db.relationship('Facility', back_populates='location')
+
+class FacilityContact(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # phone, emergency, helpline, email, website
+    value = db.Column(db.String(200), nullable=False)
+
+class FacilityFeature(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey('facility.id'), nullable=False, index=True)
+    icon = db.Column(db.String(40))
+    text = db.Column(db.String(200), nullable=False)
+
+ALERT_SEVERITIES = ('critical', 'high', 'medium', 'low')
+ALERT_NEXT_SEQ = text('(SELECT COALESCE(MAX(seq), 0) + 1 FROM alert)')
+
+class Alert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    alert_type = db.Column(db.String(40), nullable=False)  # e.g. CYCLONE WARNING, FLOOD WARNING
+    severity = db.Column(db.String(20), nullable=False)  # one of ALERT_SEVERITIES
+    title = db.Column(db.String(200), nullable=False)
+    location = db.Column(db.String(200), nullable=False)
+    impact = db.Column(db.Text)
+    action = db.Column(db.Text)
+    # Fence centre; alerts without a centre or radius are broadcast to everyone
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    radius_km = db.Column(db.Float)
+    status = db.Column(db.String(20), nullable=False, default='active')  # active, cancelled, expired
+    issued_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow)
+    # Change sequence that delta queries page through. It is assigned inside the write, and
+    # SQLite has one writer at a time, so it grows in commit order; an app-side timestamp
+    # can commit behind a cursor that was already handed out.
+    seq = db.Column(db.Integer, default=ALERT_NEXT_SEQ, onupdate=ALERT_NEXT_SEQ)
+
+    __table_args__ = (
+        db.Index('ix_alert_seq_id', 'seq', 'id'),
+        db.Index('ix_alert_status_severity_issued_at', 'status', 'severity', 'issued_at'),
+    )
+
+    def __repr__(self):
+        return f'<Alert {self.id} {self.alert_type}>'
+
+# Forecast feeds; trusted third-party forecasts skip the review queue
+FORECAST_SOURCES = {
+    'third_party': {'label': 'Trusted Sources', 'default_trust': 95, 'auto_approve': True},
+    'ai_based': {'label': 'AI-based Forecasts', 'default_trust': 87, 'auto_approve': False},
+    'crowdsourced': {'label': 'Crowdsourced Forecasts', 'default_trust': 82, 'auto_approve': False}
+}
+FORECAST_SEVERITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3}
+
+class Forecast(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    source_type = db.Column(db.String(20), nullable=False)  # key of FORECAST_SOURCES
+    source = db.Column(db.String(120), nullable=False)  # feed name, e.g. IMD, DisasterPredict AI
+    external_id = db.Column(db.String(120), nullable=False)  # feed's own id; re-sent items are ignored
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    region = db.Column(db.String(120))
+    severity = db.Column(db.String(10), nullable=False, default='medium')  # low, medium, high
+    confidence = db.Column(db.Float)  # 0-100 as reported by the feed
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, approved, rejected
+    issued_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    reviewed_at = db.Column(db.DateTime)
+    reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    __table_args__ = (
+        db.UniqueConstraint('source', 'external_id', name='uq_forecast_source_external_id'),
+        db.Index('ix_forecast_source_type_status_issued_at', 'source_type', 'status', 'issued_at'),
+    )
+
+    def __repr__(self):
+        return f'<Forecast {self.id} {self.source_type}>'
+
+class ForecastSourceStats(db.Model):
+    """Running per-feed aggregates, updated in the same transaction as every ingest and review."""
+    __tablename__ = 'forecast_feed_stats'
+    source_type = db.Column(db.String(20), primary_key=True)
+    source = db.Column(db.String(120), primary_key=True)  # the feed, as stored on Forecast.source
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    # Reviewer decisions only; auto-approved feeds do not count
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    # Forecasts the source currently lists: pending ones, or every forecast for auto-approved feeds
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    open_severity_sum = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def trust_score(self):
+        # Review outcomes blended with the source's default score, weighted as 10 prior reviews
+        prior = 10
+        default = FORECAST_SOURCES[self.source_type]['default_trust']
+        reviewed = self.approved + self.rejected
+        return round((self.approved * 100 + prior * default) / (reviewed + prior))
+
+    @property
+    def criticality(self):
+        if not self.open_count:
+            return 'low'
+        mean = self.open_severity_sum / self.open_count
+        return 'high' if mean >= 2.5 else 'medium' if mean >= 1.5 else 'low'
+
+class Report(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    title = db.Column(db.String(100), nullable=False)
+    report_type = db.Column(db.String(20), nullable=False)  # flood, earthquake, hurricane, fire, ...
+    severity = db.Column(db.String(10), nullable=False)  # low, medium, high, critical
+    description = db.Column(db.Text, nullable=False)
+    location = db.Column(db.String(200), nullable=False)
+    latitude = db.Column(db.Float)  # from the browser, or geocoded from location
+    longitude = db.Column(db.Float)
+    grid_cell = db.Column(db.String(24))  # clustering bucket, 'row:col'; None when not geocoded
+    cluster_id = db.Column(db.Integer, db.ForeignKey('report_cluster.id'), index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_report_type_grid_cell_created_at', 'report_type', 'grid_cell', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<Report {self.id} {self.report_type}>'
+
+class ReportCluster(db.Model):
+    """Nearby reports of one disaster type; running sums give the centroid and mean severity."""
+    id = db.Column(db.Integer, primary_key=True)
+    report_type = db.Column(db.String(20), nullable=False)
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+    latitude_sum = db.Column(db.Float, nullable=False, default=0.0)
+    longitude_sum = db.Column(db.Float, nullable=False, default=0.0)
+    severity_sum = db.Column(db.Integer, nullable=False, default=0)
+    region = db.Column(db.String(200))
+    first_report_at = db.Column(db.DateTime, nullable=False)
+    last_report_at = db.Column(db.DateTime, nullable=False)
+    forecast_id = db.Column(db.Integer, db.ForeignKey('forecast.id'))
+
+class MediaUpload(db.Model):
+    """A resumable upload; bytes land in a partial file, then a blob named by their SHA-256."""
+    id = db.Column(db.Integer, primary_key=True)
+    upload_key = db.Column(db.String(32), unique=True, nullable=False)  # unguessable id used in URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), index=True)
+    filename = db.Column(db.String(200), nullable=False)
+    media_type = db.Column(db.String(10), nullable=False)  # photo, video, audio
+    mime_type = db.Column(db.String(100), nullable=False)
+    total_size = db.Column(db.Integer, nullable=False)
+    received_size = db.Column(db.Integer, nullable=False, default=0)  # committed offset
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, complete
+    sha256 = db.Column(db.String(64), index=True)  # set on completion; identical files share a blob
+    latitude = db.Column(db.Float)  # from photo EXIF, filled in by the media worker
+    longitude = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<MediaUpload {self.upload_key} {self.status}>'
+
+class MediaJob(db.Model):
+    """Background processing of one blob, run by media_worker.py; keyed by content, not upload."""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    media_type = db.Column(db.String(10), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # thumbnail, exif_gps, transcode
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)  # lease start; expired leases are requeued
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('sha256', 'kind', name='uq_media_job_sha256_kind'),
+        db.Index('ix_media_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<MediaJob {self.id} {self.kind} {self.status}>'
+
+class MediaDerivative(db.Model):
+    """A precomputed rendition of a blob (thumbnail, low-bandwidth copy) written by the worker."""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    variant = db.Column(db.String(20), nullable=False)  # thumbnail, low
+    filename = db.Column(db.String(100), nullable=False)  # under MEDIA_DIR/derived/
+    mime_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('sha256', 'variant', name='uq_media_derivative_sha256_variant'),
+    )
+
+    def __repr__(self):
+        return f'<MediaDerivative {self.sha256[:12]} {self.variant}>'
+
+# Brotli is optional; responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# fcntl is POSIX-only; without it concurrent chunks are caught by the offset check alone
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ✅ NEW: Structured JSON logging, written to stdout by a background thread
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger and message, then any extra fields."""
+
+    RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.UTC).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in self.RESERVED)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class DebugSampler(logging.Filter):
+    """Keep only a fraction of DEBUG records from loggers listed in LOG_SAMPLE_RATES."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None:
+            return True
+        # Lets whoever reads the logs scale counts back up
+        record.sample_rate = rate
+        return random.random() < rate
+
+class AsyncLogHandler(QueueHandler):
+    """Queue records for a writer thread instead of writing to stdout on the caller's thread.
+
+    A full queue drops the record and counts it rather than blocking the request. The writer
+    thread is started on first use in each process, so forked gunicorn workers get their own.
+    """
+
+    def __init__(self, target, queue_size):
+        super().__init__(None)
+        self.target = target
+        self.queue_size = queue_size
+        self.writer = None
+        self.writer_pid = None
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve everything that depends on the calling thread before the record is handed over
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        if has_request_context():
+            record.method, record.path, record.endpoint = request.method, request.path, request.endpoint
+        return record
+
+    def enqueue(self, record):
+        # emit() holds the handler lock, so only one thread can start the writer
+        if self.writer_pid != os.getpid():
+            self.queue = queue.Queue(self.queue_size)
+            self.writer = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.writer.start()
+            self.writer_pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write out whatever is still queued; registered to run at exit."""
+        if self.writer is not None and self.writer_pid == os.getpid():
+            self.writer.stop()
+            self.writer_pid = None
+
+    def stats(self):
+        return {'queued': self.queue.qsize() if self.writer_pid == os.getpid() else 0, 'dropped': self.dropped}
+
+def configure_logging():
+    """Send the 'disastrous' logger tree through one async JSON handler with per-logger levels."""
+    base = logging.getLogger('disastrous')
+    base.setLevel(app.config['LOG_LEVEL'].upper())
+    base.propagate = False
+    for name, level in app.config['LOG_LEVELS'].items():
+        logging.getLogger(name).setLevel(level.upper())
+    for existing in [h for h in base.handlers if isinstance(h, AsyncLogHandler)]:
+        existing.stop()
+        base.removeHandler(existing)
+
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonLogFormatter())
+    handler = AsyncLogHandler(target, app.config['LOG_QUEUE_SIZE'])
+    handler.addFilter(DebugSampler(app.config['LOG_SAMPLE_RATES']))
+    base.addHandler(handler)
+    atexit.register(handler.stop)
+    return handler
+
+log_handler = configure_logging()
+log = logging.getLogger('disastrous')
+llm_log = logging.getLogger('disastrous.llm')
+sse_log = logging.getLogger('disastrous.sse')
+sos_log = logging.getLogger('disastrous.sos')
+media_log = logging.getLogger('disastrous.media')
+runtime_log = logging.getLogger('disastrous.runtime')
+sql_log = logging.getLogger('disastrous.sql')
+
 # Initialize A4F OpenAI Client
 openai_client = None
 try:
     from openai import OpenAI
     if app.config['A4F_API_KEY'] != 'your-a4f-api-key':
         openai_client = OpenAI(
-            base_url="https://api.a4f.co/v1",
+            base_url=app.config['A4F_BASE_URL'],
             api_key=app.config['A4F_API_KEY']
         )
-        print("A4F OpenAI client initialized successfully")
+        llm_log.info("A4F OpenAI client initialized")
     else:
-        print("A4F API key not configured")
+        llm_log.warning("A4F API key not configured")
 except Exception as e:
-    print(f"Failed to initialize A4F client: {e}")
+    llm_log.exception("Failed to initialize A4F client")
 
 # ✅ NEW: Unicode text sanitization to prevent encoding errors
 def sanitize_unicode_text(text):
@@ -91,23 +722,111 @@ def sanitize_unicode_text(text):
         return text
         
     except Exception as e:
-        print(f"[ERROR] Text sanitization error: {e}")
+        log.exception("Text sanitization error")
         # Fallback: return ASCII-only version
         return text.encode('ascii', 'ignore').decode('ascii')
 
-# ✅ FINAL FIX: Initialize and manage user preferences in the session reliably
-@app.before_request
-def initialize_session():
-    """Initialize user preferences in the session if not already present."""
-    if 'user_preferences' not in session:
-        session['user_preferences'] = {
-            'language': 'en',
-            'font_size': 16,
-            'high_contrast': False,
-            'dark_mode': False,
-            'notifications': True,
-            'location_services': True
-        }
+# ✅ NEW: Lean server-side sessions; the cookie only carries a signed opaque id
+DEFAULT_USER_PREFERENCES = {
+    'language': 'en',
+    'font_size': 16,
+    'high_contrast': False,
+    'dark_mode': False,
+    'notifications': True,
+    'location_services': True
+}
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its store id and whether it was changed."""
+
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Issue a fresh id (e.g. on login) so a pre-login id cannot be reused."""
+        self.previous_sid, self.sid = self.sid, None
+        self.modified = True
+
+class SQLiteSessionInterface(SessionInterface):
+    """Stores session data in the shared runtime SQLite file.
+
+    Rows and cookies are written only when the session actually changes, so a
+    plain page view costs one indexed read and sends no Set-Cookie header.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSideSession()
+        try:
+            sid = self._signer(app).unsign(cookie).decode('ascii')
+        except BadSignature:
+            return ServerSideSession()
+
+        row = get_runtime_db().execute(
+            'SELECT data FROM sessions WHERE sid = ? AND expires_at > ?', (sid, time.time())
+        ).fetchone()
+        if row is None:
+            return ServerSideSession()
+        return ServerSideSession(self.serializer.loads(row[0]), sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.sid or session.previous_sid:
+            response.vary.add('Cookie')
+        if not session.modified:
+            return
+
+        conn = get_runtime_db()
+        if session.previous_sid:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (session.previous_sid,))
+        if not session:
+            if session.sid:
+                conn.execute('DELETE FROM sessions WHERE sid = ?', (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        is_new_id = session.sid is None
+        if is_new_id:
+            session.sid = secrets.token_urlsafe(24)
+        expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+        conn.execute(
+            'INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at',
+            (session.sid, self.serializer.dumps(dict(session)), expires_at)
+        )
+        if random.random() < 0.01:
+            conn.execute('DELETE FROM sessions WHERE expires_at < ?', (time.time(),))
+
+        if is_new_id or session.permanent:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+app.session_interface = SQLiteSessionInterface()
+
+def get_user_preferences():
+    """Stored preferences merged over the defaults; never writes to the session."""
+    return {**DEFAULT_USER_PREFERENCES, **session.get('user_preferences', {})}
 
 from functools import wraps
 
@@ -121,28 +840,909 @@ def login_required(role="any"):
                 # Instead of redirecting, maybe show an unauthorized page or flash a message
                 return redirect(url_for('authority_login', error="unauthorized", _external=True))
             return f(*args, **kwargs)
+        # Read by the service worker route: signed-in pages are never served stale
+        decorated_function.login_role = role
+        return decorated_function
+    return decorator
+
+# ✅ NEW: Runtime state shared across gunicorn workers (SQLite stand-in for shared memory)
+RUNTIME_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated_at ON rate_limit_buckets (updated_at);
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metric_totals (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, le)
+);
+CREATE TABLE IF NOT EXISTS profile_targets (
+    endpoint TEXT PRIMARY KEY,
+    remaining INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slow_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    detail TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metric_gauges (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    value REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (name, labels, worker)
+);
+"""
+
+_runtime_local = threading.local()
+
+def get_runtime_db():
+    """Return this thread's connection to the runtime SQLite file shared by all workers.
+
+    Connections are opened lazily per thread and re-opened after a fork so gunicorn
+    workers never share a handle inherited from the master process.
+    """
+    conn = getattr(_runtime_local, 'conn', None)
+    if conn is None or getattr(_runtime_local, 'pid', None) != os.getpid():
+        db_path = app.config['RUNTIME_DB_PATH']
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(RUNTIME_DB_SCHEMA)
+        _runtime_local.conn = conn
+        _runtime_local.pid = os.getpid()
+    return conn
+
+def get_data_version(name):
+    """Current version of a named dataset; changes whenever any worker writes to it."""
+    if name == 'alerts':
+        # Alerts also change when they reach expires_at, which no write announces
+        return alerts_version_key()
+    return read_data_version(name)
+
+def read_data_version(name):
+    row = get_runtime_db().execute('SELECT version FROM data_versions WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else 0
+
+def bump_data_version(name):
+    """Mark a dataset as changed so every worker drops its cached copy."""
+    # Microsecond timestamps stay unique even if the runtime file is recreated
+    version = time.time_ns() // 1000
+    get_runtime_db().execute(
+        'INSERT INTO data_versions (name, version) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET version = excluded.version',
+        (name, version)
+    )
+    return version
+
+# ✅ NEW: Prometheus metrics, buffered per worker and summed across workers in the runtime DB
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+DB_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5)
+QUERY_COUNT_BUCKETS = (0.0, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+
+# name -> (type, help text, histogram bucket bounds)
+METRIC_DEFINITIONS = {
+    'http_request_duration_seconds': ('histogram', 'Time to handle an HTTP request, by route, method and status.',
+                                      LATENCY_BUCKETS),
+    'llm_request_duration_seconds': ('histogram', 'Time per LLM API call, by operation and outcome.',
+                                     LLM_LATENCY_BUCKETS),
+    'llm_retries_total': ('counter', 'LLM calls repeated after a failed attempt.', None),
+    'db_query_duration_seconds': ('histogram', 'Time per SQL statement on the app database.', DB_LATENCY_BUCKETS),
+    'db_queries_per_request': ('histogram', 'SQL statements run by one HTTP request, by route.', QUERY_COUNT_BUCKETS),
+    'db_query_budget_exceeded_total': ('counter', 'Requests that ran more SQL statements than their route budget.',
+                                       None),
+    'sos_requests_total': ('counter', 'SOS requests stored, by emergency flag.', None),
+    'sse_open_connections': ('gauge', 'Open /sse/sos-updates streams.', None),
+    'sse_queued_events': ('gauge', 'SOS updates held for replay to new SSE clients.', None),
+    'sse_events_sent_total': ('counter', 'Events written to SSE streams, by type.', None)
+}
+
+def format_metric_labels(labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped))
+
+def format_metric_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def format_bucket_bound(bound):
+    return '+Inf' if bound == math.inf else repr(bound)
+
+class MetricsRegistry:
+    """Per-worker metric buffers.
+
+    Recording only touches in-memory dicts under a lock. A daemon thread periodically
+    adds the buffered counts to the runtime DB, so every gunicorn worker contributes to
+    the totals /metrics reports and request threads never wait on the shared file.
+    Gauges are stored per worker and summed while the worker keeps refreshing them.
+    """
+
+    def __init__(self, definitions):
+        self.definitions = definitions
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.flusher_pid = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(labels.items()))
+        bounds = self.definitions[name][2]
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                # One count per bucket, +Inf last, then the running sum
+                series = self.histograms[key] = [0] * (len(bounds) + 1) + [0.0]
+            series[bisect.bisect_left(bounds, value)] += 1
+            series[-1] += value
+
+    def add_gauge(self, name, amount, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(labels.items()))] = value
+
+    def flush(self):
+        """Add this worker's buffered counts to the shared totals and refresh its gauges."""
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            histograms, self.histograms = self.histograms, {}
+            gauges = list(self.gauges.items())
+
+        rows = [(name, format_metric_labels(labels), '', value) for (name, labels), value in counters.items()]
+        for (name, labels), series in histograms.items():
+            label_text = format_metric_labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.definitions[name][2] + (math.inf,), series):
+                cumulative += count
+                # Leading empty buckets are implied zeros; render_metrics() fills them in
+                if cumulative:
+                    rows.append((f'{name}_bucket', label_text, format_bucket_bound(bound), cumulative))
+            rows.append((f'{name}_sum', label_text, '', series[-1]))
+            rows.append((f'{name}_count', label_text, '', cumulative))
+
+        now = time.time()
+        worker = str(os.getpid())
+        conn = get_runtime_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO metric_totals (name, labels, le, value) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(name, labels, le) DO UPDATE SET value = value + excluded.value',
+                rows
+            )
+            conn.executemany(
+                'INSERT INTO metric_gauges (name, labels, worker, value, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(name, labels, worker) DO UPDATE SET '
+                'value = excluded.value, updated_at = excluded.updated_at',
+                [(name, format_metric_labels(labels), worker, value, now) for (name, labels), value in gauges]
+            )
+            conn.execute('DELETE FROM metric_gauges WHERE updated_at < ?', (now - self.gauge_ttl(),))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def gauge_ttl(self):
+        # Gauges of a worker that stopped flushing (exited or was killed) stop counting
+        return 3 * app.config['METRICS_FLUSH_SECONDS']
+
+    def start_flusher(self):
+        """Start this process's flush thread once; called per request, so it is cheap after that."""
+        if self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(app.config['METRICS_FLUSH_SECONDS'])
+                try:
+                    self.flush()
+                except sqlite3.Error as e:
+                    # Metrics are best effort; the dropped interval only shows up as a gap
+                    runtime_log.warning("Metrics flush failed: %s", e)
+
+        threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+metrics = MetricsRegistry(METRIC_DEFINITIONS)
+# A preloaded gunicorn master forks workers after startup; each child must start empty
+# (or it would flush the master's startup counts again) and run its own flush thread.
+os.register_at_fork(after_in_child=metrics.reset)
+
+def render_metrics():
+    """Prometheus text exposition of the totals summed across all workers."""
+    conn = get_runtime_db()
+    totals = {}
+    for name, labels, le, value in conn.execute('SELECT name, labels, le, value FROM metric_totals'):
+        totals.setdefault(name, {}).setdefault(labels, {})[le] = value
+    cutoff = time.time() - metrics.gauge_ttl()
+    for name, labels, value in conn.execute(
+            'SELECT name, labels, SUM(value) FROM metric_gauges WHERE updated_at >= ? GROUP BY name, labels',
+            (cutoff,)):
+        totals.setdefault(name, {})[labels] = {'': value}
+
+    lines = []
+    for name, (metric_type, help_text, bounds) in METRIC_DEFINITIONS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type != 'histogram':
+            for labels, values in sorted(totals.get(name, {}).items()):
+                value = format_metric_value(values[''])
+                lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+            continue
+        for labels, buckets in sorted(totals.get(f'{name}_bucket', {}).items()):
+            prefix = f'{labels},' if labels else ''
+            for bound in bounds + (math.inf,):
+                le = format_bucket_bound(bound)
+                lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {format_metric_value(buckets.get(le, 0))}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f"{name}_sum{suffix} {format_metric_value(totals[f'{name}_sum'][labels][''])}")
+            lines.append(f"{name}_count{suffix} {format_metric_value(totals[f'{name}_count'][labels][''])}")
+    return '\n'.join(lines) + '\n'
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if app.config['METRICS_ENABLED']:
+        metrics.start_flusher()
+
+@app.after_request
+def record_request_metrics(response):
+    """Runs after every other after_request hook, so compression time is included."""
+    started = g.pop('request_started', None)
+    if started is not None and app.config['METRICS_ENABLED']:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        route=request.endpoint or 'unmatched', method=request.method,
+                        status=str(response.status_code))
+    return response
+
+# ✅ NEW: Request tracing: always-on slow-request capture and on-demand sampling profiles
+PROFILE_HEADER = 'X-Profile-Request'
+PROFILE_FILE_SUFFIX = '.speedscope.json'
+_profile_targets = {'checked_at': 0.0, 'endpoints': frozenset()}
+
+def current_trace():
+    """The trace of the request on this thread, or None outside a request."""
+    return g.get('request_trace') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # One statement runs at a time per connection; a failed one is simply overwritten
+    conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if app.config['METRICS_ENABLED']:
+        metrics.observe('db_query_duration_seconds', elapsed)
+    count_query(statement, elapsed)
+    trace = current_trace()
+    if trace is not None:
+        trace['query_count'] += 1
+        trace['query_seconds'] += elapsed
+        if len(trace['queries']) < app.config['SLOW_REQUEST_MAX_QUERIES']:
+            trace['queries'].append((statement, elapsed))
+
+def record_llm_call(operation, seconds, outcome):
+    """Count one LLM API call in metrics and in the current request's trace."""
+    metrics.observe('llm_request_duration_seconds', seconds, operation=operation, outcome=outcome)
+    trace = current_trace()
+    if trace is not None:
+        trace['llm'].append({'operation': operation, 'outcome': outcome, 'ms': round(seconds * 1000, 1)})
+
+class StackSampler:
+    """Sampling profiler for one thread.
+
+    A background thread reads the target thread's Python stack from sys._current_frames()
+    every interval, so the profiled code runs unmodified; each sample is weighted by the
+    time since the previous one.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def run(self):
+        last = self.started
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples.append((stack[::-1], now - last))
+            last = now
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return time.perf_counter() - self.started
+
+    def speedscope(self, name, duration):
+        """The samples in speedscope's file format (https://www.speedscope.app)."""
+        frame_index, frames, samples, weights = {}, [], [], []
+        for stack, weight in self.samples:
+            indexes = []
+            for key in stack:
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+                indexes.append(frame_index[key])
+            samples.append(indexes)
+            weights.append(weight)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': f'disastrous {APP_VERSION}',
+            'name': name,
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': name, 'unit': 'seconds',
+                'startValue': 0, 'endValue': duration, 'samples': samples, 'weights': weights
+            }]
+        }
+
+def profile_signer():
+    return TimestampSigner(app.secret_key, salt='profile-request')
+
+def profile_target_endpoints():
+    """Endpoints an admin asked to profile, re-read from the runtime DB at most once a second."""
+    now = time.time()
+    if now - _profile_targets['checked_at'] >= 1.0:
+        rows = get_runtime_db().execute(
+            'SELECT endpoint FROM profile_targets WHERE remaining > 0 AND expires_at > ?', (now,)
+        ).fetchall()
+        _profile_targets.update(checked_at=now, endpoints=frozenset(row[0] for row in rows))
+    return _profile_targets['endpoints']
+
+def claim_profile_target(endpoint):
+    """Take one of the remaining profiles for an endpoint; workers share the count."""
+    row = get_runtime_db().execute(
+        'UPDATE profile_targets SET remaining = remaining - 1 '
+        'WHERE endpoint = ? AND remaining > 0 AND expires_at > ? RETURNING remaining',
+        (endpoint, time.time())
+    ).fetchone()
+    return row is not None
+
+def profile_reason():
+    """Why this request should be profiled: a valid signed header, an admin toggle, or not at all."""
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        try:
+            profile_signer().unsign(token, max_age=app.config['PROFILE_TOKEN_MAX_AGE'])
+            return 'header'
+        except BadSignature:
+            pass
+    if request.endpoint in profile_target_endpoints() and claim_profile_target(request.endpoint):
+        return 'admin'
+    return None
+
+def save_profile(sampler, duration, endpoint):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    filename = f'{stamp}-{endpoint or "unmatched"}-{secrets.token_hex(3)}{PROFILE_FILE_SUFFIX}'
+    name = f'{request.method} {request.path} ({duration * 1000:.0f} ms)'
+    write_atomic(os.path.join(directory, filename), json.dumps(sampler.speedscope(name, duration)).encode())
+    for stale in list_profiles()[app.config['PROFILE_HISTORY']:]:
+        os.remove(os.path.join(directory, stale['filename']))
+    return filename
+
+def list_profiles():
+    """Saved profiles, newest first."""
+    directory = app.config['PROFILE_DIR']
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(PROFILE_FILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({'filename': entry.name, 'size': stat.st_size, 'modified_at': stat.st_mtime})
+    return sorted(profiles, key=lambda item: item['modified_at'], reverse=True)
+
+def record_slow_request(response, duration, profile):
+    """Add to the shared store of slow requests, keeping the SLOW_REQUEST_BUFFER slowest.
+
+    Trimming by duration, not age, means a burst of just-over-threshold requests
+    cannot push out a rare outlier.
+    """
+    trace = g.request_trace
+    detail = {
+        'query_count': trace['query_count'],
+        'query_ms': round(trace['query_seconds'] * 1000, 1),
+        'queries': [{'sql': statement[:500], 'ms': round(seconds * 1000, 2)}
+                    for statement, seconds in trace['queries']],
+        'llm': trace['llm'],
+        'profile': profile
+    }
+    conn = get_runtime_db()
+    conn.execute(
+        'INSERT INTO slow_requests (recorded_at, endpoint, method, path, status, duration, detail) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (time.time(), request.endpoint or 'unmatched', request.method, request.path,
+         response.status_code, duration, json.dumps(detail))
+    )
+    conn.execute(
+        'DELETE FROM slow_requests WHERE id NOT IN '
+        '(SELECT id FROM slow_requests ORDER BY duration DESC, id DESC LIMIT ?)',
+        (app.config['SLOW_REQUEST_BUFFER'],)
+    )
+
+@app.before_request
+def start_request_trace():
+    g.request_trace = {'query_count': 0, 'query_seconds': 0.0, 'queries': [], 'llm': []}
+    try:
+        reason = profile_reason()
+    except sqlite3.Error as e:
+        runtime_log.warning("Profile targets unavailable: %s", e)
+        reason = None
+    if reason:
+        g.profiler = StackSampler(threading.get_ident(), app.config['PROFILE_INTERVAL_SECONDS'])
+        g.profile_reason = reason
+        g.profiler.start()
+
+@app.after_request
+def finish_request_trace(response):
+    """Save a requested profile and capture the request if it was slow."""
+    started = g.get('request_started')
+    duration = time.perf_counter() - started if started is not None else 0.0
+    profile = None
+    sampler = g.pop('profiler', None)
+    try:
+        if sampler is not None:
+            profile = save_profile(sampler, sampler.stop(), request.endpoint)
+            runtime_log.info("Request profiled", extra={'profile': profile, 'reason': g.profile_reason})
+            if g.profile_reason == 'header':
+                response.headers['X-Profile-Id'] = profile
+        if duration >= app.config['SLOW_REQUEST_SECONDS'] and 'request_trace' in g:
+            record_slow_request(response, duration, profile)
+    except (OSError, sqlite3.Error) as e:
+        # Diagnostics must never turn a good response into an error
+        runtime_log.warning("Request trace not saved: %s", e)
+    return response
+
+@app.teardown_request
+def stop_request_profiler(exc=None):
+    # after_request is skipped when a response fails to build; never leave a sampler running
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+
+@app.route('/api/admin/slow-requests', methods=['GET'])
+@login_required(role='admin')
+def get_slow_requests():
+    """API endpoint for the captured slow requests from all workers, slowest first"""
+    try:
+        rows = get_runtime_db().execute(
+            'SELECT recorded_at, endpoint, method, path, status, duration, detail FROM slow_requests '
+            'ORDER BY duration DESC'
+        ).fetchall()
+        return jsonify({
+            'threshold_seconds': app.config['SLOW_REQUEST_SECONDS'],
+            'requests': [{
+                'recorded_at': datetime.datetime.utcfromtimestamp(recorded_at).isoformat() + 'Z',
+                'endpoint': endpoint,
+                'method': method,
+                'path': path,
+                'status': status,
+                'duration_ms': round(duration * 1000, 1),
+                **json.loads(detail)
+            } for recorded_at, endpoint, method, path, status, duration, detail in rows]
+        }), 200
+    except sqlite3.Error as e:
+        runtime_log.exception("Error fetching slow requests")
+        return jsonify({'error': 'Failed to fetch slow requests'}), 500
+
+@app.route('/api/admin/profiling', methods=['GET'])
+@login_required(role='admin')
+def get_profiling():
+    """API endpoint for pending profile requests and the saved profiles"""
+    try:
+        targets = get_runtime_db().execute(
+            'SELECT endpoint, remaining, expires_at FROM profile_targets WHERE remaining > 0 AND expires_at > ?',
+            (time.time(),)
+        ).fetchall()
+        return jsonify({
+            'targets': [{'endpoint': endpoint, 'remaining': remaining,
+                         'expires_at': datetime.datetime.utcfromtimestamp(expires_at).isoformat() + 'Z'}
+                        for endpoint, remaining, expires_at in targets],
+            'profiles': [{**item, 'url': url_for('get_profile', filename=item['filename'])}
+                         for item in list_profiles()]
+        }), 200
+    except (OSError, sqlite3.Error) as e:
+        runtime_log.exception("Error fetching profiling state")
+        return jsonify({'error': 'Failed to fetch profiling state'}), 500
+
+@app.route('/api/admin/profiling', methods=['POST'])
+@login_required(role='admin')
+def set_profiling():
+    """API endpoint to profile the next `count` requests to an endpoint, on any worker"""
+    data = request.get_json(silent=True) or {}
+    endpoint = data.get('endpoint')
+    if endpoint not in app.view_functions:
+        return jsonify({'error': 'endpoint must be a route endpoint name, e.g. sos_requests'}), 400
+    try:
+        count = max(0, min(int(data.get('count', 1)), 20))
+        minutes = max(1, min(int(data.get('minutes', 30)), 24 * 60))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'count and minutes must be integers'}), 400
+
+    try:
+        get_runtime_db().execute(
+            'INSERT INTO profile_targets (endpoint, remaining, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(endpoint) DO UPDATE SET remaining = excluded.remaining, expires_at = excluded.expires_at',
+            (endpoint, count, time.time() + minutes * 60)
+        )
+        return jsonify({'endpoint': endpoint, 'remaining': count, 'minutes': minutes}), 200
+    except sqlite3.Error as e:
+        runtime_log.exception("Error saving profile target")
+        return jsonify({'error': 'Failed to save profile target'}), 500
+
+@app.route('/api/admin/profiling/token', methods=['POST'])
+@login_required(role='admin')
+def create_profile_token():
+    """API endpoint for a signed header value that profiles any request carrying it"""
+    return jsonify({
+        'header': PROFILE_HEADER,
+        'token': profile_signer().sign(secrets.token_hex(8)).decode(),
+        'expires_in': app.config['PROFILE_TOKEN_MAX_AGE']
+    }), 200
+
+@app.route('/api/admin/profiles/<filename>')
+@login_required(role='admin')
+def get_profile(filename):
+    """Download a saved profile; open it at https://www.speedscope.app"""
+    if not filename.endswith(PROFILE_FILE_SUFFIX):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(app.config['PROFILE_DIR'], filename, mimetype='application/json',
+                               as_attachment=True)
+
+# ✅ NEW: Per-route SQL query budgets
+_query_counters = threading.local()
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised after a request when QUERY_BUDGET_STRICT is on and the route went over budget."""
+
+class QueryCounter:
+    """Counts the SQL statements run on this thread inside a with block.
+
+    The test client runs requests on the calling thread, so scripts and tests can wrap
+    client calls and compare counter.count with query_budget(endpoint).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __enter__(self):
+        if not hasattr(_query_counters, 'active'):
+            _query_counters.active = []
+        _query_counters.active.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _query_counters.active.remove(self)
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+
+def count_query(statement, seconds):
+    for counter in getattr(_query_counters, 'active', ()):
+        counter.add(statement, seconds)
+
+def query_budget(endpoint):
+    return app.config['QUERY_BUDGETS'].get(endpoint, app.config['QUERY_BUDGET_DEFAULT'])
+
+def enforce_query_budget(endpoint, count, seconds, statements):
+    """Record a query count against an endpoint's budget; log, count and (if strict) raise when over."""
+    budget = query_budget(endpoint)
+    if app.config['METRICS_ENABLED']:
+        metrics.observe('db_queries_per_request', count, route=endpoint)
+    sql_log.debug("Request queries", extra={'query_count': count, 'query_ms': round(seconds * 1000, 2)})
+    if count > budget:
+        if app.config['METRICS_ENABLED']:
+            metrics.inc('db_query_budget_exceeded_total', route=endpoint)
+        sql_log.warning("Query budget exceeded", extra={
+            'query_count': count,
+            'budget': budget,
+            'query_ms': round(seconds * 1000, 2),
+            'statements': [statement[:200] for statement in statements[:10]]
+        })
+        if app.config['QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(f'{endpoint} ran {count} SQL statements, budget is {budget}')
+
+@app.after_request
+def check_query_budget(response):
+    """Record the request's query count and flag routes that ran more than their budget.
+
+    Streamed bodies run after this hook; sos_updates checks its replay itself.
+    """
+    trace = g.get('request_trace')
+    if trace is None:
+        return response
+    enforce_query_budget(request.endpoint or 'unmatched', trace['query_count'], trace['query_seconds'],
+                         [statement for statement, _ in trace['queries']])
+    return response
+
+# ✅ NEW: Per-client token bucket rate limiting
+def get_client_key():
+    """Identify the caller for rate limiting: logged-in user first, then remote address."""
+    if 'user_id' in session:
+        return f"user:{session['user_id']}"
+    return f"ip:{request.remote_addr or 'unknown'}"
+
+def consume_rate_limit_token(bucket_key, capacity, refill_rate, now=None):
+    """Take one token from a shared bucket.
+
+    Returns (allowed, retry_after_seconds). The read-modify-write runs inside a
+    single IMMEDIATE transaction so concurrent workers cannot double-spend a token.
+    """
+    now = time.time() if now is None else now
+    conn = get_runtime_db()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?',
+            (bucket_key,)
+        ).fetchone()
+        if row is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(float(capacity), row[0] + max(0.0, now - row[1]) * refill_rate)
+
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        conn.execute(
+            'INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(bucket_key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+            (bucket_key, tokens, now)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    prune_rate_limit_buckets(now)
+    retry_after = 0 if allowed else math.ceil((1.0 - tokens) / refill_rate)
+    return allowed, retry_after
+
+_rate_limits_pruned_at = 0.0
+
+def prune_rate_limit_buckets(now):
+    """Delete buckets idle long enough to have refilled completely; at most once a minute per worker.
+
+    A full bucket behaves exactly like a missing one, so this forgets nothing, and
+    the table stays the size of the recently active clients.
+    """
+    global _rate_limits_pruned_at
+    if time.monotonic() - _rate_limits_pruned_at < 60:
+        return
+    _rate_limits_pruned_at = time.monotonic()
+    refill_seconds = max(capacity / refill_rate for capacity, refill_rate in app.config['RATE_LIMITS'].values())
+    get_runtime_db().execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', (now - refill_seconds,))
+
+def rate_limit(route_name):
+    """Limit a route per client using the bucket configured in RATE_LIMITS[route_name].
+
+    Only writes are limited, so a route that also serves its page on GET stays viewable.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not app.config['RATE_LIMIT_ENABLED'] or request.method in ('GET', 'HEAD', 'OPTIONS'):
+                return f(*args, **kwargs)
+            capacity, refill_rate = app.config['RATE_LIMITS'][route_name]
+            try:
+                allowed, retry_after = consume_rate_limit_token(
+                    f"{route_name}:{get_client_key()}", capacity, refill_rate
+                )
+            except sqlite3.Error as e:
+                # Fail open: losing the limiter must never block emergency traffic
+                runtime_log.warning("Rate limiter unavailable, allowing request: %s", e)
+                return f(*args, **kwargs)
+
+            if not allowed:
+                response = jsonify({
+                    'error': 'Too many requests. Please wait a moment and try again.',
+                    'status': 'rate_limited',
+                    'retry_after': retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            return f(*args, **kwargs)
         return decorated_function
     return decorator
 
+# ✅ NEW: Priority-aware admission control
+def parse_queue_start(header_value, now=None):
+    """Return seconds spent queued before the app saw the request, from X-Request-Start.
+
+    Accepts the common proxy formats: 't=<seconds>', '<milliseconds>' or '<microseconds>'.
+    """
+    if not header_value:
+        return None
+    try:
+        started = float(header_value.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+class AdmissionController:
+    """Tracks in-flight work per route class and sheds lower classes first under overload."""
+
+    CLASSES = ('critical', 'normal', 'best_effort')
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.lock = threading.Lock()
+        self.in_flight = {name: 0 for name in self.CLASSES}
+        self.queue_latency = {name: 0.0 for name in self.CLASSES}
+        # Every class waits in the same worker queue, so a backlog of critical requests counts too
+        self.worker_queue_latency = 0.0
+        self.shed = {name: 0 for name in self.CLASSES}
+
+    def try_acquire(self, route_class, queue_seconds=None):
+        """Admit or reject one request; returns True when the caller must later release()."""
+        with self.lock:
+            if queue_seconds is not None:
+                # Exponentially weighted so a single slow request does not trip shedding
+                self.queue_latency[route_class] = 0.8 * self.queue_latency[route_class] + 0.2 * queue_seconds
+                self.worker_queue_latency = 0.8 * self.worker_queue_latency + 0.2 * queue_seconds
+
+            limits = self.limits.get(route_class)
+            if limits and not self._has_capacity(route_class, limits, queue_seconds is not None):
+                self.shed[route_class] += 1
+                return False
+
+            self.in_flight[route_class] += 1
+            return True
+
+    def _has_capacity(self, route_class, limits, queue_measured):
+        total = sum(self.in_flight.values())
+        if self.in_flight[route_class] >= limits['max_in_flight']:
+            return False
+        if total >= limits.get('max_total_in_flight', float('inf')):
+            return False
+        # The smoothed worker-wide latency, not this request's sample, so one outlier does not
+        # shed it while critical traffic piling up sheds best-effort work first
+        if queue_measured and self.worker_queue_latency > limits['max_queue_seconds']:
+            return False
+        return True
+
+    def release(self, route_class):
+        with self.lock:
+            self.in_flight[route_class] = max(0, self.in_flight[route_class] - 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'in_flight': dict(self.in_flight),
+                'queue_latency_ms': {k: round(v * 1000, 1) for k, v in self.queue_latency.items()},
+                'worker_queue_latency_ms': round(self.worker_queue_latency * 1000, 1),
+                'shed': dict(self.shed)
+            }
+
+admission_controller = AdmissionController(app.config['ADMISSION_LIMITS'])
+
+class RequestStartStamp:
+    """Outermost WSGI layer: notes when a request reached this worker, for proxies that send no X-Request-Start."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        environ['disastrous.request_start'] = time.time()
+        return self.wsgi_app(environ, start_response)
+
+app.wsgi_app = RequestStartStamp(app.wsgi_app)
+
+@app.before_request
+def admit_request():
+    """Reject best-effort, then normal, traffic when this worker is saturated."""
+    route_class = app.config['ROUTE_CLASSES'].get(request.endpoint, 'normal')
+    if route_class is None:
+        return None
+
+    queue_seconds = parse_queue_start(request.headers.get('X-Request-Start'))
+    if queue_seconds is None and 'disastrous.request_start' in request.environ:
+        # Time from entering this worker to admission: session load and earlier hooks waiting on locks
+        queue_seconds = max(0.0, time.time() - request.environ['disastrous.request_start'])
+    if not admission_controller.try_acquire(route_class, queue_seconds):
+        retry_after = 5 if route_class == 'best_effort' else 2
+        if request.path.startswith('/api/'):
+            response = jsonify({
+                'error': 'Service is busy handling emergencies. Please try again shortly.',
+                'status': 'overloaded',
+                'retry_after': retry_after
+            })
+        else:
+            response = Response('Service is busy handling emergencies. Please try again shortly.',
+                                mimetype='text/plain')
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    g.admitted_route_class = route_class
+    return None
+
+@app.teardown_request
+def release_admission(exc=None):
+    route_class = g.pop('admitted_route_class', None)
+    if route_class is not None:
+        admission_controller.release(route_class)
+
 # Helper function to get common template context
 def get_template_context():
     """Get common context for all templates, ensuring it's always populated."""
-    # Ensure session is initialized (should be handled by before_request, but as a fallback)
-    if 'user_preferences' not in session:
-        initialize_session()
-
-    # Get default user preferences
-    preferences = session['user_preferences']
+    preferences = get_user_preferences()
     
-    # Add any dynamic preference calculations
+    # Derived values live only in this request's copy, never in the session
     preferences.update({
         'layout': 'comfortable' if preferences.get('font_size', 16) > 14 else 'compact',
         'theme': 'dark' if preferences.get('dark_mode', False) else 'light',
         'media_upload_enabled': True,  # Feature flag for media uploads
         'max_file_sizes': {
-            'photo': '5MB',
-            'video': '50MB',
-            'audio': '10MB'
+            kind: f'{limit // (1024 * 1024)}MB'
+            for kind, limit in app.config['MEDIA_UPLOAD_LIMITS'].items()
         }
     })
 
@@ -160,6 +1760,228 @@ def get_template_context():
     }
     return context
 
+# ✅ NEW: Rendered page cache keyed by route, preferences and data version
+class BytesLRUCache:
+    """Size-bounded LRU of response bodies plus a small metadata value.
+
+    Only bytes and metadata (mimetype, ETag, ...) are stored; each hit builds a
+    fresh Response so session cookies and per-request headers are never
+    replayed to other users.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, meta=None):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key)[0])
+            self.entries[key] = (body, meta)
+            self.total_bytes += len(body)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (old_body, _) = self.entries.popitem(last=False)
+                self.total_bytes -= len(old_body)
+
+    def invalidate(self, endpoint=None):
+        """Drop every entry, or only those rendered for one endpoint."""
+        with self.lock:
+            if endpoint is None:
+                self.entries.clear()
+                self.total_bytes = 0
+                return
+            for key in [k for k in self.entries if k[0] == endpoint]:
+                self.total_bytes -= len(self.entries.pop(key)[0])
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+page_cache = BytesLRUCache(app.config['PAGE_CACHE_MAX_ENTRIES'], app.config['PAGE_CACHE_MAX_BYTES'])
+
+def page_cache_key(data_sources, vary_on_user=False):
+    """Everything a cached page's HTML depends on: route, query, preferences, role and data versions."""
+    preferences = get_user_preferences()
+    return (
+        request.endpoint,
+        tuple(sorted(request.args.items(multi=True))),
+        preferences.get('language', 'en'),
+        'dark' if preferences.get('dark_mode') else 'light',
+        bool(preferences.get('high_contrast')),
+        preferences.get('font_size', 16),  # also decides the comfortable/compact layout
+        session.get('user_role'),
+        session.get('user_id') if vary_on_user else None,
+        load_asset_manifest()['version'],
+        tuple(get_data_version(source) for source in data_sources)
+    )
+
+def invalidate_pages(*data_sources):
+    """Invalidate cached pages built from these datasets in every worker."""
+    for source in data_sources:
+        bump_data_version(source)
+
+def cached_page(*data_sources, vary_on_user=False):
+    """Serve successful GET renders from the page cache.
+
+    data_sources name the datasets the page is built from; bumping any of their
+    versions (see invalidate_pages) makes every worker re-render.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            key = page_cache_key(data_sources, vary_on_user)
+            entry = page_cache.get(key)
+            if entry is not None:
+                body, (mimetype, etag) = entry
+                matched = matching_etag(etag)
+                if matched:
+                    return not_modified_response(matched)
+                response = Response(body, mimetype=mimetype)
+                response.set_etag(etag)
+                response.headers['X-Page-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                body = response.get_data()
+                etag = body_etag(body)
+                page_cache.put(key, body, (response.mimetype, etag))
+                response.set_etag(etag)
+                response.headers['X-Page-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+# ✅ NEW: Conditional GET (strong ETags) and response compression
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'application/manifest+json', 'image/svg+xml'
+}
+compressed_cache = BytesLRUCache(app.config['COMPRESSED_CACHE_MAX_ENTRIES'],
+                                 app.config['COMPRESSED_CACHE_MAX_BYTES'])
+
+def body_etag(body):
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+def versioned_etag(data_sources, vary_on_user=False):
+    """ETag derived from data versions instead of the body, so it costs no rendering."""
+    parts = [BUILD_ID, request.endpoint, request.query_string.decode('latin-1'),
+             session.get('user_id') if vary_on_user else '']
+    parts.extend(get_data_version(source) for source in data_sources)
+    return hashlib.blake2b('|'.join(map(str, parts)).encode('utf-8'), digest_size=12).hexdigest()
+
+def matching_etag(etag):
+    """Return the representation tag (identity, -gzip or -br) the client already holds, if any."""
+    if not request.if_none_match:
+        return None
+    for tag in (etag, f'{etag}-gzip', f'{etag}-br'):
+        if request.if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+def not_modified_response(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
+
+def etag_from_versions(*data_sources, vary_on_user=False):
+    """Answer If-None-Match with 304 before running the view when the named datasets are unchanged."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            etag = versioned_etag(data_sources, vary_on_user)
+            matched = matching_etag(etag)
+            if matched:
+                return not_modified_response(matched)
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return decorated_function
+    return decorator
+
+def negotiate_encoding(body_size):
+    if body_size < app.config['COMPRESS_MIN_SIZE']:
+        return None
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress_body(body, encoding, tag):
+    """Compress once per representation; repeat hits reuse the cached bytes."""
+    entry = compressed_cache.get(tag)
+    if entry is not None:
+        return entry[0]
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=app.config['BROTLI_QUALITY'])
+    else:
+        compressed = gzip.compress(body, compresslevel=app.config['GZIP_LEVEL'])
+    compressed_cache.put(tag, compressed)
+    return compressed
+
+@app.after_request
+def conditional_and_compress(response):
+    """Attach a strong ETag, answer If-None-Match with 304 and compress text bodies."""
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype == 'text/event-stream' or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    etag, _ = response.get_etag()
+    if not etag:
+        etag = body_etag(body)
+
+    encoding = None
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(len(body))
+    # Each encoding is a different representation, so it needs its own strong tag
+    tag = f'{etag}-{encoding}' if encoding else etag
+    response.set_etag(tag)
+    if not response.cache_control.max_age:
+        # Always revalidate; with the ETag that costs a 304 and no body
+        response.cache_control.no_cache = True
+
+    if request.if_none_match.contains_weak(tag):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        return response
+
+    if encoding:
+        response.set_data(compress_body(body, encoding, tag))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 # Main routes
 @app.route('/')
 def index():
@@ -167,6 +1989,7 @@ def index():
     return render_template('home.html', **get_template_context())
 
 @app.route('/forecasts')
+@cached_page('forecasts')
 def forecasts():
     """Serve the weather forecasts page with real weather data"""
     # In a real app, this would fetch from weather API
@@ -196,51 +2019,201 @@ def forecasts():
     return render_template('forecasts.html', **context)
 
 @app.route('/alerts')
+@cached_page('alerts')
 def alerts():
     """Serve the emergency alerts page with real alert data"""
-    # In a real app, this would fetch from disaster management API
+    severity_rank = db.case({severity: rank for rank, severity in enumerate(ALERT_SEVERITIES)},
+                            value=Alert.severity)
+    active = active_alerts_query().order_by(severity_rank, Alert.issued_at.desc()).all()
     alerts_data = {
         'active_alerts': [
-            {
-                'id': 'ALERT001',
-                'type': 'CYCLONE WARNING',
-                'severity': 'critical',
-                'title': 'Severe Cyclonic Storm Approaching',
-                'location': 'Bardhaman, West Bengal',
-                'impact': 'Heavy rainfall, strong winds up to 120 km/h',
-                'action': 'Immediate evacuation from affected areas',
-                'time': '2 hours ago',
-                'radius': '150 km'
-            },
-            {
-                'id': 'ALERT002',
-                'type': 'FLOOD WARNING',
-                'severity': 'high',
-                'title': 'Flash Flood Risk',
-                'location': 'Yamuna River basin, Delhi NCR',
-                'impact': 'Water levels rising rapidly',
-                'action': 'Avoid low-lying areas and riverbanks',
-                'time': '4 hours ago',
-                'radius': '50 km'
-            }
+            dict(serialize_alert(alert), time=alert.issued_at.strftime('%d %b %Y, %H:%M UTC'))
+            for alert in active
         ],
-        'statistics': {
-            'critical': 3,
-            'high': 7,
-            'medium': 12,
-            'low': 8
-        }
+        'statistics': alert_statistics()
     }
     context = get_template_context()
     context['alerts_data'] = alerts_data
     return render_template('alerts.html', **context)
 
+# ✅ NEW: Rescue requests, dispatched to the least-loaded responder in the closest region
+# The rescue form sends state codes while registrations store state names
+STATE_CODES = {
+    'AN': 'Andaman and Nicobar Islands', 'AP': 'Andhra Pradesh', 'AR': 'Arunachal Pradesh',
+    'AS': 'Assam', 'BR': 'Bihar', 'CH': 'Chandigarh', 'CT': 'Chhattisgarh',
+    'DN': 'Dadra and Nagar Haveli', 'DD': 'Daman and Diu', 'DL': 'Delhi', 'GA': 'Goa',
+    'GJ': 'Gujarat', 'HR': 'Haryana', 'HP': 'Himachal Pradesh', 'JK': 'Jammu and Kashmir',
+    'JH': 'Jharkhand', 'KA': 'Karnataka', 'KL': 'Kerala', 'LA': 'Ladakh', 'LD': 'Lakshadweep',
+    'MP': 'Madhya Pradesh', 'MH': 'Maharashtra', 'MN': 'Manipur', 'ML': 'Meghalaya',
+    'MZ': 'Mizoram', 'NL': 'Nagaland', 'OR': 'Odisha', 'PY': 'Puducherry', 'PB': 'Punjab',
+    'RJ': 'Rajasthan', 'SK': 'Sikkim', 'TN': 'Tamil Nadu', 'TG': 'Telangana', 'TR': 'Tripura',
+    'UP': 'Uttar Pradesh', 'UT': 'Uttarakhand', 'WB': 'West Bengal'
+}
+RESCUE_EMERGENCY_TYPES = ('flood', 'fire', 'collapse', 'landslide', 'medical', 'other')
+RESCUE_OPEN_STATUSES = ('pending', 'assigned')
+# Closest region first. There is no nationwide tier: a request nobody in its state can take
+# waits in the pending queue, which admins can see, rather than going to the other end of the country.
+DISPATCH_TIERS = ('pincode', 'pincode_area', 'city', 'state')
+
+def region_key(value):
+    return ' '.join(value.split()).lower() if value and value.strip() else None
+
+def dispatch_regions(pincode=None, city=None, state=None):
+    """Normalized region keys, in the form stored on ResponderLoad."""
+    pincode = pincode if pincode and re.match(r'^[0-9]{6}$', pincode) else None
+    if state:
+        state = STATE_CODES.get(state.strip().upper(), state)
+    return {
+        'pincode': pincode,
+        'pincode_area': pincode[:3] if pincode else None,
+        'city': region_key(city),
+        'state': region_key(state)
+    }
+
+def sync_responder(user):
+    """Create or re-region a rescue user's dispatch row, keeping its workload. The caller commits."""
+    regions = dispatch_regions(user.pincode, user.city, user.state)
+    db.session.execute(
+        sqlite_insert(ResponderLoad).values(user_id=user.id, open_count=0, **regions)
+        .on_conflict_do_update(index_elements=['user_id'], set_=regions)
+    )
+
+def sync_all_responders():
+    """Index rescue users created before dispatch existed (or by other tools)."""
+    indexed = db.session.query(ResponderLoad.user_id)
+    missing = User.query.filter(User.role == 'rescue', User.id.notin_(indexed)).all()
+    for user in missing:
+        sync_responder(user)
+        dispatch_pending_to(user.id)
+    db.session.commit()
+    if missing:
+        bump_data_version('resources')
+
+def match_responder(regions):
+    """Least-loaded responder under the workload cap, trying each region tier in turn.
+
+    Every probe is one seek on a (region, open_count, user_id) index, so the cost
+    does not grow with the number of responders or requests.
+    """
+    cap = app.config['RESCUE_MAX_OPEN_PER_RESPONDER']
+    for tier in DISPATCH_TIERS:
+        if not regions.get(tier):
+            continue
+        match = db.session.query(ResponderLoad.user_id).filter(
+            ResponderLoad.open_count < cap, getattr(ResponderLoad, tier) == regions[tier]
+        ).order_by(ResponderLoad.open_count, ResponderLoad.user_id).first()
+        if match:
+            return match.user_id, tier
+    return None, None
+
+def adjust_responder_load(user_id, delta):
+    db.session.execute(
+        db.update(ResponderLoad)
+        .where(ResponderLoad.user_id == user_id)
+        .values(open_count=db.func.max(ResponderLoad.open_count + delta, 0))
+    )
+
+def claim_responder_slot(user_id):
+    """Count one more open request against a responder only if they are still under the cap."""
+    return db.session.execute(
+        db.update(ResponderLoad)
+        .where(ResponderLoad.user_id == user_id,
+               ResponderLoad.open_count < app.config['RESCUE_MAX_OPEN_PER_RESPONDER'])
+        .values(open_count=ResponderLoad.open_count + 1)
+    ).rowcount == 1
+
+def dispatch_rescue_request(rescue_request):
+    """Assign a request to a responder and count it against their workload. The caller commits."""
+    regions = dispatch_regions(rescue_request.pincode, rescue_request.city, rescue_request.state)
+    # A concurrent dispatch can fill the matched responder between the probe and the claim
+    for _ in range(3):
+        user_id, level = match_responder(regions)
+        if user_id is None:
+            return None
+        if claim_responder_slot(user_id):
+            break
+    else:
+        return None
+    rescue_request.assigned_to = user_id
+    rescue_request.match_level = level
+    rescue_request.status = 'assigned'
+    rescue_request.assigned_at = datetime.datetime.utcnow()
+    return user_id
+
+# Request columns compared with each ResponderLoad region key, normalized the same way
+PENDING_REGION_COLUMNS = {
+    'pincode': RescueRequest.pincode,
+    'pincode_area': db.func.substr(RescueRequest.pincode, 1, 3),
+    'city': db.func.lower(db.func.trim(RescueRequest.city)),
+    'state': db.func.lower(db.func.trim(RescueRequest.state))
+}
+
+def dispatch_pending_to(user_id):
+    """Give a responder with free capacity the oldest pending requests in their region, nearest tier first.
+
+    Called when a responder closes a request or is (re)indexed, so requests that
+    found nobody free at submission are not stranded. Returns how many were
+    assigned. The caller commits.
+    """
+    load = db.session.get(ResponderLoad, user_id, populate_existing=True)
+    if load is None:
+        return 0
+    free = app.config['RESCUE_MAX_OPEN_PER_RESPONDER'] - load.open_count
+    assigned = 0
+    for tier in DISPATCH_TIERS:
+        region = getattr(load, tier)
+        if free <= assigned or not region:
+            continue
+        pending = db.session.query(RescueRequest.id).filter(
+            RescueRequest.status == 'pending', PENDING_REGION_COLUMNS[tier] == region
+        ).order_by(RescueRequest.created_at, RescueRequest.id).limit(free - assigned).all()
+        for (request_id,) in pending:
+            if not claim_responder_slot(user_id):
+                return assigned
+            # Only a still-pending request: another worker may have dispatched it meanwhile
+            taken = db.session.execute(
+                db.update(RescueRequest)
+                .where(RescueRequest.id == request_id, RescueRequest.status == 'pending')
+                .values(status='assigned', assigned_to=user_id, match_level=tier,
+                        assigned_at=datetime.datetime.utcnow())
+            ).rowcount
+            if taken:
+                assigned += 1
+            else:
+                adjust_responder_load(user_id, -1)
+    if assigned:
+        sos_log.info("Dispatched pending rescue requests", extra={'user_id': user_id, 'count': assigned})
+    return assigned
+
+def serialize_rescue_request(rescue_request):
+    return {
+        'id': rescue_request.id,
+        'emergency_type': rescue_request.emergency_type,
+        'victim_count': rescue_request.victim_count,
+        'address': rescue_request.address,
+        'contact': rescue_request.contact,
+        'status': rescue_request.status,
+        'match_level': rescue_request.match_level,
+        'created_at': rescue_request.created_at.isoformat(),
+        'assigned_at': rescue_request.assigned_at.isoformat() if rescue_request.assigned_at else None
+    }
+
+# National helplines shown on /rescue and shipped in the offline district data packs
+EMERGENCY_CONTACTS = [
+    {'name': 'Emergency Helpline', 'number': '112', 'description': 'All Emergency Services'},
+    {'name': 'Fire Department', 'number': '101', 'description': 'Fire & Rescue Services'},
+    {'name': 'Police', 'number': '100', 'description': 'Law Enforcement'},
+    {'name': 'Medical Emergency', 'number': '108', 'description': 'Ambulance Service'},
+    {'name': 'Disaster Management', 'number': '1078', 'description': 'NDRF Helpline'}
+]
+
 @app.route('/rescue', methods=['GET', 'POST'])
+@cached_page('rescue')
 def rescue():
     """Serve the rescue services page and handle rescue request submissions"""
     if request.method == 'POST':
         try:
-            data = request.get_json()
+            data = request.get_json(silent=True) or {}
             # Extract form data
             emergency_type = data.get('emergency_type')
             victim_count = data.get('victim_count')
@@ -257,6 +2230,11 @@ def rescue():
                     'status': 'error',
                     'message': 'Emergency type and contact number are required'
                 }), 400
+            if emergency_type not in RESCUE_EMERGENCY_TYPES:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Invalid emergency type'
+                }), 400
 
             # Validate PIN code format if provided
             if pincode and not re.match(r'^[0-9]{6}$', pincode):
@@ -265,6 +2243,13 @@ def rescue():
                     'message': 'Invalid PIN code format'
                 }), 400
 
+            try:
+                victim_count = int(victim_count) if victim_count not in (None, '') else None
+            except (TypeError, ValueError):
+                victim_count = None
+            if victim_count is not None and victim_count < 1:
+                victim_count = None
+
             # Format complete address
             address_parts = []
             if street_address:
@@ -274,27 +2259,45 @@ def rescue():
             if city:
                 address_parts.append(city)
             if state:
-                address_parts.append(state)
+                address_parts.append(STATE_CODES.get(state, state))
             if pincode:
                 address_parts.append(pincode)
             
             complete_address = ', '.join(filter(None, address_parts))
 
-            # TODO: In a real application, save this data to the database
-            # For now, just return success
+            # Insert and dispatch in one short transaction
+            rescue_request = RescueRequest(
+                emergency_type=emergency_type,
+                victim_count=victim_count,
+                address=complete_address[:500],
+                city=city,
+                state=STATE_CODES.get(state, state) if state else None,
+                pincode=pincode or None,
+                contact=str(contact)[:20],
+                created_at=datetime.datetime.utcnow()
+            )
+            db.session.add(rescue_request)
+            dispatch_rescue_request(rescue_request)
+            db.session.commit()
+
             return jsonify({
                 'status': 'success',
-                'message': 'Emergency request submitted successfully',
+                'message': 'Emergency request submitted successfully' if rescue_request.assigned_to
+                           else ('Emergency request submitted. No rescue team nearby is free yet; it is queued '
+                                 'and will be assigned as soon as one is. Call 112 if lives are at risk'),
                 'data': {
+                    'id': rescue_request.id,
                     'emergency_type': emergency_type,
                     'victim_count': victim_count,
                     'address': complete_address,
-                    'contact': contact
+                    'contact': contact,
+                    'dispatch_status': rescue_request.status
                 }
-            }), 200
+            }), 201
 
         except Exception as e:
-            print(f"Error processing rescue request: {str(e)}")
+            db.session.rollback()
+            sos_log.exception("Error processing rescue request")
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to process rescue request'
@@ -329,74 +2332,711 @@ def rescue():
             'ambulances': {'available': 12, 'status': 'Ready'},
             'personnel': {'available': 45, 'status': 'On Standby'}
         },
-        'contacts': [
-            {'name': 'Emergency Helpline', 'number': '112', 'description': 'All Emergency Services'},
-            {'name': 'Fire Department', 'number': '101', 'description': 'Fire & Rescue Services'},
-            {'name': 'Police', 'number': '100', 'description': 'Law Enforcement'},
-            {'name': 'Medical Emergency', 'number': '108', 'description': 'Ambulance Service'},
-            {'name': 'Disaster Management', 'number': '1078', 'description': 'NDRF Helpline'}
-        ]
+        'contacts': EMERGENCY_CONTACTS
     }
     context = get_template_context()
     context['rescue_data'] = rescue_data
     return render_template('rescue.html', **context)
 
-@app.route('/report', methods=['GET', 'POST'])
-def report():
-    """Serve the disaster report page and handle report submissions"""
-    if request.method == 'POST':
-        try:
-            # Process form submission
-            # In a real app, save the report to database
-            
-            # Redirect with success message
-            return redirect(url_for('report', success=True))
-        except Exception as e:
-            print(f"Error processing report: {str(e)}")
-            # Redirect with error message
-            return redirect(url_for('report', error=True, message='Failed to submit report'))
-    
-    return render_template('report.html', **get_template_context())
+# ✅ NEW: Crowdsourced reports, clustered per report into crowdsourced forecast candidates
+REPORT_TYPES = ('flood', 'earthquake', 'hurricane', 'fire', 'landslide', 'tornado', 'tsunami', 'other')
+REPORT_SEVERITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+REPORT_FORECAST_SOURCE = 'Community Reports'
+
+def report_cell_degrees():
+    return math.degrees(app.config['REPORT_CLUSTER_RADIUS_KM'] / EARTH_RADIUS_KM)
+
+def report_grid_cell(lat, lng):
+    size = report_cell_degrees()
+    return f'{math.floor(lat / size)}:{math.floor(lng / size)}'
+
+def report_neighbour_cells(lat, lng):
+    """Grid cells overlapped by the clustering radius around a point."""
+    size = report_cell_degrees()
+    dlng = size / max(math.cos(math.radians(lat)), 0.01)
+    rows = range(math.floor((lat - size) / size), math.floor((lat + size) / size) + 1)
+    cols = range(math.floor((lng - dlng) / size), math.floor((lng + dlng) / size) + 1)
+    return [f'{row}:{col}' for row in rows for col in cols]
+
+def find_report_neighbours(report):
+    """Reports of the same type within the clustering radius and time window, read via the grid index.
+
+    Reports in a cluster whose forecast was already approved or rejected are left
+    out: that cluster is closed, and later reports start a new candidate.
+    """
+    window = datetime.timedelta(hours=app.config['REPORT_CLUSTER_WINDOW_HOURS'])
+    reviewed_clusters = db.session.query(ReportCluster.id).join(
+        Forecast, Forecast.id == ReportCluster.forecast_id
+    ).filter(Forecast.status != 'pending')
+    candidates = Report.query.filter(
+        Report.report_type == report.report_type,
+        Report.grid_cell.in_(report_neighbour_cells(report.latitude, report.longitude)),
+        Report.created_at >= report.created_at - window,
+        Report.id != report.id,
+        db.or_(Report.cluster_id.is_(None), Report.cluster_id.notin_(reviewed_clusters))
+    ).all()
+    return [
+        candidate for candidate in candidates
+        if haversine_km(report.latitude, report.longitude, candidate.latitude, candidate.longitude)
+        <= app.config['REPORT_CLUSTER_RADIUS_KM']
+    ]
+
+def add_report_to_cluster(cluster, report):
+    report.cluster_id = cluster.id
+    cluster.report_count += 1
+    cluster.latitude_sum += report.latitude
+    cluster.longitude_sum += report.longitude
+    cluster.severity_sum += REPORT_SEVERITY_WEIGHTS[report.severity]
+    cluster.first_report_at = min(cluster.first_report_at, report.created_at)
+    cluster.last_report_at = max(cluster.last_report_at, report.created_at)
+
+def merge_report_clusters(target, other):
+    """Move every report of other into target and drop other's still-pending forecast."""
+    Report.query.filter_by(cluster_id=other.id).update({'cluster_id': target.id})
+    target.report_count += other.report_count
+    target.latitude_sum += other.latitude_sum
+    target.longitude_sum += other.longitude_sum
+    target.severity_sum += other.severity_sum
+    target.first_report_at = min(target.first_report_at, other.first_report_at)
+    target.last_report_at = max(target.last_report_at, other.last_report_at)
+    forecast = db.session.get(Forecast, other.forecast_id) if other.forecast_id else None
+    if forecast is not None and forecast.status == 'pending':
+        adjust_forecast_stats('crowdsourced', forecast.source, pending=-1, open_count=-1,
+                              open_severity_sum=-FORECAST_SEVERITY_WEIGHTS[forecast.severity])
+        db.session.delete(forecast)
+    db.session.delete(other)
+
+def cluster_report(report):
+    """Fold one new geocoded report into the clusters; returns its cluster or None.
+
+    DBSCAN over distance and time, updated one report at a time: a report with
+    at least REPORT_CLUSTER_MIN_REPORTS - 1 neighbours is a core point, so it
+    founds or joins a cluster, pulls in unclustered neighbours and merges the
+    other clusters it touches. Otherwise it joins the nearest neighbouring
+    cluster as a border point, or stays unclustered until more reports arrive.
+    The work is bounded by the reports in nearby grid cells within the window.
+    """
+    neighbours = find_report_neighbours(report)
+    is_core = len(neighbours) + 1 >= app.config['REPORT_CLUSTER_MIN_REPORTS']
+    clustered = [n for n in neighbours if n.cluster_id]
+
+    if is_core:
+        cluster_ids = {n.cluster_id for n in clustered}
+        clusters = ReportCluster.query.filter(ReportCluster.id.in_(cluster_ids)).all() if cluster_ids else []
+        if clusters:
+            # Keep the largest cluster (the oldest on ties) and fold the rest into it
+            target = max(clusters, key=lambda cluster: (cluster.report_count, -cluster.id))
+            for other in clusters:
+                if other is not target:
+                    merge_report_clusters(target, other)
+        else:
+            target = ReportCluster(report_type=report.report_type, report_count=0, latitude_sum=0.0,
+                                   longitude_sum=0.0, severity_sum=0, region=report.location,
+                                   first_report_at=report.created_at, last_report_at=report.created_at)
+            db.session.add(target)
+            db.session.flush()
+        members = [report] + [n for n in neighbours if not n.cluster_id]
+    elif clustered:
+        nearest = min(clustered, key=lambda n: haversine_km(report.latitude, report.longitude,
+                                                            n.latitude, n.longitude))
+        target = db.session.get(ReportCluster, nearest.cluster_id)
+        members = [report]
+    else:
+        return None
+
+    for member in members:
+        add_report_to_cluster(target, member)
+    sync_cluster_forecast(target)
+    return target
+
+def sync_cluster_forecast(cluster):
+    """Create or refresh the crowdsourced forecast candidate that represents a cluster."""
+    count = cluster.report_count
+    mean_severity = cluster.severity_sum / count
+    severity = 'high' if mean_severity >= 2.5 else 'medium' if mean_severity >= 1.5 else 'low'
+    # Each independent report removes 30% of the remaining doubt
+    confidence = round(min(99.0, 100 * (1 - 0.7 ** count)), 1)
+    radius = app.config['REPORT_CLUSTER_RADIUS_KM']
+    description = (f"{count} community reports of {cluster.report_type} within {radius:g} km of "
+                   f"{cluster.latitude_sum / count:.4f}, {cluster.longitude_sum / count:.4f} "
+                   f"since {cluster.first_report_at:%d %b %H:%M} UTC.")
+
+    forecast = db.session.get(Forecast, cluster.forecast_id) if cluster.forecast_id else None
+    if forecast is None:
+        external_id = f'cluster-{cluster.id}'
+        row, _ = parse_forecast_item({
+            'external_id': external_id,
+            'title': f'{cluster.report_type.capitalize()} reports near {cluster.region}',
+            'description': description,
+            'region': cluster.region,
+            'severity': severity,
+            'confidence': confidence
+        }, 'crowdsourced', REPORT_FORECAST_SOURCE, 'pending', cluster.last_report_at)
+        ingest_forecasts('crowdsourced', REPORT_FORECAST_SOURCE, [row])
+        cluster.forecast_id = Forecast.query.filter_by(source=REPORT_FORECAST_SOURCE,
+                                                       external_id=external_id).one().id
+        return
+
+    if forecast.status != 'pending':
+        # Reviewed while this report was being clustered; the decision stands as reviewed
+        return
+    if forecast.severity != severity:
+        adjust_forecast_stats('crowdsourced', forecast.source,
+                              open_severity_sum=FORECAST_SEVERITY_WEIGHTS[severity]
+                              - FORECAST_SEVERITY_WEIGHTS[forecast.severity])
+        forecast.severity = severity
+    forecast.confidence = confidence
+    forecast.description = description
+
+def report_coordinates(form, media_fix=None):
+    """Browser coordinates, else a photo's EXIF fix, else 'lat,lng' typed as the location, else the gazetteer."""
+    try:
+        lat, lng = float(form['latitude']), float(form['longitude'])
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+    except (KeyError, TypeError, ValueError):
+        pass
+    if media_fix:
+        return media_fix
+    location = form.get('location', '')
+    return parse_coordinates(location) or geocode_place(location)
+
+@app.route('/report', methods=['GET', 'POST'])
+@rate_limit('report')
+def report():
+    """Serve the disaster report page and handle report submissions"""
+    if request.method == 'POST':
+        try:
+            form = request.form
+            title = form.get('title', '').strip()
+            report_type = form.get('type')
+            severity = form.get('severity')
+            description = form.get('description', '').strip()
+            location = form.get('location', '').strip()
+            if not (5 <= len(title) <= 100) or not (50 <= len(description) <= 1000) or not location:
+                return redirect(url_for('report', error=True, message='Please complete every field'))
+            if report_type not in REPORT_TYPES or severity not in REPORT_SEVERITY_WEIGHTS:
+                return redirect(url_for('report', error=True, message='Invalid disaster type or severity'))
+
+            new_report = Report(
+                user_id=session.get('user_id'),
+                title=title,
+                report_type=report_type,
+                severity=severity,
+                description=description,
+                location=location[:200],
+                created_at=datetime.datetime.utcnow()
+            )
+            db.session.add(new_report)
+            db.session.flush()
+            media = attach_report_media(new_report, form.get('media_ids', '').split(','))
+            coordinates = report_coordinates(form, media_location(media))
+            if coordinates:
+                new_report.latitude, new_report.longitude = coordinates
+                new_report.grid_cell = report_grid_cell(*coordinates)
+                db.session.flush()
+            cluster = cluster_report(new_report) if coordinates else None
+            db.session.commit()
+            if cluster is not None:
+                bump_data_version('forecasts')
+
+            # Redirect with success message
+            return redirect(url_for('report', success=True))
+        except Exception as e:
+            db.session.rollback()
+            media_log.exception("Error processing report")
+            # Redirect with error message
+            return redirect(url_for('report', error=True, message='Failed to submit report'))
+    
+    return render_template('report.html', **get_template_context())
+
+# ✅ NEW: Resumable chunked media uploads for reports
+# Clients create an upload, then PATCH raw chunks at the offset the server
+# reports. Each chunk is streamed to a partial file (never buffered whole) and
+# checked against its own SHA-256; a lost connection costs one chunk, not the file.
+MEDIA_TYPES = {
+    'image/jpeg': 'photo',
+    'image/png': 'photo',
+    'image/gif': 'photo',
+    'video/mp4': 'video',
+    'video/webm': 'video',
+    'video/quicktime': 'video',
+    'audio/mpeg': 'audio',
+    'audio/wav': 'audio',
+    'audio/ogg': 'audio'
+}
+MEDIA_READ_SIZE = 64 * 1024
+MEDIA_HASHER_CACHE_SIZE = 64
+# Running whole-file hash per upload, so each chunk only hashes its own bytes.
+# hashlib state cannot be shared between workers: a chunk landing on another
+# worker (or after a restart) re-hashes the partial file once and carries on.
+_upload_hashers = OrderedDict()
+_upload_hashers_lock = threading.Lock()
+
+def upload_partial_path(upload_key):
+    return os.path.join(app.config['MEDIA_DIR'], 'partial', upload_key)
+
+def media_blob_path(digest):
+    return os.path.join(app.config['MEDIA_DIR'], 'blobs', digest[:2], digest)
+
+def serialize_upload(upload):
+    data = {
+        'id': upload.upload_key,
+        'filename': upload.filename,
+        'media_type': upload.media_type,
+        'mime_type': upload.mime_type,
+        'size': upload.total_size,
+        'offset': upload.received_size,
+        'status': upload.status
+    }
+    if upload.status == 'complete':
+        data['url'] = url_for('media_file', upload_key=upload.upload_key)
+        # Only renditions the worker has already produced; nothing is generated on request
+        data['derivatives'] = {
+            variant: url_for('media_derivative', upload_key=upload.upload_key, variant=variant)
+            for (variant,) in db.session.query(MediaDerivative.variant).filter_by(sha256=upload.sha256)
+        }
+        if upload.latitude is not None:
+            data['latitude'], data['longitude'] = upload.latitude, upload.longitude
+    return data
+
+def upload_hasher(upload_key, f, offset):
+    """SHA-256 state of the first `offset` bytes of the partial file."""
+    with _upload_hashers_lock:
+        cached = _upload_hashers.pop(upload_key, None)
+    if cached is not None and cached[0] == offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    f.seek(0)
+    remaining = offset
+    while remaining:
+        data = f.read(min(MEDIA_READ_SIZE, remaining))
+        if not data:
+            raise IOError(f"Partial upload {upload_key} is shorter than its committed offset")
+        hasher.update(data)
+        remaining -= len(data)
+    return hasher
+
+def remember_upload_hasher(upload_key, offset, hasher):
+    with _upload_hashers_lock:
+        _upload_hashers[upload_key] = (offset, hasher)
+        while len(_upload_hashers) > MEDIA_HASHER_CACHE_SIZE:
+            _upload_hashers.popitem(last=False)
+
+def parse_chunk_checksum(header_value):
+    """Expected chunk digest from 'Upload-Checksum: sha256 <hex>'; None when not sent."""
+    if not header_value:
+        return None
+    algorithm, _, digest = header_value.strip().partition(' ')
+    if algorithm.lower() != 'sha256' or not re.fullmatch(r'[0-9a-fA-F]{64}', digest.strip()):
+        raise ValueError('Upload-Checksum must be "sha256 <hex digest>"')
+    return digest.strip().lower()
+
+def finish_upload(upload, digest):
+    """Move a fully received file into the content-addressed store, reusing an identical blob."""
+    partial = upload_partial_path(upload.upload_key)
+    blob = media_blob_path(digest)
+    duplicate = os.path.exists(blob)
+    if duplicate:
+        os.remove(partial)
+    else:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(partial, blob)
+    upload.sha256 = digest
+    upload.status = 'complete'
+    if duplicate:
+        located = MediaUpload.query.filter(MediaUpload.sha256 == digest, MediaUpload.latitude.isnot(None)).first()
+        if located is not None:
+            upload.latitude, upload.longitude = located.latitude, located.longitude
+    enqueue_media_jobs(digest, upload.media_type)
+    return duplicate
+
+def purge_stale_uploads():
+    """Delete uploads abandoned for MEDIA_UPLOAD_EXPIRY_HOURS, with their partial files."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=app.config['MEDIA_UPLOAD_EXPIRY_HOURS'])
+    stale = MediaUpload.query.filter(
+        MediaUpload.status == 'uploading',
+        MediaUpload.updated_at < cutoff
+    ).limit(50).all()
+    for upload in stale:
+        try:
+            os.remove(upload_partial_path(upload.upload_key))
+        except FileNotFoundError:
+            pass
+        db.session.delete(upload)
+    return len(stale)
+
+def attach_report_media(report, upload_keys):
+    """Link completed uploads to a new report; unknown, unfinished or claimed keys are ignored."""
+    keys = [key for key in upload_keys if key][:10]
+    if not keys:
+        return []
+    uploads = MediaUpload.query.filter(
+        MediaUpload.upload_key.in_(keys),
+        MediaUpload.status == 'complete',
+        MediaUpload.report_id.is_(None)
+    ).all()
+    for upload in uploads:
+        upload.report_id = report.id
+    return uploads
+
+def media_location(uploads):
+    """Coordinates from the first attached photo whose EXIF carried a GPS fix."""
+    for upload in uploads:
+        if upload.latitude is not None:
+            return upload.latitude, upload.longitude
+    return None
+
+# Background processing: finished blobs get one MediaJob per kind below. media_worker.py
+# claims them in batches no larger than its process pool, so request handlers never
+# spend time on thumbnails or transcodes.
+MEDIA_JOB_KINDS = {
+    'photo': ('thumbnail', 'exif_gps'),
+    'video': ('transcode',),
+    'audio': ('transcode',)
+}
+
+def media_derived_dir():
+    return os.path.join(app.config['MEDIA_DIR'], 'derived')
+
+def media_worker_options():
+    """Settings passed to the worker's processing functions, which cannot read app.config."""
+    return {
+        'thumbnail_size': app.config['MEDIA_THUMBNAIL_SIZE'],
+        'low_video_height': app.config['MEDIA_LOW_VIDEO_HEIGHT'],
+        'low_audio_bitrate': app.config['MEDIA_LOW_AUDIO_BITRATE']
+    }
+
+def enqueue_media_jobs(digest, media_type):
+    """Queue processing for a blob; a blob seen before keeps its existing jobs. The caller commits."""
+    rows = [{'sha256': digest, 'media_type': media_type, 'kind': kind} for kind in MEDIA_JOB_KINDS[media_type]]
+    db.session.execute(sqlite_insert(MediaJob).on_conflict_do_nothing(index_elements=['sha256', 'kind']), rows)
+
+def media_queue_depth():
+    return MediaJob.query.filter(MediaJob.status == 'queued').count()
+
+def claim_media_jobs(worker_id, limit):
+    """Lease up to `limit` due jobs to one worker in a single UPDATE, so workers never share a job."""
+    now = datetime.datetime.utcnow()
+    due = db.select(MediaJob.id).where(MediaJob.status == 'queued', MediaJob.run_after <= now) \
+        .order_by(MediaJob.run_after, MediaJob.id).limit(limit)
+    claimed = db.session.execute(
+        db.update(MediaJob)
+        .where(MediaJob.id.in_(due), MediaJob.status == 'queued')
+        .values(status='running', locked_by=worker_id, locked_at=now, attempts=MediaJob.attempts + 1)
+        .returning(MediaJob.id, MediaJob.sha256, MediaJob.media_type, MediaJob.kind, MediaJob.attempts)
+    ).all()
+    db.session.commit()
+    return [row._asdict() for row in claimed]
+
+def requeue_expired_media_jobs():
+    """Return jobs whose worker died mid-run to the queue once their lease runs out."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=app.config['MEDIA_JOB_LEASE_SECONDS'])
+    count = MediaJob.query.filter(MediaJob.status == 'running', MediaJob.locked_at < cutoff).update(
+        {'status': 'queued', 'locked_by': None, 'locked_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+def complete_media_job(job, result):
+    """Record a finished job: store the derivative it wrote, or apply the GPS fix it found."""
+    if result.get('variant'):
+        db.session.execute(
+            sqlite_insert(MediaDerivative).values(
+                sha256=job['sha256'], variant=result['variant'], filename=result['filename'],
+                mime_type=result['mime_type'], size=result['size']
+            ).on_conflict_do_update(
+                index_elements=['sha256', 'variant'],
+                set_={'filename': result['filename'], 'mime_type': result['mime_type'], 'size': result['size']}
+            )
+        )
+    clustered = False
+    if result.get('latitude') is not None:
+        clustered = apply_media_location(job['sha256'], result['latitude'], result['longitude'])
+    MediaJob.query.filter_by(id=job['id']).update({
+        'status': 'done', 'locked_by': None, 'locked_at': None,
+        'last_error': None, 'finished_at': datetime.datetime.utcnow()
+    })
+    db.session.commit()
+    if clustered:
+        bump_data_version('forecasts')
+
+def fail_media_job(job, error, retryable=True):
+    """Retry with exponential backoff until MEDIA_JOB_MAX_ATTEMPTS, then give up."""
+    values = {'locked_by': None, 'locked_at': None, 'last_error': str(error)[:1000]}
+    if retryable and job['attempts'] < app.config['MEDIA_JOB_MAX_ATTEMPTS']:
+        delay = app.config['MEDIA_JOB_RETRY_SECONDS'] * 2 ** (job['attempts'] - 1)
+        values.update(status='queued', run_after=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay))
+    else:
+        values.update(status='failed', finished_at=datetime.datetime.utcnow())
+    MediaJob.query.filter_by(id=job['id']).update(values)
+    db.session.commit()
+    return values['status']
+
+def apply_media_location(digest, lat, lng):
+    """Store an EXIF fix on every upload of the blob and locate their reports that had none.
+
+    Returns True when a report joined a cluster. The caller commits.
+    """
+    MediaUpload.query.filter_by(sha256=digest).update({'latitude': lat, 'longitude': lng})
+    clustered = False
+    reports = Report.query.join(MediaUpload, MediaUpload.report_id == Report.id).filter(
+        MediaUpload.sha256 == digest, Report.latitude.is_(None)
+    ).all()
+    for located in reports:
+        located.latitude, located.longitude = lat, lng
+        located.grid_cell = report_grid_cell(lat, lng)
+        db.session.flush()
+        clustered = cluster_report(located) is not None or clustered
+    return clustered
+
+@app.route('/api/uploads', methods=['POST'])
+@rate_limit('upload')
+def create_upload():
+    """API endpoint to start a resumable media upload"""
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = os.path.basename(str(data.get('filename', '')).replace('\\', '/')).strip()[:200]
+        mime_type = str(data.get('mime_type', '')).lower()
+        media_type = MEDIA_TYPES.get(mime_type)
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            size = -1
+        if not filename or media_type is None:
+            return jsonify({'status': 'error', 'message': 'Unsupported file type'}), 415
+        limit = app.config['MEDIA_UPLOAD_LIMITS'][media_type]
+        if not 0 < size <= limit:
+            return jsonify({
+                'status': 'error',
+                'message': f'{media_type.capitalize()} files must be under {limit // (1024 * 1024)}MB'
+            }), 413
+
+        # Backpressure: while the worker is far behind, new media waits instead of piling up
+        if media_queue_depth() >= app.config['MEDIA_JOB_QUEUE_LIMIT']:
+            response = jsonify({'status': 'busy', 'message': 'Media processing is busy. Please try again shortly.'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '60'
+            return response
+
+        purge_stale_uploads()
+        upload = MediaUpload(
+            upload_key=secrets.token_hex(16),
+            user_id=session.get('user_id'),
+            filename=filename,
+            media_type=media_type,
+            mime_type=mime_type,
+            total_size=size
+        )
+        db.session.add(upload)
+        db.session.commit()
+        os.makedirs(os.path.dirname(upload_partial_path(upload.upload_key)), exist_ok=True)
+        open(upload_partial_path(upload.upload_key), 'wb').close()
+
+        response = jsonify({
+            'status': 'success',
+            'data': serialize_upload(upload),
+            'chunk_size': app.config['MEDIA_CHUNK_SIZE']
+        })
+        response.status_code = 201
+        response.headers['Location'] = url_for('upload_status', upload_key=upload.upload_key)
+        return response
+    except Exception as e:
+        db.session.rollback()
+        media_log.exception("Error creating upload")
+        return jsonify({'status': 'error', 'message': 'Failed to start upload'}), 500
+
+@app.route('/api/uploads/<upload_key>', methods=['GET'])
+def upload_status(upload_key):
+    """API endpoint for the committed offset of an upload; clients HEAD it to resume"""
+    upload = MediaUpload.query.filter_by(upload_key=upload_key).first()
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Upload not found'}), 404
+    response = jsonify({'status': 'success', 'data': serialize_upload(upload)})
+    response.headers['Upload-Offset'] = str(upload.received_size)
+    response.headers['Upload-Length'] = str(upload.total_size)
+    response.cache_control.no_store = True
+    return response
+
+@app.route('/api/uploads/<upload_key>', methods=['PATCH'])
+def upload_chunk(upload_key):
+    """API endpoint to append one chunk at Upload-Offset, verified by Upload-Checksum"""
+    upload = MediaUpload.query.filter_by(upload_key=upload_key).first()
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Upload not found'}), 404
+    if upload.status == 'complete':
+        return jsonify({'status': 'success', 'data': serialize_upload(upload)}), 200
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Upload-Offset header is required'}), 400
+    try:
+        expected = parse_chunk_checksum(request.headers.get('Upload-Checksum'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    length = request.content_length
+    if length is None:
+        return jsonify({'status': 'error', 'message': 'Content-Length is required'}), 411
+    if length == 0 or length > app.config['MEDIA_MAX_CHUNK_BYTES']:
+        return jsonify({'status': 'error', 'message': 'Invalid chunk size'}), 413
+    if offset + length > upload.total_size:
+        return jsonify({'status': 'error', 'message': 'Chunk runs past the declared file size'}), 413
+
+    def conflict(message):
+        response = jsonify({'status': 'conflict', 'message': message, 'offset': upload.received_size})
+        response.status_code = 409
+        response.headers['Upload-Offset'] = str(upload.received_size)
+        return response
+
+    if offset != upload.received_size:
+        return conflict('Offset does not match the bytes received so far')
+
+    try:
+        with open(upload_partial_path(upload_key), 'r+b') as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return conflict('Another chunk of this upload is being written')
+                # The offset may have moved while we waited for the lock holder to commit
+                db.session.refresh(upload)
+                if offset != upload.received_size:
+                    return conflict('Offset does not match the bytes received so far')
+
+            base_hasher = upload_hasher(upload_key, f, offset)
+            file_hasher = base_hasher.copy()
+            chunk_hasher = hashlib.sha256()
+            # Bytes past the committed offset belong to a chunk that never finished
+            f.seek(offset)
+            f.truncate()
+            remaining = length
+            while remaining:
+                data = request.stream.read(min(MEDIA_READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                chunk_hasher.update(data)
+                file_hasher.update(data)
+                remaining -= len(data)
+
+            if remaining or (expected and chunk_hasher.hexdigest() != expected):
+                f.truncate(offset)
+                remember_upload_hasher(upload_key, offset, base_hasher)
+                message = 'Chunk ended early' if remaining else 'Chunk checksum mismatch'
+                return jsonify({'status': 'error', 'message': message, 'offset': offset}), 400 if remaining else 422
+            f.flush()
+            os.fsync(f.fileno())
+
+            new_offset = offset + length
+            # Compare-and-set: only one writer can advance the offset it started from
+            updated = MediaUpload.query.filter_by(id=upload.id, received_size=offset).update(
+                {'received_size': new_offset, 'updated_at': datetime.datetime.utcnow()},
+                synchronize_session=False
+            )
+            if not updated:
+                db.session.rollback()
+                db.session.refresh(upload)
+                return conflict('Offset does not match the bytes received so far')
+            db.session.commit()
+            db.session.refresh(upload)
+
+        duplicate = False
+        if new_offset == upload.total_size:
+            duplicate = finish_upload(upload, file_hasher.hexdigest())
+            db.session.commit()
+        else:
+            remember_upload_hasher(upload_key, new_offset, file_hasher)
+
+        response = jsonify({'status': 'success', 'data': serialize_upload(upload), 'duplicate': duplicate})
+        response.headers['Upload-Offset'] = str(upload.received_size)
+        return response
+    except Exception as e:
+        db.session.rollback()
+        media_log.exception("Error writing upload chunk")
+        return jsonify({'status': 'error', 'message': 'Failed to store chunk'}), 500
+
+@app.route('/media/<upload_key>')
+def media_file(upload_key):
+    """Serve a finished upload with Range support; identical files share one blob"""
+    upload = MediaUpload.query.filter_by(upload_key=upload_key, status='complete').first()
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Media not found'}), 404
+    # conditional=True answers Range and If-None-Match; the file body goes through
+    # the server's file wrapper (sendfile) or X-Sendfile when USE_X_SENDFILE is set
+    response = send_file(
+        media_blob_path(upload.sha256),
+        mimetype=upload.mime_type,
+        download_name=upload.filename,
+        conditional=True,
+        etag=upload.sha256,
+        max_age=31536000
+    )
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/media/<upload_key>/<variant>')
+def media_derivative(upload_key, variant):
+    """Serve a precomputed rendition; 404 until the media worker has produced it"""
+    derivative = MediaDerivative.query.join(MediaUpload, MediaUpload.sha256 == MediaDerivative.sha256).filter(
+        MediaUpload.upload_key == upload_key,
+        MediaUpload.status == 'complete',
+        MediaDerivative.variant == variant
+    ).first()
+    if derivative is None:
+        return jsonify({'status': 'error', 'message': 'Media rendition not available yet'}), 404
+    response = send_file(
+        os.path.join(media_derived_dir(), derivative.filename),
+        mimetype=derivative.mime_type,
+        conditional=True,
+        etag=f'{derivative.sha256}-{variant}',
+        max_age=31536000
+    )
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/favicon.ico')
 def favicon():
     """Serve favicon.ico with a 204 No Content response"""
     return '', 204
 
+# Safety guidelines shown on /guidelines and shipped in the offline district data packs
+GUIDELINES_DATA = {
+    'categories': ['earthquake', 'flood', 'fire', 'cyclone', 'general'],
+    'guidelines': {
+        'earthquake': {
+            'before': [
+                'Prepare an emergency kit with water, food, flashlight, and first aid supplies',
+                'Secure heavy furniture and appliances to walls',
+                'Identify safe spots in each room (under sturdy tables, away from glass)',
+                'Practice "Drop, Cover, and Hold On" with family members',
+                'Keep important documents in a waterproof container'
+            ],
+            'during': [
+                'Drop: Get down on hands and knees immediately',
+                'Cover: Take cover under a sturdy table or desk',
+                'Hold On: Hold onto your shelter and protect your head',
+                'Stay away from windows, mirrors, and heavy objects',
+                'If outdoors, move away from buildings, trees, and power lines'
+            ],
+            'after': [
+                'Check yourself and others for injuries',
+                'Check for hazards like gas leaks, electrical damage, or fires',
+                'Use stairs, not elevators',
+                'Stay away from damaged buildings',
+                'Be prepared for aftershocks'
+            ]
+        }
+        # Add more guidelines for other categories...
+    }
+}
+
 @app.route('/guidelines')
+@cached_page('guidelines')
 def guidelines():
     """Serve the safety guidelines page with comprehensive disaster preparedness info"""
-    guidelines_data = {
-        'categories': ['earthquake', 'flood', 'fire', 'cyclone', 'general'],
-        'guidelines': {
-            'earthquake': {
-                'before': [
-                    'Prepare an emergency kit with water, food, flashlight, and first aid supplies',
-                    'Secure heavy furniture and appliances to walls',
-                    'Identify safe spots in each room (under sturdy tables, away from glass)',
-                    'Practice "Drop, Cover, and Hold On" with family members',
-                    'Keep important documents in a waterproof container'
-                ],
-                'during': [
-                    'Drop: Get down on hands and knees immediately',
-                    'Cover: Take cover under a sturdy table or desk',
-                    'Hold On: Hold onto your shelter and protect your head',
-                    'Stay away from windows, mirrors, and heavy objects',
-                    'If outdoors, move away from buildings, trees, and power lines'
-                ],
-                'after': [
-                    'Check yourself and others for injuries',
-                    'Check for hazards like gas leaks, electrical damage, or fires',
-                    'Use stairs, not elevators',
-                    'Stay away from damaged buildings',
-                    'Be prepared for aftershocks'
-                ]
-            }
-            # Add more guidelines for other categories...
-        }
-    }
     context = get_template_context()
-    context['guidelines_data'] = guidelines_data
+    context['guidelines_data'] = GUIDELINES_DATA
     return render_template('guidelines.html', **context)
 
 @app.route('/settings')
@@ -404,7 +3044,7 @@ def settings():
     """Serve the settings page with current user preferences"""
     context = get_template_context()
     context['settings_data'] = {
-        'current_settings': session['user_preferences'],
+        'current_settings': get_user_preferences(),
         'available_languages': [
             {'code': 'en', 'name': 'English'},
             {'code': 'hi', 'name': 'हिंदी (Hindi)'},
@@ -455,7 +3095,11 @@ def authority_register():
             pincode=pincode
         )
         db.session.add(new_user)
+        db.session.flush()
+        sync_responder(new_user)
+        dispatch_pending_to(new_user.id)
         db.session.commit()
+        bump_data_version('resources')
         return redirect(url_for('authority_login'))
     return render_template('authority_register.html', **get_template_context())
 
@@ -467,6 +3111,7 @@ def authority_login():
         password = request.form.get('password')
         user = User.query.filter_by(email=email).first()
         if user and user.password == password:
+            session.regenerate()
             session['user_id'] = user.id
             session['user_role'] = user.role
             if user.role == 'admin':
@@ -491,17 +3136,15 @@ def rescue_profile():
         # Get current rescue user
         user = User.query.get(session['user_id'])
         if not user:
-            print("[DEBUG] User not found in session")
+            sos_log.warning("Rescue profile user not found", extra={'user_id': session['user_id']})
             return redirect(url_for('authority_login'))
 
-        # Add debug logging for address fields
-        print(f"[DEBUG] Loading profile for user {user.email}")
-        print(f"[DEBUG] Address fields:")
-        print(f"  - street_address: {user.street_address or 'Not set'}")
-        print(f"  - area_locality: {user.area_locality or 'Not set'}")
-        print(f"  - city: {user.city or 'Not set'}")
-        print(f"  - state: {user.state or 'Not set'}")
-        print(f"  - pincode: {user.pincode or 'Not set'}")
+        sos_log.debug("Loading rescue profile", extra={
+            'user_id': user.id,
+            'missing_address_fields': [field for field in
+                                       ('street_address', 'area_locality', 'city', 'state', 'pincode')
+                                       if not getattr(user, field)]
+        })
 
         # Pass individual address fields to template with proper null handling
         user_data = {
@@ -518,7 +3161,7 @@ def rescue_profile():
         return render_template('rescue_profile.html', **context)
 
     except Exception as e:
-        print(f"Error loading rescue profile: {str(e)}")
+        sos_log.exception("Error loading rescue profile")
         return redirect(url_for('authority_login'))
 
 @app.route('/logout')
@@ -540,23 +3183,16 @@ def admin_dashboard():
 def admin_rescue_management():
     """Serve the admin rescue management page"""
     try:
-        # Fetch rescue personnel from database
-        rescue_personnel = User.query.filter_by(role='rescue').all()
-
-        # Calculate resource counts based on the four main categories
-        for personnel in rescue_personnel:
-            personnel.resource_counts = {
-                'hospitals': 5,          # Number of hospitals they manage
-                'ambulances': 5,         # Number of ambulance services
-                'fire_stations': 3,      # Number of fire stations
-                'police_stations': 13    # Number of police stations
-            }
+        # Personnel and rollups come from the same cached summary as the admin API
+        summary = json.loads(resource_summary_json())['data']
+        rescue_personnel = summary['personnel']
 
         context = get_template_context()
         context['rescue_personnel'] = rescue_personnel
+        context['resource_summary'] = summary
         return render_template('admin/rescue_management.html', **context)
     except Exception as e:
-        print(f"Error loading rescue management: {str(e)}")
+        sos_log.exception("Error loading rescue management")
         return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/forecasts')
@@ -564,24 +3200,7 @@ def admin_rescue_management():
 def admin_forecasts():
     """Serve the admin forecasts & alerts page"""
     context = get_template_context()
-    # Add sample data for initial development
-    context['forecast_data'] = {
-        'third_party': {
-            'trust_score': 95,
-            'criticality': 'high',
-            'forecasts': []
-        },
-        'ai_based': {
-            'trust_score': 87,
-            'criticality': 'medium',
-            'forecasts': []
-        },
-        'crowdsourced': {
-            'trust_score': 82,
-            'criticality': 'low',
-            'forecasts': []
-        }
-    }
+    context['forecast_data'] = forecast_groups(app.config['FORECAST_PAGE_SIZE'])
     return render_template('admin/forecasts.html', **context)
 
 @app.route('/api/sos-requests/<int:id>', methods=['DELETE'])
@@ -593,13 +3212,15 @@ def delete_sos_request(id):
         if not sos_request:
             return jsonify({'error': 'SOS request not found'}), 404
             
+        rollup_sos_request(sos_request, -1)
         db.session.delete(sos_request)
         db.session.commit()
         
         return jsonify({'message': 'SOS request deleted successfully'}), 200
         
     except Exception as e:
-        print(f"Error deleting SOS request: {str(e)}")
+        db.session.rollback()
+        sos_log.exception("Error deleting SOS request")
         return jsonify({'error': 'Failed to delete SOS request'}), 500
 
 @app.route('/rescue/sos-requests')
@@ -607,342 +3228,976 @@ def delete_sos_request(id):
 def sos_requests():
     """Display all SOS requests for rescue personnel"""
     try:
-        # Fetch SOS requests from database, ordered by timestamp descending
-        sos_requests = SOSRequest.query.order_by(SOSRequest.timestamp.desc()).all()
-        return render_template('sos_requests.html', sos_requests=sos_requests, **get_template_context())
+        # Fetch SOS requests from database, ordered by timestamp descending
+        sos_requests = SOSRequest.query.order_by(SOSRequest.timestamp.desc()).all()
+        return render_template('sos_requests.html', sos_requests=sos_requests, **get_template_context())
+    except Exception as e:
+        sos_log.exception("Error fetching SOS requests")
+        return render_template('sos_requests.html', sos_requests=[], error='Failed to load SOS requests', **get_template_context())
+
+@app.route('/rescue/sos-requests/<int:id>/status', methods=['POST'])
+@login_required(role='rescue')
+def update_sos_status(id):
+    """Update the status of an SOS request"""
+    try:
+        data = request.get_json()
+        new_status = data.get('status')
+        
+        if not new_status or new_status not in SOS_STATUSES:
+            return jsonify({'error': 'Invalid status'}), 400
+
+        sos_request = db.session.get(SOSRequest, id)
+        if not sos_request:
+            return jsonify({'error': 'SOS request not found'}), 404
+        old_status = sos_request.status
+        if old_status != new_status:
+            # Conditional UPDATE: of two concurrent changes from the same status only one
+            # matches, so the request leaves its old series exactly once
+            moved = db.session.execute(
+                db.update(SOSRequest)
+                .where(SOSRequest.id == id, SOSRequest.status == old_status)
+                .values(status=new_status)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not moved:
+                db.session.rollback()
+                return jsonify({'error': 'Status was changed by someone else, reload and retry'}), 409
+            # Move the request between status series in the bucket it was created in
+            rollup_sos_request(sos_request, -1, status=old_status)
+            rollup_sos_request(sos_request, 1, status=new_status)
+            db.session.commit()
+        return jsonify({'message': 'Status updated successfully'}), 200
+            
+    except Exception as e:
+        db.session.rollback()
+        sos_log.exception("Error updating SOS request status")
+        return jsonify({'error': 'Failed to update status'}), 500
+
+@app.route('/api/rescue/assignments', methods=['GET'])
+@login_required(role='rescue')
+def rescue_assignments():
+    """API endpoint for the open rescue requests assigned to the signed-in responder"""
+    try:
+        requests_assigned = RescueRequest.query.filter_by(assigned_to=session['user_id'], status='assigned') \
+            .order_by(RescueRequest.created_at).all()
+        return jsonify({
+            'status': 'success',
+            'data': [serialize_rescue_request(item) for item in requests_assigned]
+        }), 200
+    except Exception as e:
+        sos_log.exception("Error fetching rescue assignments")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch assignments'}), 500
+
+@app.route('/api/rescue/requests/<int:id>/status', methods=['POST'])
+@login_required(role='rescue')
+def update_rescue_request_status(id):
+    """API endpoint for a responder to close a rescue request, freeing their workload"""
+    try:
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('status')
+        if new_status not in ('resolved', 'cancelled'):
+            return jsonify({'status': 'error', 'message': 'Invalid status'}), 400
+
+        # Conditional UPDATE: the workload is released exactly once even if two closes race
+        closed = db.session.execute(
+            db.update(RescueRequest)
+            .where(RescueRequest.id == id, RescueRequest.assigned_to == session['user_id'],
+                   RescueRequest.status == 'assigned')
+            .values(status=new_status, closed_at=datetime.datetime.utcnow())
+        ).rowcount
+        if not closed:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': 'No open request with this id is assigned to you'}), 404
+        adjust_responder_load(session['user_id'], -1)
+        # The freed slot goes to the oldest request still waiting in this responder's region
+        dispatch_pending_to(session['user_id'])
+        db.session.commit()
+        return jsonify({'status': 'success', 'message': f'Request {new_status}'}), 200
+    except Exception as e:
+        db.session.rollback()
+        sos_log.exception("Error updating rescue request status")
+        return jsonify({'status': 'error', 'message': 'Failed to update request'}), 500
+
+@app.route('/api/admin/rescue-requests', methods=['GET'])
+@login_required(role='admin')
+def admin_rescue_requests():
+    """API endpoint for open rescue requests, oldest first; ?status=pending (default) or assigned"""
+    try:
+        status = request.args.get('status', 'pending')
+        if status not in RESCUE_OPEN_STATUSES:
+            return jsonify({'status': 'error',
+                            'message': f"Status must be one of: {', '.join(RESCUE_OPEN_STATUSES)}"}), 400
+        limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+        # Uses ix_rescue_request_status_created_at
+        open_requests = RescueRequest.query.filter_by(status=status) \
+            .order_by(RescueRequest.created_at, RescueRequest.id).limit(limit).all()
+        return jsonify({
+            'status': 'success',
+            'data': [dict(serialize_rescue_request(item), city=item.city, state=item.state,
+                          pincode=item.pincode, assigned_to=item.assigned_to)
+                     for item in open_requests]
+        }), 200
+    except Exception as e:
+        sos_log.exception("Error fetching open rescue requests")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch rescue requests'}), 500
+
+@app.route('/rescue-dashboard')
+@login_required(role='rescue')
+def rescue_dashboard():
+    """Serve the rescue dashboard page"""
+    context = get_template_context()
+    return render_template('rescue_dashboard.html', **context)
+
+# ✅ NEW: Facilities registry, loaded once per data version and indexed in memory
+FACILITY_TYPES = [
+    {'code': 'hospital', 'group_key': 'hospitals', 'label': 'Hospitals', 'icon': 'hospital'},
+    {'code': 'ambulance', 'group_key': 'ambulances', 'label': 'Ambulance', 'icon': 'ambulance'},
+    {'code': 'fire', 'group_key': 'fire_stations', 'label': 'Fire Stations', 'icon': 'fire-extinguisher'},
+    {'code': 'police', 'group_key': 'police_stations', 'label': 'Police Stations', 'icon': 'shield-alt'}
+]
+FACILITY_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'facilities')
+
+def serialize_facility(facility):
+    """Flatten a Facility and its child rows into the dict shape used by templates and APIs."""
+    location = facility.location
+    return {
+        'id': facility.id,
+        'name': facility.name,
+        'type': facility.facility_type.code,
+        'location': location.address if location else '',
+        'district': location.district if location else '',
+        'state': location.state if location else '',
+        'pincode': location.pincode if location else None,
+        'latitude': location.latitude if location else None,
+        'longitude': location.longitude if location else None,
+        'features': [{'icon': f.icon, 'text': f.text} for f in facility.features],
+        'contacts': [{'kind': c.kind, 'value': c.value} for c in facility.contacts]
+    }
+
+GEOCODES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'geocodes.json')
+EARTH_RADIUS_KM = 6371.0088
+_geocodes = None
+
+def load_geocodes():
+    """Offline gazetteer of pincode, place and district centroids (loaded once)."""
+    global _geocodes
+    if _geocodes is None:
+        try:
+            with open(GEOCODES_PATH, encoding='utf-8') as f:
+                _geocodes = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Geocode data unavailable: %s", e)
+            _geocodes = {}
+        _geocodes.setdefault('pincodes', {})
+        _geocodes.setdefault('places', {})
+        _geocodes.setdefault('districts', {})
+    return _geocodes
+
+def geocode_facility(item):
+    """Return ((lat, lng), precision) for a serialized facility, or (None, None).
+
+    Explicit coordinates win; otherwise fall back from pincode to a place name
+    found in the name/address and finally to the district centroid.
+    """
+    if item.get('latitude') is not None and item.get('longitude') is not None:
+        return (item['latitude'], item['longitude']), 'exact'
+
+    geocodes = load_geocodes()
+    if item.get('pincode') in geocodes['pincodes']:
+        return tuple(geocodes['pincodes'][item['pincode']]), 'pincode'
+
+    words = re.findall(r'[a-z]+', f"{item.get('location', '')} {item.get('name', '')}".lower())
+    for word in words:
+        if word in geocodes['places']:
+            return tuple(geocodes['places'][word]), 'place'
+
+    if item.get('district') in geocodes['districts']:
+        return tuple(geocodes['districts'][item['district']]), 'district'
+    return None, None
+
+def geocode_place(text):
+    """Coordinates of the first place, or failing that district, named in free text, or None."""
+    geocodes = load_geocodes()
+    lowered = (text or '').lower()
+    for word in re.findall(r'[a-z]+', lowered):
+        if word in geocodes['places']:
+            return tuple(geocodes['places'][word])
+    for district, coordinates in geocodes['districts'].items():
+        if district.lower() in lowered:
+            return tuple(coordinates)
+    return None
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def to_unit_vector(lat, lng):
+    """Map a coordinate onto the unit sphere; chord length grows monotonically with haversine distance."""
+    lat, lng = math.radians(lat), math.radians(lng)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+class KDTree:
+    """Static 3-d tree over unit-sphere points for k-nearest-neighbour queries.
+
+    Nodes are (index, axis, left, right) tuples; items[index] is the payload for
+    points[index]. Searching in 3-d Cartesian space avoids the distortions of
+    lat/lng near the poles and the antimeridian.
+    """
+
+    def __init__(self, items, coordinates):
+        self.items = items
+        self.points = [to_unit_vector(lat, lng) for lat, lng in coordinates]
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, indices, depth):
+        if not indices:
+            return None
+        axis = depth % 3
+        indices.sort(key=lambda i: self.points[i][axis])
+        mid = len(indices) // 2
+        return (indices[mid], axis,
+                self._build(indices[:mid], depth + 1),
+                self._build(indices[mid + 1:], depth + 1))
+
+    def nearest(self, lat, lng, k=1, predicate=None):
+        """Return up to k (item, distance_km) pairs, closest first, skipping items the predicate rejects."""
+        if k <= 0 or self.root is None:
+            return []
+        target = to_unit_vector(lat, lng)
+        points = self.points
+        heap = []  # max-heap on squared chord length via negation
+
+        def search(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            point = points[index]
+            if predicate is None or predicate(self.items[index]):
+                dist2 = ((point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2
+                         + (point[2] - target[2]) ** 2)
+                if len(heap) < k:
+                    heapq.heappush(heap, (-dist2, index))
+                elif dist2 < -heap[0][0]:
+                    heapq.heapreplace(heap, (-dist2, index))
+
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            search(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                search(far)
+
+        search(self.root)
+        results = []
+        for neg_dist2, index in sorted(heap, reverse=True):
+            chord = math.sqrt(-neg_dist2)
+            results.append((self.items[index], 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))))
+        return results
+
+def feature_predicate(feature):
+    """Case-insensitive 'feature text contains' filter, e.g. 'icu' matches 'ICU Available'."""
+    if not feature:
+        return None
+    needle = feature.lower()
+    return lambda item: any(needle in f['text'].lower() for f in item['features'])
+
+class FacilityRegistry:
+    """In-memory index of all facilities by id, type, district and pincode.
+
+    Each worker builds the index once and rebuilds it only when the shared
+    'facilities' data version changes. JSON and HTML fragments are rendered on
+    first use and kept in a bounded LRU until the next rebuild; only filters that
+    name a known type, district or pincode are cached.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.by_id = {}
+        self.by_type = {}
+        self.by_district = {}
+        self.by_pincode = {}
+        self.types = []
+        self.trees = {}
+        self._fragments = self._new_fragment_cache()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _new_fragment_cache():
+        return BytesLRUCache(app.config['FACILITY_FRAGMENT_CACHE_MAX_ENTRIES'],
+                             app.config['FACILITY_FRAGMENT_CACHE_MAX_BYTES'])
+
+    def ensure_fresh(self):
+        version = get_data_version('facilities')
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self._load(version)
+        return self
+
+    def _load(self, version):
+        facilities = Facility.query.options(
+            db.selectinload(Facility.location),
+            db.selectinload(Facility.contacts),
+            db.selectinload(Facility.features)
+        ).all()
+
+        by_id, by_type, by_district, by_pincode = {}, {}, {}, {}
+        tree_inputs = {}
+        for facility in facilities:
+            item = serialize_facility(facility)
+            coordinates, precision = geocode_facility(item)
+            item['coordinates'] = list(coordinates) if coordinates else None
+            item['geocode_precision'] = precision
+            if coordinates:
+                tree_inputs.setdefault(item['type'], ([], []))
+                tree_inputs[item['type']][0].append(item)
+                tree_inputs[item['type']][1].append(coordinates)
+            by_id[item['id']] = item
+            by_type.setdefault(item['type'], []).append(item)
+            by_district.setdefault(item['district'], []).append(item)
+            if item['pincode']:
+                by_pincode.setdefault(item['pincode'], []).append(item)
+
+        self.types = [
+            {'code': t.code, 'group_key': t.group_key, 'label': t.label, 'icon': t.icon}
+            for t in FacilityType.query.order_by(FacilityType.id).all()
+        ]
+        self.by_id, self.by_type = by_id, by_type
+        self.by_district, self.by_pincode = by_district, by_pincode
+        self.trees = {code: KDTree(items, coords) for code, (items, coords) in tree_inputs.items()}
+        self._fragments = self._new_fragment_cache()
+        self.version = version
+
+    @property
+    def districts(self):
+        return sorted(self.by_district)
+
+    def query(self, facility_type=None, district=None, pincode=None):
+        """Return facilities matching all given filters, starting from the narrowest index."""
+        if pincode:
+            candidates = self.by_pincode.get(pincode, [])
+        elif district:
+            candidates = self.by_district.get(district, [])
+        elif facility_type:
+            candidates = self.by_type.get(facility_type, [])
+        else:
+            candidates = list(self.by_id.values())
+        return [
+            item for item in candidates
+            if (not facility_type or item['type'] == facility_type)
+            and (not district or item['district'] == district)
+        ]
+
+    def nearest(self, lat, lng, facility_type, k=3, feature=None):
+        """k nearest facilities of one type by great-circle distance, optionally filtered by feature."""
+        tree = self.trees.get(facility_type)
+        if tree is None:
+            return []
+        return tree.nearest(lat, lng, k, feature_predicate(feature))
+
+    def grouped(self, district):
+        """Facilities for one district grouped the way resources.html expects."""
+        groups = {t['group_key']: [] for t in self.types}
+        group_for_type = {t['code']: t['group_key'] for t in self.types}
+        for item in self.by_district.get(district, []):
+            groups[group_for_type[item['type']]].append(item)
+        return groups
+
+    def fragment(self, key, build, cacheable=True):
+        """Return a cached pre-serialized fragment, building it on first use."""
+        entry = self._fragments.get(key)
+        if entry is not None:
+            return entry[0]
+        value = build()
+        if cacheable:
+            self._fragments.put(key, value)
+        return value
+
+    def known_filters(self, facility_type=None, district=None, pincode=None):
+        """True when every given filter names something in the index, so its key is worth caching."""
+        return ((not facility_type or facility_type in self.by_type)
+                and (not district or district in self.by_district)
+                and (not pincode or pincode in self.by_pincode))
+
+    def json_bytes(self, facility_type=None, district=None, pincode=None):
+        key = ('json', facility_type, district, pincode)
+        return self.fragment(key, lambda: json.dumps({
+            'status': 'success',
+            'version': self.version,
+            'data': self.query(facility_type, district, pincode)
+        }, ensure_ascii=False).encode('utf-8'), self.known_filters(facility_type, district, pincode))
+
+    def cards_html(self, district):
+        icons = {t['code']: t['icon'] for t in self.types}
+        return self.fragment(('html', district), lambda: Markup(render_template(
+            'components/facility_cards.html',
+            facilities=self.by_district.get(district, []),
+            type_icons=icons
+        )), self.known_filters(district=district))
+
+facility_registry = FacilityRegistry()
+
+def seed_facilities():
+    """Create facility types and load every district file not yet in the database."""
+    existing_types = {t.code: t for t in FacilityType.query.all()}
+    for spec in FACILITY_TYPES:
+        if spec['code'] not in existing_types:
+            existing_types[spec['code']] = FacilityType(**spec)
+            db.session.add(existing_types[spec['code']])
+    db.session.flush()
+
+    seeded_districts = {row[0] for row in db.session.query(FacilityLocation.district).distinct()}
+    data_files = sorted(os.listdir(FACILITY_DATA_DIR)) if os.path.isdir(FACILITY_DATA_DIR) else []
+    changed = False
+    for filename in data_files:
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(FACILITY_DATA_DIR, filename), encoding='utf-8') as f:
+            district_data = json.load(f)
+        if district_data['district'] in seeded_districts:
+            continue
+        for item in district_data['facilities']:
+            db.session.add(build_facility(item, existing_types,
+                                          district_data['district'], district_data.get('state')))
+        changed = True
+    db.session.commit()
+    if changed:
+        bump_data_version('facilities')
+
+def build_facility(item, facility_types, district, state=None):
+    """Build a Facility with its location, contacts and features from a plain dict."""
+    facility = Facility(name=item['name'], facility_type=facility_types[item['type']])
+    facility.location = FacilityLocation(
+        address=item.get('address', ''),
+        district=district,
+        state=state,
+        pincode=item.get('pincode'),
+        latitude=item.get('latitude'),
+        longitude=item.get('longitude')
+    )
+    facility.contacts = [FacilityContact(kind=c['kind'], value=c['value']) for c in item.get('contacts', [])]
+    facility.features = [FacilityFeature(icon=f.get('icon'), text=f['text']) for f in item.get('features', [])]
+    return facility
+
+# ✅ NEW: Full-text facility search (SQLite FTS5, rowid = Facility.id)
+FACILITY_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS facility_fts USING fts5("
+    "name, kind, location, features, contacts, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+# bm25 column weights follow the column order above: a name hit outranks a contact hit.
+# Set as the table's rank function, so ORDER BY rank LIMIT ranks every match and keeps
+# only the best :limit in a bounded sort.
+FACILITY_FTS_RANK_SQL = (
+    "INSERT INTO facility_fts (facility_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 3.0, 2.0, 1.0)')"
+)
+FACILITY_SEARCH_SQL = (
+    "SELECT rowid FROM facility_fts WHERE facility_fts MATCH :match ORDER BY rank LIMIT :limit"
+)
+FACILITY_FTS_INSERT_SQL = (
+    "INSERT INTO facility_fts (rowid, name, kind, location, features, contacts) "
+    "VALUES (:id, :name, :kind, :location, :features, :contacts)"
+)
+
+def facility_search_row(item):
+    """Flatten a serialized facility into the text columns of facility_fts."""
+    type_labels = {t['code']: t['label'] for t in FACILITY_TYPES}
+    return {
+        'id': item['id'],
+        'name': item['name'],
+        'kind': f"{item['type']} {type_labels.get(item['type'], '')}",
+        'location': ' '.join(filter(None, [item['location'], item['district'], item['state'], item['pincode']])),
+        'features': ' '.join(f['text'] for f in item['features']),
+        'contacts': ' '.join(c['value'] for c in item['contacts'])
+    }
+
+def build_fts_match_query(query, facility_type=None):
+    """Turn free text like 'ICU Burdwan' into an FTS5 query of quoted prefix terms.
+
+    Every term must match (implicit AND); quoting keeps user input from being
+    parsed as FTS5 operators.
+    """
+    terms = re.findall(r'\w+', query.lower())[:8]
+    if not terms:
+        return None
+    match = ' '.join(f'"{term}"*' for term in terms)
+    if facility_type:
+        match = f'kind : "{facility_type}" AND ({match})'
+    return match
+
+def index_facility(facility):
+    """Insert or replace one facility's row in the search index (caller commits)."""
+    db.session.execute(text("DELETE FROM facility_fts WHERE rowid = :id"), {'id': facility.id})
+    db.session.execute(text(FACILITY_FTS_INSERT_SQL), facility_search_row(serialize_facility(facility)))
+
+def sync_facility_search_index():
+    """Rebuild the search index if it is out of step with the facility tables."""
+    indexed = db.session.execute(text("SELECT count(*) FROM facility_fts")).scalar()
+    if indexed == Facility.query.count():
+        return
+    db.session.execute(text("DELETE FROM facility_fts"))
+    facilities = Facility.query.options(
+        db.selectinload(Facility.location),
+        db.selectinload(Facility.contacts),
+        db.selectinload(Facility.features)
+    ).all()
+    rows = [facility_search_row(serialize_facility(f)) for f in facilities]
+    if rows:
+        db.session.execute(text(FACILITY_FTS_INSERT_SQL), rows)
+    db.session.commit()
+
+@app.route('/resources')
+@login_required(role='rescue')
+@cached_page('facilities', vary_on_user=True)
+def resources():
+    """Serve the emergency resources page with critical facilities data"""
+    try:
+        registry = facility_registry.ensure_fresh()
+        district = request.args.get('district')
+        if district not in registry.by_district:
+            user = db.session.get(User, session['user_id'])
+            district = user.city if user and user.city in registry.by_district else None
+        if district is None and registry.districts:
+            district = registry.districts[0]
+
+        context = get_template_context()
+        context['resources_data'] = registry.grouped(district)
+        context['facility_cards_html'] = registry.cards_html(district)
+        context['districts'] = registry.districts
+        context['current_district'] = district
+        return render_template('resources.html', **context)
+        
+    except Exception as e:
+        log.exception("Error loading resources")
+        return render_template('resources.html',
+                             error='Failed to load emergency resources',
+                             **get_template_context()), 500
+
+@app.route('/api/facilities')
+@login_required()
+@etag_from_versions('facilities')
+def get_facilities():
+    """API endpoint for facilities filtered by type, district and/or pincode"""
+    try:
+        registry = facility_registry.ensure_fresh()
+        body = registry.json_bytes(
+            facility_type=request.args.get('type') or None,
+            district=request.args.get('district') or None,
+            pincode=request.args.get('pincode') or None
+        )
+        return Response(body, mimetype='application/json')
+    except Exception as e:
+        log.exception("Error fetching facilities")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch facilities'}), 500
+
+@app.route('/api/facilities/search')
+@login_required()
+@etag_from_versions('facilities')
+def search_facilities():
+    """API endpoint for ranked full-text facility search with prefix matching"""
+    try:
+        facility_type = request.args.get('type') or None
+        if facility_type and facility_type not in {t['code'] for t in FACILITY_TYPES}:
+            return jsonify({'status': 'error', 'message': 'Unknown facility type'}), 400
+        match = build_fts_match_query(request.args.get('q', ''), facility_type)
+        if not match:
+            return jsonify({'status': 'error', 'message': 'Search query is required'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+        registry = facility_registry.ensure_fresh()
+        rows = db.session.execute(text(FACILITY_SEARCH_SQL), {'match': match, 'limit': limit})
+        results = [registry.by_id[row[0]] for row in rows if row[0] in registry.by_id]
+
+        return jsonify({
+            'status': 'success',
+            'data': results
+        }), 200
+    except Exception as e:
+        log.exception("Error searching facilities")
+        return jsonify({'status': 'error', 'message': 'Failed to search facilities'}), 500
+
+# Default "who do we send" answer for an SOS: ICU hospitals plus the nearest of each service
+SOS_DISPATCH_PLAN = [
+    {'type': 'hospital', 'k': 3, 'feature': 'ICU'},
+    {'type': 'ambulance', 'k': 1, 'feature': None},
+    {'type': 'fire', 'k': 1, 'feature': None},
+    {'type': 'police', 'k': 1, 'feature': None}
+]
+
+def parse_coordinates(value):
+    """Parse 'lat,lng' (as sent by the SOS button) into floats, or return None."""
+    match = re.match(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$', value or '')
+    if not match:
+        return None
+    lat, lng = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+def nearest_results(registry, lat, lng, facility_type, k, feature=None):
+    return [
+        dict(item, distance_km=round(distance, 2))
+        for item, distance in registry.nearest(lat, lng, facility_type, k, feature)
+    ]
+
+@app.route('/api/facilities/nearest')
+@login_required()
+@etag_from_versions('facilities')
+def nearest_facilities():
+    """API endpoint for the k nearest facilities of a type to a coordinate"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        facility_type = request.args.get('type')
+        if lat is None or lng is None or not facility_type:
+            return jsonify({'status': 'error', 'message': 'lat, lng and type are required'}), 400
+        k = min(max(request.args.get('k', 3, type=int), 1), 50)
+
+        registry = facility_registry.ensure_fresh()
+        return jsonify({
+            'status': 'success',
+            'data': nearest_results(registry, lat, lng, facility_type, k, request.args.get('feature'))
+        }), 200
+    except Exception as e:
+        log.exception("Error finding nearest facilities")
+        return jsonify({'status': 'error', 'message': 'Failed to find nearest facilities'}), 500
+
+@app.route('/api/sos-requests/<int:id>/nearest-facilities')
+@login_required(role='rescue')
+def sos_nearest_facilities(id):
+    """API endpoint for the dispatch shortlist (nearest ICU hospitals, ambulance, fire, police) for an SOS"""
+    try:
+        sos_request = db.session.get(SOSRequest, id)
+        if not sos_request:
+            return jsonify({'error': 'SOS request not found'}), 404
+        coordinates = parse_coordinates(sos_request.location)
+        if not coordinates:
+            return jsonify({'error': 'SOS request has no coordinates'}), 422
+
+        registry = facility_registry.ensure_fresh()
+        lat, lng = coordinates
+        return jsonify({
+            'status': 'success',
+            'location': {'lat': lat, 'lng': lng},
+            'data': {
+                plan['type']: nearest_results(registry, lat, lng, plan['type'], plan['k'], plan['feature'])
+                for plan in SOS_DISPATCH_PLAN
+            }
+        }), 200
+    except Exception as e:
+        sos_log.exception("Error finding facilities for SOS request")
+        return jsonify({'error': 'Failed to find nearest facilities'}), 500
+
+@app.route('/api/admin/facilities', methods=['POST'])
+@login_required(role='admin')
+def create_facility():
+    """API endpoint for adding a facility to the registry"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('name') or not data.get('type') or not data.get('district'):
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required fields: name, type or district'
+            }), 400
+        if data.get('pincode') and not re.match(r'^[0-9]{6}$', data['pincode']):
+            return jsonify({'status': 'error', 'message': 'Invalid PIN code format'}), 400
+        try:
+            for key in ('latitude', 'longitude'):
+                if data.get(key) is not None:
+                    data[key] = float(data[key])
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Invalid coordinates'}), 400
+
+        facility_types = {t.code: t for t in FacilityType.query.all()}
+        if data['type'] not in facility_types:
+            return jsonify({'status': 'error', 'message': 'Unknown facility type'}), 400
+
+        facility = build_facility(data, facility_types, data['district'], data.get('state'))
+        db.session.add(facility)
+        db.session.flush()
+        index_facility(facility)
+        db.session.commit()
+        bump_data_version('facilities')
+
+        return jsonify({'status': 'success', 'data': serialize_facility(facility)}), 201
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Error creating facility")
+        return jsonify({'status': 'error', 'message': 'Failed to create facility'}), 500
+
+@app.route('/api/admin/facilities/<int:id>', methods=['DELETE'])
+@login_required(role='admin')
+def delete_facility(id):
+    """API endpoint for removing a facility from the registry"""
+    try:
+        facility = db.session.get(Facility, id)
+        if not facility:
+            return jsonify({'status': 'error', 'message': 'Facility not found'}), 404
+        db.session.delete(facility)
+        db.session.execute(text("DELETE FROM facility_fts WHERE rowid = :id"), {'id': id})
+        db.session.commit()
+        bump_data_version('facilities')
+        return jsonify({'status': 'success', 'message': 'Facility deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Error deleting facility")
+        return jsonify({'status': 'error', 'message': 'Failed to delete facility'}), 500
+
+# ✅ NEW: Fingerprinted asset URLs (built by build_assets.py) served with immutable caching
+_asset_manifest = {'mtime': None, 'version': None, 'assets': {}}
+
+def load_asset_manifest():
+    """Return the build manifest, re-reading it only when the file changes."""
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        # No build: templates fall back to the unbundled files in static/
+        _asset_manifest.update(mtime=None, version=None, assets={})
+        return _asset_manifest
+    if mtime != _asset_manifest['mtime']:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            manifest = json.load(f)
+        _asset_manifest.update(mtime=mtime, version=manifest['version'], assets=manifest['assets'])
+    return _asset_manifest
+
+@app.template_global()
+def asset_url(filename):
+    """URL of the fingerprinted build of a static file, or the plain static URL without a build."""
+    hashed = load_asset_manifest()['assets'].get(filename)
+    if hashed:
+        return url_for('assets', filename=hashed)
+    return url_for('static', filename=filename)
+
+@app.template_global()
+def bundle_urls(bundle_name):
+    """URLs that load a bundle: one fingerprinted file when built, else each member file."""
+    hashed = load_asset_manifest()['assets'].get(f'bundles/{bundle_name}')
+    if hashed:
+        return [url_for('assets', filename=hashed)]
+    return [url_for('static', filename=member) for member in ASSET_BUNDLES[bundle_name]]
+
+def send_precompressed(directory, filename, public=True):
+    """Send a content-addressed file, preferring its .br/.gz sibling, cached for a year."""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(directory, filename, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.public = False
+        response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/assets/<path:filename>')
+def assets(filename):
+    """Serve built assets, preferring precompressed .br/.gz variants, cached for a year"""
+    return send_precompressed(DIST_DIR, filename)
+
+# ✅ NEW: Offline district data packs (guidelines, facilities and helplines in one file per district).
+# Packs hold only public information and are served without login; rescue staff fetch their
+# district's resource counts separately (data_pack_resources).
+DATA_PACK_SCHEMA_VERSION = 1
+_data_pack_index = {}
+
+def district_slug(district):
+    return re.sub(r'[^a-z0-9]+', '-', district.lower()).strip('-')
+
+def data_pack_dir(slug):
+    return os.path.join(app.config['DATA_PACK_DIR'], slug)
+
+def build_data_pack(district):
+    """Everything the PWA needs offline for one district, as a plain dict."""
+    facilities = sorted(facility_registry.by_district.get(district, []), key=lambda item: item['id'])
+    return {
+        'schema': DATA_PACK_SCHEMA_VERSION,
+        'district': district,
+        'state': facilities[0]['state'] if facilities else None,
+        'facility_types': facility_registry.types,
+        'resources': facilities,
+        'contacts': EMERGENCY_CONTACTS,
+        'guidelines': GUIDELINES_DATA
+    }
+
+def write_atomic(path, data):
+    # Several workers may publish the same pack at once; readers never see a partial file
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def publish_data_pack(district):
+    """Write the district's pack as <slug>/<content hash>.json (+ .gz/.br) and return its metadata.
+
+    Identical content keeps its version, so a facilities change in another
+    district does not make this one download anything. Only the newest
+    DATA_PACK_HISTORY versions are kept on disk to answer delta requests.
+    """
+    slug = district_slug(district)
+    key = (slug, facility_registry.version, get_data_version('guidelines'))
+    meta = _data_pack_index.get(slug)
+    if meta and meta['key'] == key:
+        return meta
+
+    body = json.dumps(build_data_pack(district), ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+    version = hashlib.sha256(body).hexdigest()[:16]
+    directory = data_pack_dir(slug)
+    path = os.path.join(directory, f'{version}.json')
+    if not os.path.isfile(path):
+        os.makedirs(directory, exist_ok=True)
+        write_atomic(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+        if brotli is not None:
+            write_atomic(path + '.br', brotli.compress(body, quality=11))
+        write_atomic(path, body)
+        prune_data_packs(directory)
+    else:
+        # Content went back to an earlier version: mark it newest so pruning keeps it
+        os.utime(path)
+
+    meta = {
+        'key': key,
+        'district': district,
+        'slug': slug,
+        'version': version,
+        'size': len(body),
+        'url': url_for('data_pack_file', slug=slug, filename=f'{version}.json')
+    }
+    _data_pack_index[slug] = meta
+    return meta
+
+def prune_data_packs(directory):
+    versions = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+                      key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[app.config['DATA_PACK_HISTORY']:]:
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(entry.path + suffix)
+            except FileNotFoundError:
+                pass
+
+def load_data_pack(slug, version):
+    """Read an earlier published pack from disk, or None once it has been pruned."""
+    if not re.fullmatch(r'[0-9a-f]{16}', version or ''):
+        return None
+    try:
+        with open(os.path.join(data_pack_dir(slug), f'{version}.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def diff_data_packs(old, new):
+    """Delta from one pack to the next: upserted and removed resources plus any replaced sections."""
+    old_resources = {item['id']: item for item in old['resources']}
+    new_ids = {item['id'] for item in new['resources']}
+    delta = {
+        'upsert': [item for item in new['resources'] if old_resources.get(item['id']) != item],
+        'remove': sorted(set(old_resources) - new_ids),
+        'replace': {}
+    }
+    for section in ('schema', 'district', 'state', 'facility_types', 'contacts', 'guidelines'):
+        if old.get(section) != new[section]:
+            delta['replace'][section] = new[section]
+    return delta
+
+def find_district(slug):
+    for district in facility_registry.ensure_fresh().districts:
+        if district_slug(district) == slug:
+            return district
+    return None
+
+@app.route('/api/data-packs')
+@etag_from_versions('facilities', 'guidelines')
+def list_data_packs():
+    """API endpoint listing the current data pack version and URL for every district"""
+    try:
+        packs = [publish_data_pack(district) for district in facility_registry.ensure_fresh().districts]
+        return jsonify({
+            'status': 'success',
+            'data': [{k: v for k, v in meta.items() if k != 'key'} for meta in packs]
+        }), 200
     except Exception as e:
-        print(f"Error fetching SOS requests: {str(e)}")
-        return render_template('sos_requests.html', sos_requests=[], error='Failed to load SOS requests', **get_template_context())
+        log.exception("Error listing data packs")
+        return jsonify({'status': 'error', 'message': 'Failed to list data packs'}), 500
 
-@app.route('/rescue/sos-requests/<int:id>/status', methods=['POST'])
-@login_required(role='rescue')
-def update_sos_status(id):
-    """Update the status of an SOS request"""
+@app.route('/data-packs/<slug>/<filename>')
+def data_pack_file(slug, filename):
+    """Serve one published data pack; each version is immutable and public"""
+    return send_precompressed(app.config['DATA_PACK_DIR'], f'{slug}/{filename}', public=True)
+
+@app.route('/api/data-packs/<slug>/delta')
+@etag_from_versions('facilities', 'guidelines')
+def data_pack_delta(slug):
+    """API endpoint returning the changes to a district pack since the version the client holds"""
     try:
-        data = request.get_json()
-        new_status = data.get('status')
-        
-        if not new_status or new_status not in ['pending', 'handled', 'closed']:
-            return jsonify({'error': 'Invalid status'}), 400
-            
-        if broadcast_sos_update(id, new_status):
-            return jsonify({'message': 'Status updated successfully'}), 200
+        district = find_district(slug)
+        if not district:
+            return jsonify({'status': 'error', 'message': 'Unknown district'}), 404
+        meta = publish_data_pack(district)
+        since = request.args.get('since', '')
+        result = {'status': 'success', 'version': meta['version'], 'since': since}
+        if since == meta['version']:
+            result['changed'] = False
+            return jsonify(result), 200
+
+        old = load_data_pack(meta['slug'], since)
+        result['changed'] = True
+        if old is None:
+            # Unknown or pruned version: the client downloads the full pack instead
+            result.update(full=True, url=meta['url'], size=meta['size'])
         else:
-            return jsonify({'error': 'Failed to update status'}), 500
-            
+            current = load_data_pack(meta['slug'], meta['version'])
+            if current is None:
+                # Another worker published a newer pack and pruned this one: publish again,
+                # which re-reads the data and rewrites the file if it is still current
+                _data_pack_index.pop(meta['slug'], None)
+                meta = publish_data_pack(district)
+                current = load_data_pack(meta['slug'], meta['version'])
+            if current is None:
+                return jsonify({'status': 'error', 'message': 'Data pack is being republished, retry shortly'}), 409
+            result.update(version=meta['version'], full=False, delta=diff_data_packs(old, current))
+        return jsonify(result), 200
     except Exception as e:
-        print(f"Error updating SOS request status: {str(e)}")
-        return jsonify({'error': 'Failed to update status'}), 500
-
-@app.route('/rescue-dashboard')
-@login_required(role='rescue')
-def rescue_dashboard():
-    """Serve the rescue dashboard page"""
-    context = get_template_context()
-    return render_template('rescue_dashboard.html', **context)
+        log.exception("Error building data pack delta")
+        return jsonify({'status': 'error', 'message': 'Failed to build data pack delta'}), 500
 
-@app.route('/resources')
+@app.route('/api/data-packs/<slug>/resources')
 @login_required(role='rescue')
-def resources():
-    """Serve the emergency resources page with critical facilities data"""
+@etag_from_versions('facilities', 'resources')
+def data_pack_resources(slug):
+    """API endpoint for the rescue-only part of a district pack: resource totals in its region"""
     try:
-        # In a real app, this would fetch from database
-        resources_data = {
-            'hospitals': [
-                {
-                    'name': 'Teresa Memorial Hospital',
-                    'location': 'Bamchandaipur 12, Near Anamoy, National Highway 2, Alisha-713103',
-                    'features': [
-                        {'icon': 'bed', 'text': 'Beds Available'},
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Available'}
-                    ],
-                    'contact': '07487947073',
-                    'type': 'hospital'
-                },
-                {
-                    'name': 'Apollo Nursing Home',
-                    'location': 'Khoshbagan, Burdwan, Burdwan HO-713101',
-                    'features': [
-                        {'icon': 'bed', 'text': '~750 Beds'},
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Available'}
-                    ],
-                    'contact': '+919933939344, 09051032383',
-                    'type': 'hospital'
-                },
-                {
-                    'name': 'Bengal Faith Hospital',
-                    'location': 'Beside Rice & Spice Grocery Shop, Near Nababhat More, Health City, Godda, Lakurdi-713102',
-                    'features': [
-                        {'icon': 'bed', 'text': '150 Beds'},
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Available'}
-                    ],
-                    'contact': '8016484040',
-                    'emergency': '18003131141',
-                    'helpline': '8420382000',
-                    'type': 'hospital'
-                },
-                {
-                    'name': 'Burdwan Medical College',
-                    'location': 'Baburbag, Burdwan-713104',
-                    'features': [
-                        {'icon': 'bed', 'text': '1200+ Beds'},
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Available'}
-                    ],
-                    'contact': '(0342) 7962201',
-                    'email': ['burdwanmedicalcollege76@gmail.com', 'principalbmc2015@gmail.com'],
-                    'type': 'hospital'
-                },
-                {
-                    'name': 'BIMS Hospital',
-                    'location': 'Shrachi Renaissance Township, newabhat Bus stand, Purba Bardhaman',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Available'},
-                        {'icon': 'ambulance', 'text': '24×7 Ambulance'}
-                    ],
-                    'contact': '+91 9232146170',
-                    'email': ['bimshospital30@gmail.com', 'hospitalbims@gmail.com'],
-                    'website': 'bimshospital.in',
-                    'type': 'hospital'
-                }
-            ],
-            'ambulances': [
-                {
-                    'name': 'Alampur Ambulance Services',
-                    'location': 'Alampur, Bardhaman - 713141 (Dewandighi, Talit)',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'Emergency Service'}
-                    ],
-                    'type': 'ambulance'
-                },
-                {
-                    'name': 'Maa Ambulance Services',
-                    'location': 'Ground Floor, Burdwan City-713101',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'Emergency Service'}
-                    ],
-                    'contact': '08460465556',
-                    'type': 'ambulance'
-                },
-                {
-                    'name': 'Rajbati Ambulance Services',
-                    'location': 'Rajbati, Burdwan Sadar, Keshabganj Chatti-713104',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'Emergency Service'}
-                    ],
-                    'type': 'ambulance'
-                },
-                {
-                    'name': 'T ICU Ambulance Service',
-                    'location': 'Khosbagan, Kolkata, Khosbagan-713101',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'ICU Equipped'}
-                    ],
-                    'type': 'ambulance'
-                },
-                {
-                    'name': 'New Life Hospital Ambulance Service',
-                    'location': 'Saraitikar More (Near Police Fare, GT Road, Golapbag-713104)',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-medical', 'text': 'Emergency Service'}
-                    ],
-                    'type': 'ambulance'
-                }
-            ],
-            'fire_stations': [
-                {
-                    'name': 'Main Fire Station, Bardhaman',
-                    'location': 'Burdwan Medical College, Bardhaman HO, Bardhaman - 713101',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-monster', 'text': 'Headquarters Fire Station'}
-                    ],
-                    'contact': '(0342) 2556901',
-                    'type': 'fire'
-                },
-                {
-                    'name': 'Burdwan Fire Station, Bajepratappur',
-                    'location': 'Bajepratappur, Bardhaman - 713101',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-monster', 'text': 'Fire Service'}
-                    ],
-                    'contact': '(0342) 2556901',
-                    'type': 'fire'
-                },
-                {
-                    'name': 'Burdwan Fire Station, Khagragorh',
-                    'location': 'Khagragorh, Bardhaman - 713104',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'truck-monster', 'text': 'Fire Service'}
-                    ],
-                    'contact': '(0342) 2657901',
-                    'type': 'fire'
-                }
-            ],
-            'police_stations': [
-                {
-                    'name': 'Burdwan PS (Burdwan Sadar)',
-                    'location': 'Burdwan',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'contact': ['0342-2664466', '0342-2664467'],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Kalna PS',
-                    'location': 'Kalna',
-                    'contact': '03454-255040',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Katwa PS',
-                    'location': 'Katwa',
-                    'contact': '03453-255023',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Ausgram PS',
-                    'location': 'Ausgram',
-                    'contact': '03452-254213',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Purbasthali PS',
-                    'location': 'Purbasthali',
-                    'contact': '+91-8509920662',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Memari PS',
-                    'location': 'Memari',
-                    'contact': '0342-2250232',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Madhabdihi PS',
-                    'location': 'Madhabdihi',
-                    'contact': '03451-251230',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Raina PS',
-                    'location': 'Raina',
-                    'contact': '03451-260230',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Galsi PS',
-                    'location': 'Galsi',
-                    'contact': '0342-2450238',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Bhatar PS',
-                    'location': 'Bhatar',
-                    'contact': '0342-2322223',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Jamalpur PS',
-                    'location': 'Jamalpur',
-                    'contact': '03451-288225',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Monteswar PS',
-                    'location': 'Monteswar',
-                    'contact': '0342-2750523',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Nadanghat PS',
-                    'location': 'Nadanghat',
-                    'contact': '+91-8016256018',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                },
-                {
-                    'name': 'Khandaghosh PS',
-                    'location': 'Khandaghosh',
-                    'contact': '03451-262260',
-                    'features': [
-                        {'icon': 'clock', 'text': '24/7'},
-                        {'icon': 'shield', 'text': 'Police Station'}
-                    ],
-                    'type': 'police'
-                }
-            ]
-        }
-        
-        context = get_template_context()
-        context['resources_data'] = resources_data
-        return render_template('resources.html', **context)
-        
+        district = find_district(slug)
+        if not district:
+            return jsonify({'status': 'error', 'message': 'Unknown district'}), 404
+        facilities = facility_registry.by_district.get(district, [])
+        regions = dispatch_regions(city=district, state=facilities[0]['state'] if facilities else None)
+        query = db.session.query(ResourceSummary.category, db.func.sum(ResourceSummary.total)) \
+            .filter(ResourceSummary.city == (regions['city'] or ''))
+        if regions['state']:
+            query = query.filter(ResourceSummary.state == regions['state'])
+        totals = dict(query.group_by(ResourceSummary.category).all())
+        return jsonify({
+            'status': 'success',
+            'district': district,
+            'resource_counts': {category: totals.get(category) or 0 for category in RESOURCE_CATEGORIES},
+            'category_labels': RESOURCE_CATEGORY_LABELS
+        }), 200
     except Exception as e:
-        print(f"Error loading resources: {str(e)}")
-        return render_template('resources.html',
-                             error='Failed to load emergency resources',
-                             **get_template_context())
+        log.exception("Error fetching data pack resources")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch resource counts'}), 500
 
 # PWA specific routes
 @app.route('/manifest.json')
@@ -953,12 +4208,42 @@ def manifest():
 
 @app.route('/service-worker.js')
 def service_worker():
-    """Serve service worker with correct MIME type"""
-    return send_from_directory(app.static_folder, 'service-worker.js',
-                             mimetype='application/javascript')
+    """Serve the service worker generated from the current asset build"""
+    build = load_asset_manifest()
+    bundled = {member for members in ASSET_BUNDLES.values() for member in members}
+    precache = ['/', url_for('manifest'), url_for('static', filename='disastrous_logo_192X192.png')]
+    for bundle_name in ASSET_BUNDLES:
+        precache.extend(bundle_urls(bundle_name))
+    # Page-specific scripts and styles; bundle members are already covered above
+    precache.extend(url_for('assets', filename=hashed)
+                    for logical, hashed in sorted(build['assets'].items())
+                    if not logical.startswith('bundles/') and logical not in bundled)
+
+    # Pages behind login_required (the flag survives outer decorators through functools.wraps)
+    private_paths = sorted({
+        rule.rule.split('<', 1)[0] for rule in app.url_map.iter_rules()
+        if 'GET' in rule.methods and not rule.rule.startswith('/api/')
+        and hasattr(app.view_functions[rule.endpoint], 'login_role')
+    })
+    sw_config = {
+        'version': f"{BUILD_ID}-{build['version'] or 'unbuilt'}",
+        'privatePaths': private_paths,
+        'precache': precache,
+        'optionalPrecache': ['https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'],
+        'streamPaths': [url_for('sos_updates')],
+        'sosPath': url_for('handle_sos'),
+        'sosSyncTag': 'sos-queue',
+        'apiTimeoutMs': 4000
+    }
+    response = make_response(render_template('service-worker.js', sw_config=sw_config))
+    response.mimetype = 'application/javascript'
+    # Browsers must revalidate the worker itself so new builds are picked up promptly
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # ✅ NEW: A4F API Endpoints using OpenAI SDK
 @app.route('/api/translate', methods=['POST'])
+@rate_limit('translate')
 def translate():
     """
     Translate text using A4F OpenAI-compatible API with comprehensive error handling,
@@ -984,7 +4269,7 @@ def translate():
         if len(text) > 10000:
             return jsonify({'error': 'Text too long (maximum 10,000 characters allowed)'}), 400
         
-        print(f"[INFO] Translation request - Length: {len(text)} chars, Target: {target_language}")
+        llm_log.info("Translation request", extra={'chars': len(text), 'target_language': target_language})
         
         # Sanitize text to prevent Unicode encoding errors
         original_text = text
@@ -994,7 +4279,8 @@ def translate():
             return jsonify({'error': 'Text contains only invalid characters after sanitization'}), 400
         
         if len(text) != len(original_text):
-            print(f"[WARNING] Text sanitized: {len(original_text)} -> {len(text)} chars")
+            llm_log.warning("Translation text sanitized", extra={'chars_before': len(original_text),
+                                                                 'chars_after': len(text)})
         
         # Check if AI service is available
         if not openai_client:
@@ -1009,7 +4295,9 @@ def translate():
         
         for attempt in range(max_retries):
             try:
-                print(f"[INFO] Translation attempt {attempt + 1}/{max_retries}")
+                llm_log.debug("Translation attempt", extra={'attempt': attempt + 1, 'max_retries': max_retries})
+                if attempt > 0:
+                    metrics.inc('llm_retries_total', operation='translate')
                 
                 # Enhanced translation prompt
                 prompt = f"""You are a professional translator for a disaster management web application.
@@ -1047,7 +4335,7 @@ def translate():
                     )
                     
                     api_time = time.time() - start_time
-                    print(f"[INFO] API call completed in {api_time:.2f} seconds")
+                    llm_log.debug("Translation API call completed", extra={'api_time': round(api_time, 3)})
                     
                     # Validate response
                     if not response or not response.choices:
@@ -1061,7 +4349,9 @@ def translate():
                     if not translated_text:
                         raise ValueError("Translation result is only whitespace")
                     
-                    print(f"[SUCCESS] Translation completed successfully on attempt {attempt + 1}")
+                    record_llm_call('translate', api_time, 'success')
+                    llm_log.info("Translation completed", extra={'attempt': attempt + 1,
+                                                                 'api_time': round(api_time, 3)})
                     return jsonify({
                         'translated_text': translated_text,
                         'original_text': original_text,
@@ -1074,7 +4364,8 @@ def translate():
                 except Exception as api_error:
                     last_error = api_error
                     error_msg = str(api_error)
-                    print(f"[ERROR] API call failed on attempt {attempt + 1}: {error_msg}")
+                    llm_log.warning("Translation API call failed: %s", error_msg, extra={'attempt': attempt + 1})
+                    record_llm_call('translate', time.time() - start_time, 'error')
                     
                     # Check if it's a retryable error
                     retryable_errors = [
@@ -1095,14 +4386,14 @@ def translate():
                     # Wait before retry (exponential backoff with jitter)
                     if attempt < max_retries - 1:
                         delay = min(base_delay * (2 ** attempt) + (time.time() % 1), max_delay)
-                        print(f"[INFO] Waiting {delay:.1f} seconds before retry...")
+                        llm_log.debug("Waiting before translation retry", extra={'delay': round(delay, 1)})
                         time.sleep(delay)
                     
             except KeyboardInterrupt:
                 return jsonify({'error': 'Translation interrupted by user'}), 499
             except Exception as unexpected_error:
                 last_error = unexpected_error
-                print(f"[ERROR] Unexpected error on attempt {attempt + 1}: {str(unexpected_error)}")
+                llm_log.exception("Unexpected translation error", extra={'attempt': attempt + 1})
                 
                 if attempt < max_retries - 1:
                     time.sleep(base_delay * (attempt + 1))
@@ -1112,7 +4403,7 @@ def translate():
         if last_error:
             error_message += f". Last error: {str(last_error)}"
         
-        print(f"[FAILED] {error_message}")
+        llm_log.error(error_message)
         return jsonify({
             'error': error_message,
             'status': 'failed',
@@ -1123,8 +4414,7 @@ def translate():
     except Exception as e:
         # Catch-all for any other errors
         error_msg = str(e)
-        print(f"[CRITICAL] Unexpected translation error: {error_msg}")
-        traceback.print_exc()
+        llm_log.exception("Translation system error")
         
         return jsonify({
             'error': f'Translation system error: {error_msg}',
@@ -1133,6 +4423,7 @@ def translate():
         }), 500
 
 @app.route('/api/chat', methods=['POST'])
+@rate_limit('chat')
 def chat():
     """
     Chat with A4F AI models with improved error handling and timeout protection.
@@ -1159,7 +4450,7 @@ def chat():
         if len(message) > 5000:
             return jsonify({'error': 'Message too long (maximum 5,000 characters allowed)'}), 400
         
-        print(f"[INFO] Chat request - Type: {chat_type}, Lang: {language}, Length: {len(message)} chars")
+        llm_log.info("Chat request", extra={'chat_type': chat_type, 'language': language, 'chars': len(message)})
         
         # Sanitize message to prevent Unicode encoding errors
         message = sanitize_unicode_text(message)
@@ -1196,7 +4487,6 @@ Keep responses informative and easy to understand."""
             user_prompt = f"The user is reporting in '{language}': {message}"
         
         try:
-            print(f"[INFO] Making chat API call...")
             start_time = time.time()
             
             # API call with timeout
@@ -1212,7 +4502,6 @@ Keep responses informative and easy to understand."""
             )
             
             api_time = time.time() - start_time
-            print(f"[INFO] Chat API call completed in {api_time:.2f} seconds")
             
             # Validate response
             if not response or not response.choices:
@@ -1226,7 +4515,8 @@ Keep responses informative and easy to understand."""
             if not ai_response:
                 raise ValueError("Chat response is only whitespace")
             
-            print(f"[SUCCESS] Chat completed successfully")
+            record_llm_call('chat', api_time, 'success')
+            llm_log.info("Chat completed", extra={'api_time': round(api_time, 3)})
             return jsonify({
                 'response': ai_response,
                 'status': 'success',
@@ -1235,7 +4525,8 @@ Keep responses informative and easy to understand."""
             
         except Exception as api_error:
             error_msg = str(api_error)
-            print(f"[ERROR] Chat API error: {error_msg}")
+            llm_log.warning("Chat API error: %s", error_msg)
+            record_llm_call('chat', time.time() - start_time, 'error')
             
             # Provide user-friendly error messages
             if 'timeout' in error_msg.lower():
@@ -1256,8 +4547,7 @@ Keep responses informative and easy to understand."""
         
     except Exception as e:
         error_msg = str(e)
-        print(f"[CRITICAL] Unexpected chat error: {error_msg}")
-        traceback.print_exc()
+        llm_log.exception("Chat system error")
         
         return jsonify({
             'error': f'Chat system error: {error_msg}',
@@ -1271,65 +4561,575 @@ def save_preferences():
     try:
         data = request.get_json()
         
-        # Update session with new preferences, ensuring the object exists
-        if 'user_preferences' not in session:
-            initialize_session()
-            
+        preferences = get_user_preferences()
         for key in data:
-            if key in session['user_preferences']:
+            if key in DEFAULT_USER_PREFERENCES:
                 # Type casting for safety
-                if isinstance(session['user_preferences'][key], bool):
-                    session['user_preferences'][key] = bool(data[key])
-                elif isinstance(session['user_preferences'][key], int):
-                    session['user_preferences'][key] = int(data[key])
+                if isinstance(DEFAULT_USER_PREFERENCES[key], bool):
+                    preferences[key] = bool(data[key])
+                elif isinstance(DEFAULT_USER_PREFERENCES[key], int):
+                    preferences[key] = int(data[key])
                 else:
-                    session['user_preferences'][key] = data[key]
+                    preferences[key] = data[key]
 
-        session.modified = True # Explicitly mark session as modified
-        print(f"✅ Preferences updated in session: {session['user_preferences']}")
+        # Only touch the session (and so the store and cookie) on a real change
+        if preferences != get_user_preferences():
+            session['user_preferences'] = preferences
+            log.debug("Preferences updated in session", extra={'preferences': preferences})
             
-        return jsonify({'success': True, 'message': 'Preferences saved', 'preferences': session['user_preferences']}), 200
+        return jsonify({'success': True, 'message': 'Preferences saved', 'preferences': preferences}), 200
         
     except Exception as e:
-        print(f"[ERROR] Error saving preferences: {e}")
+        log.exception("Error saving preferences")
         return jsonify({'error': f'Failed to save preferences: {str(e)}'}), 500
 
 @app.route('/api/preferences', methods=['GET'])
 def get_preferences():
     """Get current user preferences from session"""
     try:
-        # The before_request handler ensures this always exists
-        return jsonify(session['user_preferences']), 200
+        return jsonify(get_user_preferences()), 200
         
     except Exception as e:
-        print(f"[ERROR] Error getting preferences: {e}")
+        log.exception("Error getting preferences")
         return jsonify({'error': f'Failed to get preferences: {str(e)}'}), 500
 
 # Existing API routes
+# ✅ NEW: Alert store with cursor-based delta queries
+alert_feed_cache = BytesLRUCache(256, 4 * 1024 * 1024)
+
+def serialize_alert(alert):
+    return {
+        'id': alert.id,
+        'type': alert.alert_type,
+        'severity': alert.severity,
+        'title': alert.title,
+        'location': alert.location,
+        'message': ' '.join(filter(None, [alert.impact, alert.action])),
+        'impact': alert.impact,
+        'action': alert.action,
+        'radius': f'{alert.radius_km:g} km' if alert.radius_km else None,
+        'latitude': alert.latitude,
+        'longitude': alert.longitude,
+        # Past expires_at is expired even before the sweep writes it
+        'status': 'expired' if alert.status == 'active' and alert_is_due(alert.expires_at) else alert.status,
+        'timestamp': alert.issued_at.isoformat() + 'Z',
+        'expires_at': alert.expires_at.isoformat() + 'Z' if alert.expires_at else None,
+        'updated_at': alert.updated_at.isoformat() + 'Z'
+    }
+
+def alert_cursor(seq, alert_id):
+    """Opaque position in (seq, id) order."""
+    return f'{seq}.{alert_id}'
+
+def parse_alert_cursor(cursor):
+    seq, _, alert_id = cursor.partition('.')
+    seq, alert_id = int(seq), int(alert_id or 0)
+    # SQLite integers are 64-bit; anything larger cannot be a cursor we issued
+    if not (0 <= seq < 2 ** 63 and 0 <= alert_id < 2 ** 63):
+        raise OverflowError('cursor out of range')
+    return seq, alert_id
+
+def active_alerts_query():
+    now = datetime.datetime.utcnow()
+    return Alert.query.filter(
+        Alert.status == 'active',
+        db.or_(Alert.expires_at.is_(None), Alert.expires_at > now)
+    )
+
+def alert_changes(after_seq, after_id, limit):
+    """Alerts created or changed after a cursor position, oldest change first (uses ix_alert_seq_id)."""
+    return Alert.query.filter(
+        db.tuple_(Alert.seq, Alert.id) > (after_seq, after_id)
+    ).order_by(Alert.seq, Alert.id).limit(limit).all()
+
+def alert_seq_before(since):
+    """Cursor position just before the first change made after a point in time."""
+    first = (Alert.query.with_entities(Alert.seq).filter(Alert.updated_at > since)
+             .order_by(Alert.seq).limit(1).scalar())
+    if first is not None:
+        return first - 1
+    return Alert.query.with_entities(db.func.coalesce(db.func.max(Alert.seq), 0)).scalar()
+
+def alert_is_due(expires_at):
+    return expires_at is not None and expires_at <= datetime.datetime.utcnow()
+
+_alert_expiry = {'version': None, 'expiries': [], 'sweeper_pid': None}
+_alert_expiry_lock = threading.Lock()
+
+def alerts_version_key():
+    """Alerts data version plus how many known expiry times have passed; reads only.
+
+    Caches and ETags keyed on it turn over when an alert reaches expires_at, so
+    reads filtered on expires_at > now never serve a stale list. Each worker
+    re-reads the expiry times only when the stored version changes.
+    """
+    version = read_data_version('alerts')
+    if version != _alert_expiry['version']:
+        _alert_expiry['expiries'] = sorted(
+            expires_at for expires_at, in Alert.query.with_entities(Alert.expires_at)
+            .filter(Alert.status == 'active', Alert.expires_at.isnot(None)))
+        _alert_expiry['version'] = version
+    passed = bisect.bisect_right(_alert_expiry['expiries'], datetime.datetime.utcnow())
+    return f'{version}.{passed}'
+
+def expire_due_alerts():
+    """Mark active alerts past expires_at as expired with a new seq; returns the count. The caller commits.
+
+    Reads already treat them as gone; this gives delta clients a change to follow.
+    """
+    return Alert.query.filter(Alert.status == 'active', Alert.expires_at <= datetime.datetime.utcnow()).update(
+        {'status': 'expired', 'updated_at': datetime.datetime.utcnow(), 'seq': ALERT_NEXT_SEQ},
+        synchronize_session=False)
+
+def sweep_expired_alerts():
+    """Commit expire_due_alerts() on its own, off the request path."""
+    expired = expire_due_alerts()
+    db.session.commit()
+    if expired:
+        log.info("Expired alerts", extra={'count': expired})
+        bump_data_version('alerts')
+
+@app.before_request
+def start_alert_expiry_sweeper():
+    """Start this process's expiry thread once; the same conditional UPDATE is safe in every worker."""
+    if _alert_expiry['sweeper_pid'] == os.getpid():
+        return
+    with _alert_expiry_lock:
+        if _alert_expiry['sweeper_pid'] == os.getpid():
+            return
+        _alert_expiry['sweeper_pid'] = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(app.config['ALERT_EXPIRY_SWEEP_SECONDS'])
+            with app.app_context():
+                try:
+                    sweep_expired_alerts()
+                except Exception:
+                    db.session.rollback()
+                    log.exception("Alert expiry sweep failed")
+
+    threading.Thread(target=run, name='alert-expiry', daemon=True).start()
+
+def alert_statistics():
+    counts = dict(active_alerts_query()
+                  .with_entities(Alert.severity, db.func.count(Alert.id))
+                  .group_by(Alert.severity).all())
+    return {severity: counts.get(severity, 0) for severity in ALERT_SEVERITIES}
+
+def add_missing_columns(table, columns):
+    """Add nullable columns introduced after a table was first created; returns the names added.
+
+    db.create_all() only creates missing tables, so databases created by an
+    earlier version need new columns added in place.
+    """
+    existing = {row[1] for row in db.session.execute(text(f'PRAGMA table_info({table})'))}
+    added = [name for name in columns if name not in existing]
+    for name in added:
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {columns[name]}'))
+    db.session.commit()
+    return added
+
+def backfill_alert_seq():
+    """Number alerts stored before alerts had a change sequence, in (updated_at, id) order."""
+    ids = [alert_id for alert_id, in Alert.query.with_entities(Alert.id)
+           .order_by(Alert.updated_at, Alert.id)]
+    for seq, alert_id in enumerate(ids, 1):
+        db.session.execute(text('UPDATE alert SET seq = :seq WHERE id = :id'), {'seq': seq, 'id': alert_id})
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_alert_seq_id ON alert (seq, id)'))
+    db.session.commit()
+    bump_data_version('alerts')
+
+def backfill_alert_fences():
+    """Geocode the centre of alerts stored before alerts had coordinates."""
+    for alert in Alert.query.filter(Alert.latitude.is_(None)).all():
+        alert.latitude, alert.longitude = geocode_place(alert.location) or (None, None)
+    db.session.commit()
+    bump_data_version('alerts')
+
+def seed_alerts():
+    """Load the sample alerts the first time the alert table is created."""
+    if Alert.query.first():
+        return
+    now = datetime.datetime.utcnow()
+    db.session.add_all([
+        Alert(alert_type='CYCLONE WARNING', severity='critical', title='Severe Cyclonic Storm Approaching',
+              location='Bardhaman, West Bengal', impact='Heavy rainfall, strong winds up to 120 km/h',
+              action='Immediate evacuation from affected areas',
+              latitude=23.2324, longitude=87.8615, radius_km=150,
+              issued_at=now - datetime.timedelta(hours=2), updated_at=now - datetime.timedelta(hours=2)),
+        Alert(alert_type='FLOOD WARNING', severity='high', title='Flash Flood Risk',
+              location='Yamuna River basin, Delhi NCR', impact='Water levels rising rapidly',
+              action='Avoid low-lying areas and riverbanks',
+              latitude=28.6139, longitude=77.2090, radius_km=50,
+              issued_at=now - datetime.timedelta(hours=4), updated_at=now - datetime.timedelta(hours=4))
+    ])
+    db.session.commit()
+    bump_data_version('alerts')
+
+class AlertFenceIndex:
+    """Grid index of active alert fences (centre plus radius) for point-in-fence lookups.
+
+    Each fence is registered in every grid cell its bounding box overlaps, so a
+    lookup only checks the alerts filed under the caller's cell. Each worker
+    follows the same (seq, id) change feed as the delta API and applies only
+    the alerts that changed since its last refresh.
+    """
+
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.version = None
+        self.cursor = (0, 0)
+        self.cells = {}
+        self.fences = {}  # alert id -> (cells, entry)
+        self.broadcast = {}  # alerts without a fence apply everywhere
+        self.lock = threading.Lock()
+
+    def ensure_fresh(self):
+        version = get_data_version('alerts')
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self._apply_changes()
+                    self.version = version
+        return self
+
+    def _apply_changes(self):
+        while True:
+            changes = alert_changes(*self.cursor, 1000)
+            for alert in changes:
+                self._remove(alert.id)
+                if alert.status == 'active':
+                    self._add(alert)
+            if changes:
+                self.cursor = (changes[-1].seq, changes[-1].id)
+            if len(changes) < 1000:
+                break
+
+    def cell_of(self, lat, lng):
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def covering_cells(self, lat, lng, radius_km):
+        """Cells overlapped by the fence's lat/lng bounding box (no antimeridian wrap)."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+        min_cell = self.cell_of(max(lat - dlat, -90), max(lng - dlng, -180))
+        max_cell = self.cell_of(min(lat + dlat, 90), min(lng + dlng, 180))
+        return [(row, col)
+                for row in range(min_cell[0], max_cell[0] + 1)
+                for col in range(min_cell[1], max_cell[1] + 1)]
+
+    def _add(self, alert):
+        entry = (alert.latitude, alert.longitude, alert.radius_km, alert.expires_at, serialize_alert(alert))
+        if alert.latitude is None or alert.longitude is None or not alert.radius_km:
+            self.broadcast[alert.id] = entry
+            return
+        cells = self.covering_cells(alert.latitude, alert.longitude, alert.radius_km)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(entry)
+        self.fences[alert.id] = (cells, entry)
+
+    def _remove(self, alert_id):
+        self.broadcast.pop(alert_id, None)
+        cells, entry = self.fences.pop(alert_id, (None, None))
+        for cell in cells or []:
+            bucket = self.cells[cell]
+            bucket.remove(entry)
+            if not bucket:
+                del self.cells[cell]
+
+    def containing(self, lat, lng):
+        """Active alerts whose fence contains the point (nearest centre first), then broadcast alerts."""
+        now = datetime.datetime.utcnow()
+        with self.lock:
+            candidates = list(self.cells.get(self.cell_of(lat, lng), []))
+            broadcast = list(self.broadcast.values())
+        matches = []
+        for fence_lat, fence_lng, radius_km, expires_at, alert in candidates:
+            if expires_at and expires_at <= now:
+                continue
+            distance = haversine_km(lat, lng, fence_lat, fence_lng)
+            if distance <= radius_km:
+                matches.append(dict(alert, distance_km=round(distance, 2)))
+        matches.sort(key=lambda alert: alert['distance_km'])
+        matches.extend(alert for _, _, _, expires_at, alert in broadcast
+                       if not expires_at or expires_at > now)
+        return matches
+
+    def stats(self):
+        return {'fences': len(self.fences), 'broadcast': len(self.broadcast), 'cells': len(self.cells)}
+
+alert_fence_index = AlertFenceIndex(app.config['ALERT_GRID_DEGREES'])
+
 @app.route('/api/emergency-alerts')
+@etag_from_versions('alerts')
 def get_emergency_alerts():
-    """API endpoint for emergency alerts"""
-    alerts = [
-        {
-            'id': 1,
-            'type': 'CYCLONE',
-            'severity': 'critical',
-            'location': 'Bardhaman, West Bengal',
-            'message': 'Heavy rainfall, strong winds up to 120 km/h. Immediate evacuation required.',
-            'timestamp': '2025-09-14T21:53:00Z'
-        },
-        {
-            'id': 2,
-            'type': 'FLOOD',
-            'severity': 'high',
-            'location': 'Yamuna River',
-            'message': 'Water levels rising. Stay away from riverbanks',
-            'timestamp': '2025-09-14T21:30:00Z'
-        }
-    ]
-    return jsonify(alerts)
+    """API endpoint for emergency alerts.
+
+    Without parameters returns the list of active alerts. With ?cursor= (from a
+    previous response) or ?since= (ISO-8601 time) returns only alerts created,
+    updated, cancelled or expired after that point, plus the cursor to poll
+    with next. Expired alerts come back with status 'expired'.
+    """
+    cursor = request.args.get('cursor')
+    since = request.args.get('since')
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    try:
+        if cursor:
+            after_seq, after_id = parse_alert_cursor(cursor)
+        elif since:
+            since_time = datetime.datetime.fromisoformat(since.replace('Z', '+00:00'))
+            if since_time.tzinfo:
+                since_time = since_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    except (ValueError, OverflowError):
+        return jsonify({'status': 'error', 'message': 'Invalid cursor or since parameter'}), 400
+
+    # The serialized answer depends only on the alert data version and the query
+    key = (get_data_version('alerts'), cursor, since, limit)
+    cached = alert_feed_cache.get(key)
+    if cached is not None:
+        return app.response_class(cached[0], mimetype='application/json')
+
+    try:
+        if cursor or since:
+            if not cursor:
+                after_seq, after_id = alert_seq_before(since_time), 0
+            changes = alert_changes(after_seq, after_id, limit)
+            last = changes[-1] if changes else None
+            next_cursor = alert_cursor(last.seq, last.id) if last else alert_cursor(after_seq, after_id)
+            payload = {
+                'status': 'success',
+                'data': [serialize_alert(alert) for alert in changes],
+                'cursor': next_cursor,
+                'has_more': len(changes) == limit
+            }
+        else:
+            alerts = active_alerts_query().order_by(Alert.issued_at.desc()).limit(limit).all()
+            payload = [serialize_alert(alert) for alert in alerts]
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        alert_feed_cache.put(key, body)
+        return app.response_class(body, mimetype='application/json')
+    except Exception as e:
+        log.exception("Error fetching emergency alerts")
+        return jsonify({'status': 'error', 'message': 'Failed to fetch alerts'}), 500
+
+@app.route('/api/emergency-alerts/at')
+@etag_from_versions('alerts')
+def alerts_at_location():
+    """API endpoint for the active alerts whose geo-fence contains the caller's location"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({'status': 'error', 'message': 'Valid lat and lng are required'}), 400
+        return jsonify({
+            'status': 'success',
+            'data': alert_fence_index.ensure_fresh().containing(lat, lng)
+        }), 200
+    except Exception as e:
+        log.exception("Error matching alerts to location")
+        return jsonify({'status': 'error', 'message': 'Failed to match alerts'}), 500
+
+def apply_alert_fields(alert, data):
+    """Copy validated fields from a request body onto an Alert; returns an error message or None."""
+    if 'severity' in data and data['severity'] not in ALERT_SEVERITIES:
+        return f"Severity must be one of: {', '.join(ALERT_SEVERITIES)}"
+    if 'status' in data and data['status'] not in ('active', 'cancelled'):
+        return 'Status must be active or cancelled'
+    for field in ('alert_type', 'severity', 'title', 'location', 'impact', 'action', 'status'):
+        if field in data:
+            setattr(alert, field, data[field])
+    try:
+        for field in ('latitude', 'longitude', 'radius_km'):
+            if field in data:
+                setattr(alert, field, float(data[field]) if data[field] is not None else None)
+        if 'expires_at' in data:
+            expires_at = data['expires_at']
+            alert.expires_at = datetime.datetime.fromisoformat(expires_at.replace('Z', '')) if expires_at else None
+    except (TypeError, ValueError):
+        return 'Invalid coordinates, radius_km or expires_at'
+    if alert.latitude is None or alert.longitude is None:
+        alert.latitude, alert.longitude = geocode_place(alert.location) or (None, None)
+    if alert.latitude is not None and not (-90 <= alert.latitude <= 90 and -180 <= alert.longitude <= 180):
+        return 'Invalid coordinates'
+    return None
+
+@app.route('/api/admin/alerts', methods=['POST'])
+@login_required(role='admin')
+def create_alert():
+    """API endpoint for issuing a new emergency alert"""
+    try:
+        data = request.get_json()
+        if not data or not all(data.get(field) for field in ('alert_type', 'severity', 'title', 'location')):
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required fields: alert_type, severity, title or location'
+            }), 400
+        alert = Alert()
+        error = apply_alert_fields(alert, data)
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
+        db.session.add(alert)
+        expire_due_alerts()
+        db.session.commit()
+        bump_data_version('alerts')
+        return jsonify({'status': 'success', 'data': serialize_alert(alert)}), 201
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Error creating alert")
+        return jsonify({'status': 'error', 'message': 'Failed to create alert'}), 500
+
+@app.route('/api/admin/alerts/<int:id>', methods=['PATCH'])
+@login_required(role='admin')
+def update_alert(id):
+    """API endpoint for updating or cancelling an alert"""
+    try:
+        alert = db.session.get(Alert, id)
+        if not alert:
+            return jsonify({'status': 'error', 'message': 'Alert not found'}), 404
+        error = apply_alert_fields(alert, request.get_json() or {})
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
+        db.session.flush()
+        expire_due_alerts()
+        db.session.commit()
+        bump_data_version('alerts')
+        return jsonify({'status': 'success', 'data': serialize_alert(alert)}), 200
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Error updating alert")
+        return jsonify({'status': 'error', 'message': 'Failed to update alert'}), 500
+
+# ✅ NEW: SOS time-series rollups, maintained on every write so charts never scan SOSRequest
+SOS_STATUSES = ('pending', 'handled', 'closed')
+SOS_ROLLUPS = {
+    'minute': (SOSRollupMinute, datetime.timedelta(minutes=1)),
+    'hour': (SOSRollupHour, datetime.timedelta(hours=1)),
+    'day': (SOSRollupDay, datetime.timedelta(days=1))
+}
+SOS_STATS_DEFAULT_BUCKETS = {'minute': 60, 'hour': 24, 'day': 30}
+SOS_REGION_DISTRICT_KM = 50
+_sos_rollups_pruned_at = 0.0
+
+def sos_bucket_start(timestamp, granularity):
+    """Start of the UTC bucket containing a naive UTC timestamp."""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def sos_region(location):
+    """Rollup region for an SOS location: a gazetteer district near it, else a 1-degree grid cell."""
+    coordinates = parse_coordinates(location or '') or geocode_place(location)
+    if not coordinates:
+        return 'unknown'
+    lat, lng = coordinates
+    nearest = min(((haversine_km(lat, lng, *centroid), district)
+                   for district, centroid in load_geocodes()['districts'].items()), default=None)
+    if nearest and nearest[0] <= SOS_REGION_DISTRICT_KM:
+        return nearest[1]
+    return f'{math.floor(lat)}:{math.floor(lng)}'
+
+def rollup_sos_request(sos_request, delta, status=None):
+    """Add delta to the request's bucket in every granularity. The caller commits with the request."""
+    now = datetime.datetime.utcnow()
+    for granularity, (model, _) in SOS_ROLLUPS.items():
+        days = app.config['SOS_ROLLUP_RETENTION_DAYS'][granularity]
+        if days and sos_request.timestamp < now - datetime.timedelta(days=days):
+            continue  # that bucket has been pruned; touching it would leave a negative count
+        statement = sqlite_insert(model).values(
+            bucket_start=sos_bucket_start(sos_request.timestamp, granularity),
+            region=sos_request.region or 'unknown',
+            status=status or sos_request.status or 'pending',
+            is_emergency=sos_request.is_emergency is not False,
+            count=delta
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['bucket_start', 'region', 'status', 'is_emergency'],
+            set_={'count': model.count + statement.excluded.count}
+        ))
+
+def prune_sos_rollups(force=False):
+    """Drop buckets past their retention; runs at most once a minute per worker unless forced."""
+    global _sos_rollups_pruned_at
+    if not force and time.monotonic() - _sos_rollups_pruned_at < 60:
+        return
+    _sos_rollups_pruned_at = time.monotonic()
+    now = datetime.datetime.utcnow()
+    for granularity, days in app.config['SOS_ROLLUP_RETENTION_DAYS'].items():
+        if days:
+            model = SOS_ROLLUPS[granularity][0]
+            model.query.filter(model.bucket_start < now - datetime.timedelta(days=days)).delete()
+    db.session.commit()
+
+def rebuild_sos_rollups():
+    """Recompute every rollup from SOSRequest; used once when the rollup tables are new."""
+    for model, _ in SOS_ROLLUPS.values():
+        model.query.delete()
+    for sos_request in SOSRequest.query.all():
+        if sos_request.region is None:
+            sos_request.region = sos_region(sos_request.location)
+        rollup_sos_request(sos_request, 1)
+    db.session.commit()
+    prune_sos_rollups(force=True)
+
+@app.route('/api/sos-stats')
+@login_required()
+def sos_stats():
+    """API endpoint for SOS volume over time, served from the rollups.
+
+    ?granularity=minute|hour|day picks the rollup, ?buckets=N the number of
+    buckets ending at the current one (or at ?end=, ISO-8601 UTC) and
+    ?group_by=status|region|emergency the series; ?region= filters. Each bucket
+    costs a few rollup rows however many requests it holds.
+    """
+    granularity = request.args.get('granularity', 'hour')
+    group_by = request.args.get('group_by', 'status')
+    if granularity not in SOS_ROLLUPS or group_by not in ('status', 'region', 'emergency'):
+        return jsonify({'status': 'error', 'message': 'Invalid granularity or group_by'}), 400
+    buckets = request.args.get('buckets', SOS_STATS_DEFAULT_BUCKETS[granularity], type=int)
+    buckets = max(1, min(buckets, app.config['SOS_ROLLUP_MAX_BUCKETS']))
+    try:
+        end = request.args.get('end')
+        end = datetime.datetime.fromisoformat(end.replace('Z', '+00:00')) if end else datetime.datetime.utcnow()
+        if end.tzinfo:
+            end = end.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid end parameter'}), 400
+
+    try:
+        model, step = SOS_ROLLUPS[granularity]
+        labels = [sos_bucket_start(end, granularity) - step * i for i in range(buckets - 1, -1, -1)]
+        positions = {label: i for i, label in enumerate(labels)}
+        column = {'status': model.status, 'region': model.region, 'emergency': model.is_emergency}[group_by]
+        query = db.session.query(model.bucket_start, column, db.func.sum(model.count)) \
+            .filter(model.bucket_start >= labels[0], model.bucket_start <= labels[-1])
+        if request.args.get('region'):
+            query = query.filter(model.region == request.args['region'])
+
+        series = {status: [0] * buckets for status in SOS_STATUSES} if group_by == 'status' else {}
+        for bucket_start, key, count in query.group_by(model.bucket_start, column):
+            if not count and key not in series:
+                continue
+            if group_by == 'emergency':
+                key = 'emergency' if key else 'non_emergency'
+            series.setdefault(key, [0] * buckets)[positions[bucket_start]] += count
+
+        return jsonify({
+            'status': 'success',
+            'granularity': granularity,
+            'group_by': group_by,
+            'labels': [label.isoformat() + 'Z' for label in labels],
+            'series': series,
+            'totals': {key: sum(values) for key, values in series.items()}
+        }), 200
+    except Exception as e:
+        sos_log.exception("Error building SOS stats")
+        return jsonify({'status': 'error', 'message': 'Failed to load SOS statistics'}), 500
 
 @app.route('/api/sos', methods=['POST'])
+@rate_limit('sos')
 def handle_sos():
     """Handle SOS requests and broadcast to rescue personnel"""
     try:
@@ -1343,15 +5143,22 @@ def handle_sos():
 
         # Create simple SOS request
         sos_request = SOSRequest(
+            timestamp=datetime.datetime.utcnow(),
             sender_name=contact,
             contact=contact,
             message=message,
             location=location,
-            status='pending'
+            status='pending',
+            region=sos_region(location),
+            # Parsed like the env flags: only an explicit false opts out, and JSON "false" is not truthy
+            is_emergency=str(data.get('is_emergency', True)).lower() not in ('false', '0')
         )
 
         db.session.add(sos_request)
+        rollup_sos_request(sos_request, 1)
         db.session.commit()
+        metrics.inc('sos_requests_total', emergency=str(sos_request.is_emergency).lower())
+        prune_sos_rollups()
 
         # Broadcast to rescue personnel
         sos_data = {
@@ -1368,48 +5175,176 @@ def handle_sos():
         }), 200
 
     except Exception as e:
-        print(f"Error processing SOS request: {str(e)}")
+        db.session.rollback()
+        sos_log.exception("Error processing SOS request")
         return jsonify({'error': 'Failed to send SOS alert'}), 500
 
 @app.route('/api/disaster-locations')
 def get_disaster_locations():
     """API endpoint for disaster locations"""
 
+# ✅ NEW: Resource counts with a materialized per-region summary
+RESOURCE_CATEGORY_LABELS = {
+    'hospitals': 'Hospitals',
+    'ambulances': 'Ambulance Services',
+    'fire_stations': 'Fire Stations',
+    'police_stations': 'Police Stations'
+}
+resource_summary_cache = BytesLRUCache(8, 4 * 1024 * 1024)
+
+def resource_region(user):
+    """(state, city) summary key for a rescue user, normalized like the dispatch index."""
+    regions = dispatch_regions(user.pincode, user.city, user.state)
+    return regions['state'] or '', regions['city'] or ''
+
+def set_resource_counts(user, counts):
+    """Store a rescue user's counts and move the summary by the difference. The caller commits.
+
+    Each difference is computed in SQL by the summary write itself, before the count
+    row is replaced. SQLite holds the write lock from that first write until commit, so
+    a concurrent update of the same user waits and then sees this one's counts, and
+    the summary cannot drift. Only the categories given are changed; returns the
+    user's full counts.
+    """
+    state, city = resource_region(user)
+    summary = sqlite_insert(ResourceSummary)
+    for category, count in counts.items():
+        previous = db.select(ResourceCount.count).where(
+            ResourceCount.user_id == user.id, ResourceCount.category == category
+        ).scalar_subquery()
+        db.session.execute(
+            summary.values(state=state, city=city, category=category,
+                           total=count - db.func.coalesce(previous, 0))
+            .on_conflict_do_update(index_elements=['state', 'city', 'category'],
+                                   set_={'total': ResourceSummary.total + summary.excluded.total})
+        )
+        stored = sqlite_insert(ResourceCount).values(user_id=user.id, category=category, count=count,
+                                                     updated_at=datetime.datetime.utcnow())
+        db.session.execute(stored.on_conflict_do_update(
+            index_elements=['user_id', 'category'],
+            set_={'count': stored.excluded.count, 'updated_at': stored.excluded.updated_at}
+        ))
+    return dict(db.session.query(ResourceCount.category, ResourceCount.count)
+                .filter(ResourceCount.user_id == user.id).all())
+
+def rebuild_resource_summary():
+    """Recompute the summary from ResourceCount in one GROUP BY (startup repair path)."""
+    totals = {}
+    rows = db.session.query(User, ResourceCount.category, db.func.sum(ResourceCount.count)) \
+        .join(ResourceCount, ResourceCount.user_id == User.id) \
+        .group_by(User.id, ResourceCount.category).all()
+    for user, category, count in rows:
+        key = (*resource_region(user), category)
+        totals[key] = totals.get(key, 0) + (count or 0)
+    ResourceSummary.query.delete()
+    db.session.add_all(ResourceSummary(state=state, city=city, category=category, total=total)
+                       for (state, city, category), total in totals.items())
+    db.session.commit()
+
+def parse_resource_counts(value):
+    """Validate {category: non-negative int}; raises ValueError naming the bad entry."""
+    if not isinstance(value, dict) or not value:
+        raise ValueError('resource_counts must be an object of category counts')
+    counts = {}
+    for category, count in value.items():
+        if category not in RESOURCE_CATEGORIES:
+            raise ValueError(f'Unknown resource category: {category}')
+        if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+            raise ValueError(f'Count for {category} must be a non-negative integer')
+        counts[category] = count
+    return counts
+
+def build_resource_summary():
+    """Personnel with their counts plus region and category rollups, in two queries."""
+    personnel = {}
+    rows = db.session.query(User, ResourceCount.category, ResourceCount.count) \
+        .outerjoin(ResourceCount, ResourceCount.user_id == User.id) \
+        .filter(User.role == 'rescue').order_by(User.id).all()
+    for user, category, count in rows:
+        person = personnel.setdefault(user.id, {
+            'id': user.id,
+            'email': user.email,
+            'city': user.city or '',
+            'location': {'city': user.city or '', 'state': user.state or '', 'pincode': user.pincode or ''},
+            'resource_counts': dict.fromkeys(RESOURCE_CATEGORIES, 0)
+        })
+        if category in RESOURCE_CATEGORIES:
+            person['resource_counts'][category] = count
+
+    # One GROUP BY over the summary; its size depends on regions, not personnel
+    regions, states, categories = {}, {}, dict.fromkeys(RESOURCE_CATEGORIES, 0)
+    summary = db.session.query(ResourceSummary.state, ResourceSummary.city, ResourceSummary.category,
+                               db.func.sum(ResourceSummary.total)) \
+        .group_by(ResourceSummary.state, ResourceSummary.city, ResourceSummary.category).all()
+    for state, city, category, total in summary:
+        if category not in categories or not total:
+            continue
+        region = regions.setdefault((state, city), {
+            'state': state.title(), 'city': city.title(),
+            'counts': dict.fromkeys(RESOURCE_CATEGORIES, 0), 'total': 0
+        })
+        region['counts'][category] += total
+        region['total'] += total
+        states.setdefault(state.title(), dict.fromkeys(RESOURCE_CATEGORIES, 0))[category] += total
+        categories[category] += total
+
+    return {
+        'personnel': list(personnel.values()),
+        'regions': sorted(regions.values(), key=lambda region: -region['total']),
+        'states': states,
+        'categories': categories,
+        'category_labels': RESOURCE_CATEGORY_LABELS,
+        'total': sum(categories.values())
+    }
+
+def resource_summary_json():
+    """Serialized summary, built once per 'resources' data version in each worker."""
+    key = get_data_version('resources')
+    cached = resource_summary_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    body = json.dumps({'status': 'success', 'data': build_resource_summary()}, ensure_ascii=False).encode('utf-8')
+    resource_summary_cache.put(key, body)
+    return body
+
+def seed_resource_counts():
+    """Give the sample rescue user the counts the admin page used to hard-code."""
+    if ResourceCount.query.first():
+        if not ResourceSummary.query.first():
+            rebuild_resource_summary()
+        return
+    user = User.query.filter_by(email='rescue@disastrous.com').first()
+    if user:
+        set_resource_counts(user, {'hospitals': 5, 'ambulances': 5, 'fire_stations': 3, 'police_stations': 13})
+        db.session.commit()
+        bump_data_version('resources')
+
+@app.route('/api/admin/resource-summary', methods=['GET'])
+@login_required(role='admin')
+@etag_from_versions('resources')
+def get_resource_summary():
+    """API endpoint for personnel resource counts with per-region and per-category totals"""
+    try:
+        return app.response_class(resource_summary_json(), mimetype='application/json')
+    except Exception as e:
+        log.exception("Error building resource summary")
+        return jsonify({'status': 'error', 'message': 'Failed to load resource summary'}), 500
+
 @app.route('/api/admin/rescue-personnel', methods=['GET'])
 @login_required(role='admin')
+@etag_from_versions('resources')
 def get_rescue_personnel():
     """API endpoint for fetching rescue personnel data"""
     try:
-        rescue_personnel = User.query.filter_by(role='rescue').all()
-        personnel_data = []
-        
-        for person in rescue_personnel:
-            # Calculate resource counts (simulated data for now)
-            resource_counts = {
-                'hospitals': 5,
-                'ambulances': 3,
-                'fire_stations': 2,
-                'police_stations': 4
-            }
-            
-            personnel_data.append({
-                'id': person.id,
-                'email': person.email,
-                'location': {
-                    'city': person.city or '',
-                    'state': person.state or '',
-                    'pincode': person.pincode or ''
-                },
-                'resource_counts': resource_counts
-            })
-            
+        personnel = json.loads(resource_summary_json())['data']['personnel']
         return jsonify({
             'status': 'success',
-            'data': personnel_data
+            'data': [{key: person[key] for key in ('id', 'email', 'location', 'resource_counts')}
+                     for person in personnel]
         }), 200
         
     except Exception as e:
-        print(f"Error fetching rescue personnel: {str(e)}")
+        log.exception("Error fetching rescue personnel")
         return jsonify({
             'status': 'error',
             'message': 'Failed to fetch rescue personnel data'
@@ -1449,7 +5384,7 @@ def get_resource_categories():
         }), 200
         
     except Exception as e:
-        print(f"Error fetching resource categories: {str(e)}")
+        log.exception("Error fetching resource categories")
         return jsonify({
             'status': 'error',
             'message': 'Failed to fetch resource categories'
@@ -1475,6 +5410,10 @@ def update_resource_counts():
                 'status': 'error',
                 'message': 'Missing required fields: user_id or resource_counts'
             }), 400
+        try:
+            counts = parse_resource_counts(resource_counts)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
             
         # Verify user exists and is rescue personnel
         user = User.query.filter_by(id=user_id, role='rescue').first()
@@ -1484,106 +5423,369 @@ def update_resource_counts():
                 'message': 'Invalid user ID or user is not rescue personnel'
             }), 404
             
-        # In a real app, this would update the database
-        # For now, just return success
+        stored = set_resource_counts(user, counts)
+        db.session.commit()
+        bump_data_version('resources')
         return jsonify({
             'status': 'success',
             'message': 'Resource counts updated successfully',
             'data': {
-                'user_id': user_id,
-                'resource_counts': resource_counts
+                'user_id': user.id,
+                'resource_counts': {category: stored.get(category, 0) for category in RESOURCE_CATEGORIES}
             }
         }), 200
         
     except Exception as e:
-        print(f"Error updating resource counts: {str(e)}")
+        db.session.rollback()
+        log.exception("Error updating resource counts")
         return jsonify({
             'status': 'error',
             'message': 'Failed to update resource counts'
         }), 500
 
+@app.route('/api/admin/page-cache/invalidate', methods=['POST'])
+@login_required(role='admin')
+def invalidate_page_cache():
+    """API endpoint for dropping cached pages after out-of-band data changes"""
+    data = request.get_json(silent=True) or {}
+    sources = data.get('sources') or ['alerts', 'facilities', 'forecasts', 'guidelines', 'rescue']
+    invalidate_pages(*sources)
+    page_cache.invalidate()
+    return jsonify({'status': 'success', 'invalidated': sources}), 200
+
+# ✅ NEW: Forecast store with batched ingestion, bulk review and running per-source aggregates
+FORECAST_ROUTE_SOURCES = {'ai': 'ai_based', 'ai_based': 'ai_based', 'crowdsourced': 'crowdsourced'}
+
+def serialize_forecast(forecast):
+    return {
+        'id': forecast.id,
+        'external_id': forecast.external_id,
+        'title': forecast.title,
+        'description': forecast.description,
+        'location': forecast.region,
+        'timestamp': forecast.issued_at.isoformat() + 'Z',
+        'severity': forecast.severity,
+        'confidence': forecast.confidence,
+        'source': forecast.source,
+        'status': forecast.status
+    }
+
+FORECAST_STATS_COUNTS = ('pending', 'approved', 'rejected', 'open_count', 'open_severity_sum')
+
+def forecast_source_stats():
+    """Aggregates per source type, each the sum of its feeds' rows, with the feed rows under 'feeds'.
+
+    Trust and criticality are earned per feed; the type totals are what the
+    admin cards show. One small table scan, never recomputed from the forecasts.
+    """
+    stats = {}
+    for source_type in FORECAST_SOURCES:
+        stats[source_type] = ForecastSourceStats(source_type=source_type, source=None,
+                                                 **{name: 0 for name in FORECAST_STATS_COUNTS})
+        stats[source_type].feeds = {}
+    for row in ForecastSourceStats.query.all():
+        if row.source_type not in stats:
+            continue
+        total = stats[row.source_type]
+        for name in FORECAST_STATS_COUNTS:
+            setattr(total, name, getattr(total, name) + getattr(row, name))
+        total.feeds[row.source] = row
+    return stats
+
+def adjust_forecast_stats(source_type, source, **deltas):
+    """Apply count deltas to a feed's aggregate row inside the caller's transaction."""
+    db.session.execute(
+        sqlite_insert(ForecastSourceStats).values(source_type=source_type, source=source)
+        .on_conflict_do_nothing()
+    )
+    db.session.execute(
+        db.update(ForecastSourceStats)
+        .where(ForecastSourceStats.source_type == source_type, ForecastSourceStats.source == source)
+        .values({name: getattr(ForecastSourceStats, name) + delta for name, delta in deltas.items()})
+    )
+
+def rebuild_forecast_stats():
+    """Recompute every feed's aggregates from Forecast; used once when the stats table is new."""
+    ForecastSourceStats.query.delete()
+    rows = db.session.query(
+        Forecast.source_type, Forecast.source, Forecast.status, Forecast.reviewed_at.is_(None),
+        Forecast.severity, db.func.count(Forecast.id)
+    ).group_by(Forecast.source_type, Forecast.source, Forecast.status,
+               Forecast.reviewed_at.is_(None), Forecast.severity).all()
+    for source_type, source, status, unreviewed, severity, count in rows:
+        if source_type not in FORECAST_SOURCES:
+            continue
+        listed = 'approved' if FORECAST_SOURCES[source_type]['auto_approve'] else 'pending'
+        is_open = status == listed
+        adjust_forecast_stats(
+            source_type, source,
+            pending=count if status == 'pending' else 0,
+            approved=count if status == 'approved' and not unreviewed else 0,
+            rejected=count if status == 'rejected' else 0,
+            open_count=count if is_open else 0,
+            open_severity_sum=count * FORECAST_SEVERITY_WEIGHTS.get(severity, 0) if is_open else 0
+        )
+    db.session.commit()
+
+def forecast_external_id(item):
+    """A feed item's own id, or a hash of its content so a re-sent item is still recognised."""
+    if item.get('external_id'):
+        return str(item['external_id'])[:120]
+    content = [item.get(key) for key in ('title', 'description', 'region', 'location', 'severity', 'issued_at')]
+    return 'sha256-' + hashlib.sha256(json.dumps(content, default=str).encode()).hexdigest()[:40]
+
+def parse_forecast_item(item, source_type, source, status, now):
+    """Validate one feed item into an insert row; returns (row, error)."""
+    if not isinstance(item, dict) or not item.get('title'):
+        return None, 'title is required'
+    severity = item.get('severity', 'medium')
+    if severity not in FORECAST_SEVERITY_WEIGHTS:
+        return None, f"severity must be one of: {', '.join(FORECAST_SEVERITY_WEIGHTS)}"
+    try:
+        confidence = float(item['confidence']) if item.get('confidence') is not None else None
+        issued_at = now
+        if item.get('issued_at'):
+            issued_at = datetime.datetime.fromisoformat(item['issued_at'].replace('Z', '+00:00'))
+            if issued_at.tzinfo:
+                issued_at = issued_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None, 'invalid confidence or issued_at'
+    return {
+        'source_type': source_type,
+        'source': source,
+        'external_id': forecast_external_id(item),
+        'title': item['title'][:200],
+        'description': item.get('description'),
+        'region': item.get('region') or item.get('location'),
+        'severity': severity,
+        'confidence': confidence,
+        'status': status,
+        'issued_at': issued_at
+    }, None
+
+def ingest_forecasts(source_type, source, rows):
+    """Insert forecast rows in batches, skipping ones already ingested, and update the aggregates.
+
+    Returns the number of new forecasts. The caller commits.
+    """
+    statement = sqlite_insert(Forecast).on_conflict_do_nothing(
+        index_elements=['source', 'external_id']
+    ).returning(Forecast.severity)
+    inserted = []
+    batch_size = app.config['FORECAST_INGEST_BATCH_SIZE']
+    for start in range(0, len(rows), batch_size):
+        inserted.extend(severity for (severity,) in db.session.execute(statement, rows[start:start + batch_size]))
+
+    if inserted:
+        severity_sum = sum(FORECAST_SEVERITY_WEIGHTS[severity] for severity in inserted)
+        # Auto-approved forecasts are not review outcomes, so they leave approved/rejected alone
+        auto_approve = FORECAST_SOURCES[source_type]['auto_approve']
+        adjust_forecast_stats(
+            source_type,
+            source,
+            pending=0 if auto_approve else len(inserted),
+            open_count=len(inserted),
+            open_severity_sum=severity_sum
+        )
+    return len(inserted)
+
+def review_forecasts(source_type, forecast_ids, approve, reviewer_id):
+    """Approve or reject pending forecasts in one UPDATE and fold the outcome into the aggregates.
+
+    Returns the ids actually changed; ids that are unknown, from another source
+    or already reviewed are left alone. The caller commits.
+    """
+    changed = db.session.execute(
+        db.update(Forecast)
+        .where(Forecast.id.in_(forecast_ids), Forecast.source_type == source_type,
+               Forecast.status == 'pending')
+        .values(status='approved' if approve else 'rejected',
+                reviewed_at=datetime.datetime.utcnow(), reviewed_by=reviewer_id)
+        .returning(Forecast.id, Forecast.source, Forecast.severity)
+    ).all()
+    by_source = {}
+    for _, source, severity in changed:
+        by_source.setdefault(source, []).append(FORECAST_SEVERITY_WEIGHTS[severity])
+    for source, weights in by_source.items():
+        adjust_forecast_stats(
+            source_type,
+            source,
+            pending=-len(weights),
+            approved=len(weights) if approve else 0,
+            rejected=0 if approve else len(weights),
+            open_count=-len(weights),
+            open_severity_sum=-sum(weights)
+        )
+    return [forecast_id for forecast_id, _, _ in changed]
+
+def serialize_feed_stats(stats):
+    return {
+        source: {'trust_score': feed.trust_score, 'criticality': feed.criticality, 'pending_count': feed.pending}
+        for source, feed in stats.feeds.items()
+    }
+
+def forecast_groups(limit):
+    """Per-source aggregates plus the newest listed forecasts, as used by the admin page and API."""
+    stats = forecast_source_stats()
+    groups = {}
+    for source_type, spec in FORECAST_SOURCES.items():
+        status = 'approved' if spec['auto_approve'] else 'pending'
+        forecasts = Forecast.query.filter_by(source_type=source_type, status=status) \
+            .order_by(Forecast.issued_at.desc()).limit(limit).all()
+        groups[source_type] = {
+            'label': spec['label'],
+            'trust_score': stats[source_type].trust_score,
+            'criticality': stats[source_type].criticality,
+            'pending_count': stats[source_type].pending,
+            'sources': serialize_feed_stats(stats[source_type]),
+            'forecasts': [serialize_forecast(forecast) for forecast in forecasts]
+        }
+    return groups
+
+def seed_forecasts():
+    """Load the sample feeds the first time the forecast table is created."""
+    if Forecast.query.first():
+        return
+    now = datetime.datetime.utcnow()
+    samples = [
+        ('third_party', 'Indian Meteorological Department', 'Bardhaman', 'high', None, 2,
+         'Severe Cyclone Warning',
+         'Severe cyclonic storm approaching Bardhaman district. Wind speeds expected to reach 120-140 km/h. '
+         'Heavy rainfall and flooding likely in low-lying areas. Essential services may be disrupted.'),
+        ('third_party', 'Central Water Commission', 'Hooghly', 'high', None, 4,
+         'Damodar River Rising',
+         'Heavy rainfall expected to continue for next 24 hours in Hooghly region. River Damodar levels '
+         'rising rapidly. Immediate evacuation recommended for Arambagh and surrounding areas.'),
+        ('ai_based', 'DisasterPredict AI', 'Darjeeling', 'medium', 85, 1,
+         'Landslide Risk',
+         'ML model predicts 78% probability of landslides in Darjeeling hills due to sustained rainfall and '
+         'soil saturation levels. Areas near Kurseong and Kalimpong require immediate attention.'),
+        ('ai_based', 'InfraWatch AI', 'Kolkata', 'medium', 78, 3,
+         'Infrastructure Warning',
+         'Pattern analysis indicates potential structural issues in Howrah Bridge due to increased water '
+         'levels in Hooghly River. Immediate inspection of support structures recommended.'),
+        ('crowdsourced', 'Community Reports', 'Kolkata', 'low', 72, 0.5,
+         'Local Flooding',
+         'Multiple residents reporting rapid water level rise in Burrabazar area. Storm drains near Mahatma '
+         'Gandhi Road appear blocked. Local businesses affected.'),
+        ('crowdsourced', 'Health Workers Network', 'Burdwan', 'medium', 68, 1,
+         'Heat Wave Alert',
+         'Local health workers report increasing cases of heat-related illnesses in Burdwan city. '
+         'Temperatures expected to reach 45°C. Elderly population at high risk.')
+    ]
+    for index, (source_type, source, region, severity, confidence, hours_ago, title, description) in enumerate(samples):
+        status = 'approved' if FORECAST_SOURCES[source_type]['auto_approve'] else 'pending'
+        row, _ = parse_forecast_item({
+            'external_id': f'sample-{index + 1}', 'title': title, 'description': description,
+            'region': region, 'severity': severity, 'confidence': confidence
+        }, source_type, source, status, now - datetime.timedelta(hours=hours_ago))
+        ingest_forecasts(source_type, source, [row])
+    db.session.commit()
+    bump_data_version('forecasts')
+
 @app.route('/api/admin/forecasts', methods=['GET'])
 @login_required(role='admin')
+@etag_from_versions('forecasts')
 def get_forecasts():
-    """Get all forecasts grouped by source"""
+    """Get the newest forecasts and running trust/criticality aggregates grouped by source"""
     try:
-        # In a real app, this would fetch from database
-        forecasts = {
-            'third_party': {
-                'trust_score': 95,
-                'criticality': 'high',
-                'forecasts': [
-                    {
-                        'id': 'TP001',
-                        'title': 'Severe Cyclone Warning',
-                        'description': 'Category 4 cyclone approaching eastern coastline',
-                        'location': 'Bay of Bengal',
-                        'timestamp': '2025-09-23T10:00:00Z',
-                        'severity': 'high',
-                        'source': 'IMD Weather Service'
-                    }
-                ]
-            },
-            'ai_based': {
-                'trust_score': 87,
-                'criticality': 'medium',
-                'forecasts': [
-                    {
-                        'id': 'AI001',
-                        'title': 'Potential Flooding Risk',
-                        'description': 'ML models predict high flooding probability',
-                        'location': 'Yamuna Basin',
-                        'timestamp': '2025-09-23T11:30:00Z',
-                        'severity': 'medium',
-                        'source': 'DisasterPredict AI',
-                        'status': 'pending'
-                    }
-                ]
-            },
-            'crowdsourced': {
-                'trust_score': 82,
-                'criticality': 'low',
-                'forecasts': [
-                    {
-                        'id': 'CS001',
-                        'title': 'Landslide Warning',
-                        'description': 'Multiple reports of ground movement',
-                        'location': 'Himalayan Region',
-                        'timestamp': '2025-09-23T09:15:00Z',
-                        'severity': 'medium',
-                        'source': 'Community Reports',
-                        'status': 'pending'
-                    }
-                ]
-            }
-        }
-        return jsonify(forecasts), 200
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        return jsonify(forecast_groups(limit)), 200
     except Exception as e:
-        print(f"Error fetching forecasts: {str(e)}")
+        log.exception("Error fetching forecasts")
         return jsonify({'error': 'Failed to fetch forecasts'}), 500
 
+@app.route('/api/forecasts/ingest', methods=['POST'])
+def ingest_forecast_feed():
+    """Bulk ingestion endpoint for third-party, AI and crowdsourced forecast feeds.
+
+    Accepts an admin session or 'Authorization: Bearer <FORECAST_INGEST_TOKEN>'.
+    Items whose external_id was already ingested for the same source are skipped;
+    items without one are identified by a hash of their content.
+    """
+    token = app.config['FORECAST_INGEST_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and secrets.compare_digest(authorization, f'Bearer {token}')
+    if not token_ok and session.get('user_role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        data = request.get_json(silent=True) or {}
+        source_type = data.get('source_type')
+        source = data.get('source')
+        items = data.get('forecasts')
+        if source_type not in FORECAST_SOURCES or not source or not isinstance(items, list):
+            return jsonify({
+                'error': f"source_type (one of {', '.join(FORECAST_SOURCES)}), source and a forecasts list are required"
+            }), 400
+        if len(items) > app.config['FORECAST_INGEST_MAX_ITEMS']:
+            return jsonify({'error': f"At most {app.config['FORECAST_INGEST_MAX_ITEMS']} forecasts per request"}), 413
+
+        status = 'approved' if FORECAST_SOURCES[source_type]['auto_approve'] else 'pending'
+        now = datetime.datetime.utcnow()
+        rows, errors = [], []
+        for position, item in enumerate(items):
+            row, error = parse_forecast_item(item, source_type, source[:120], status, now)
+            if error:
+                errors.append({'index': position, 'error': error})
+            else:
+                rows.append(row)
+        if errors:
+            return jsonify({'error': 'Invalid forecasts', 'details': errors[:50]}), 400
+
+        inserted = ingest_forecasts(source_type, source[:120], rows)
+        db.session.commit()
+        if inserted:
+            bump_data_version('forecasts')
+        return jsonify({
+            'status': 'success',
+            'received': len(rows),
+            'inserted': inserted,
+            'duplicates': len(rows) - inserted
+        }), 201 if inserted else 200
+    except Exception as e:
+        db.session.rollback()
+        log.exception("Error ingesting forecasts")
+        return jsonify({'error': 'Failed to ingest forecasts'}), 500
+
 @app.route('/api/admin/forecasts/<source_type>/<action>', methods=['POST'])
 @login_required(role='admin')
 def handle_forecasts(source_type, action):
-    """Handle forecast approval/rejection"""
+    """Approve or reject a batch of pending forecasts in a single transaction"""
     try:
         if action not in ['approve', 'reject']:
             return jsonify({'error': 'Invalid action'}), 400
-        if source_type not in ['ai', 'crowdsourced']:
+        if source_type not in FORECAST_ROUTE_SOURCES:
             return jsonify({'error': 'Invalid source type'}), 400
-            
+
         data = request.get_json()
         if not data or 'forecast_ids' not in data:
             return jsonify({'error': 'No forecast IDs provided'}), 400
-            
-        forecast_ids = data['forecast_ids']
-        # In a real app, this would update database records
+        try:
+            forecast_ids = [int(forecast_id) for forecast_id in data['forecast_ids']]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Forecast IDs must be integers'}), 400
+
+        stored_source = FORECAST_ROUTE_SOURCES[source_type]
+        changed_ids = review_forecasts(stored_source, forecast_ids, action == 'approve', session.get('user_id'))
+        db.session.commit()
+        if changed_ids:
+            bump_data_version('forecasts')
+
+        stats = forecast_source_stats()[stored_source]
+        past_tense = 'approved' if action == 'approve' else 'rejected'
         return jsonify({
-            'message': f'Successfully {action}d {len(forecast_ids)} {source_type} forecasts',
-            f'{action}d_ids': forecast_ids
+            'message': f'Successfully {past_tense} {len(changed_ids)} {source_type} forecasts',
+            f'{past_tense}_ids': changed_ids,
+            'skipped_ids': sorted(set(forecast_ids) - set(changed_ids)),
+            'trust_score': stats.trust_score,
+            'criticality': stats.criticality,
+            'pending_count': stats.pending,
+            'sources': serialize_feed_stats(stats)
         }), 200
     except Exception as e:
-        print(f"Error approving forecasts: {str(e)}")
+        db.session.rollback()
+        log.exception("Error approving forecasts")
         return jsonify({'error': 'Failed to approve forecasts'}), 500
 
     locations = [
@@ -1612,40 +5814,48 @@ def sos_updates():
     """Server-Sent Events endpoint for real-time SOS request updates"""
     def event_stream():
         app_ctx = None
+        counted = False
         try:
             # Create application context
             app_ctx = app.app_context()
             app_ctx.push()
             
-            print("[SSE DEBUG] New client connected")
+            sse_log.debug("SSE client connected")
+            metrics.add_gauge('sse_open_connections', 1)
+            counted = True
             
             # Track sent request IDs for this connection
             connection_sent_ids = set()
             
             # Send stored emergency updates first if not already sent
             if hasattr(app, 'sos_updates'):
-                print(f"[SSE DEBUG] Processing {len(app.sos_updates)} stored updates")
+                sse_log.debug("Replaying stored updates", extra={'count': len(app.sos_updates)})
                 for update in app.sos_updates:
                     if (update.get('is_emergency') and 'data' in update and
                         'id' in update['data']):
                         request_id = update['data']['id']
                         if request_id not in app.global_sent_requests:
-                            print(f"[SSE DEBUG] Sending emergency update for request ID: {request_id}")
+                            sse_log.debug("Sending emergency update", extra={'request_id': request_id})
                             yield f"data: {json.dumps(update)}\n\n"
+                            metrics.inc('sse_events_sent_total', type='sos_update')
                             app.global_sent_requests.add(request_id)
                             connection_sent_ids.add(request_id)
             
             # Initial connection - send recent non-duplicate SOS requests
             with app.app_context():
-                recent_requests = SOSRequest.query.order_by(
-                    SOSRequest.timestamp.desc()
-                ).limit(5).all()
+                # Connections outlive the request, so check_query_budget never sees this query
+                with QueryCounter() as replay_queries:
+                    recent_requests = SOSRequest.query.order_by(
+                        SOSRequest.timestamp.desc()
+                    ).limit(5).all()
+                enforce_query_budget('sos_updates', replay_queries.count, replay_queries.seconds,
+                                     replay_queries.statements)
                 
-                print(f"[SSE DEBUG] Processing {len(recent_requests)} recent requests")
+                sse_log.debug("Sending recent requests", extra={'count': len(recent_requests)})
                 for request in recent_requests:
                     if (request.id not in connection_sent_ids and
                         request.id not in app.global_sent_requests):
-                        print(f"[SSE DEBUG] Sending update for request ID: {request.id}")
+                        sse_log.debug("Sending update", extra={'request_id': request.id})
                         
                         # Check if this is a high-priority emergency alert
                         is_emergency = request.sender_name == "Emergency SOS" and request.contact == "112"
@@ -1665,6 +5875,7 @@ def sos_updates():
                             'is_emergency': is_emergency
                         }
                         yield f"data: {json.dumps(data)}\n\n"
+                        metrics.inc('sse_events_sent_total', type='sos_update')
                         app.global_sent_requests.add(request.id)
                         connection_sent_ids.add(request.id)
 
@@ -1673,34 +5884,36 @@ def sos_updates():
                 # Send heartbeat every 15 seconds (reduced from 30 for better connection reliability)
                 try:
                     yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
+                    metrics.inc('sse_events_sent_total', type='heartbeat')
                     time.sleep(15)  # Reduced interval for more reliable connection maintenance
                 except (GeneratorExit, KeyboardInterrupt):
-                    print("[SSE] Heartbeat interrupted - cleaning up connection")
+                    sse_log.debug("Heartbeat interrupted, closing connection")
                     raise  # Re-raise to trigger cleanup in outer exception handler
                 except Exception as e:
-                    print(f"[SSE] Heartbeat error: {str(e)}")
+                    sse_log.warning("Heartbeat error: %s", e)
                     yield f"data: {json.dumps({'type': 'error', 'message': 'Heartbeat failure'})}\n\n"
                     break  # Exit the loop on error
 
         except GeneratorExit:
             # Client disconnected - clean up
-            print("[SSE] Client disconnected - cleaning up")
+            sse_log.debug("SSE client disconnected")
             if app_ctx:
                 app_ctx.pop()
         except Exception as e:
             error_msg = str(e)
-            print(f"[SSE] Error: {error_msg}")
-            print(f"[SSE] Traceback: {traceback.format_exc()}")
+            sse_log.exception("SSE stream error")
             yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
             if app_ctx:
                 app_ctx.pop()
         finally:
+            if counted:
+                metrics.add_gauge('sse_open_connections', -1)
             # Ensure context is always cleaned up
             if app_ctx:
                 try:
                     app_ctx.pop()
                 except Exception as cleanup_error:
-                    print(f"[SSE] Cleanup error: {cleanup_error}")
+                    sse_log.warning("SSE cleanup error: %s", cleanup_error)
 
     return Response(
         event_stream(),
@@ -1717,7 +5930,7 @@ def broadcast_sos_update(data, is_emergency=False):
     """Broadcast SOS update to connected SSE clients"""
     try:
         request_id = data.get('id')
-        print(f"[SSE DEBUG] Broadcasting SOS update for request ID: {request_id}")
+        sse_log.debug("Broadcasting SOS update", extra={'request_id': request_id})
         
         # Add emergency flag for high-priority alerts
         broadcast_data = {
@@ -1730,7 +5943,7 @@ def broadcast_sos_update(data, is_emergency=False):
         # Check if update already exists in app.sos_updates
         if hasattr(app, 'sos_updates'):
             if any(update.get('data', {}).get('id') == request_id for update in app.sos_updates):
-                print(f"[SSE DEBUG] Update for request ID {request_id} already exists, skipping broadcast")
+                sse_log.debug("SOS update already queued, skipping broadcast", extra={'request_id': request_id})
                 return True
 
         # In a production environment, use a proper pub/sub system
@@ -1742,41 +5955,66 @@ def broadcast_sos_update(data, is_emergency=False):
         # Keep only last 100 updates
         if len(app.sos_updates) > 100:
             app.sos_updates = app.sos_updates[-100:]
+        metrics.set_gauge('sse_queued_events', len(app.sos_updates))
 
         return True
     except Exception as e:
-        print(f"Error broadcasting SOS update: {str(e)}")
+        log.exception("Error broadcasting SOS update")
         return False
 
 
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
-    # Ensure user preferences are initialized
-    if 'user_preferences' not in session:
-        initialize_session()
     return render_template('home.html', **get_template_context()), 404
 
 @app.errorhandler(500)
 def internal_error(error):
-    # Ensure user preferences are initialized
-    if 'user_preferences' not in session:
-        initialize_session()
     return render_template('home.html', **get_template_context()), 500
 
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'healthy',
-        'version': '1.0.0',
+        'version': APP_VERSION,
         'a4f_configured': bool(openai_client),
         'maps_configured': app.config['MAPS_API_KEY'] != 'your-maps-api-key',
-        'timestamp': '2025-09-14T21:53:00Z'
+        'admission': admission_controller.snapshot(),
+        'page_cache': page_cache.stats(),
+        'alerts_version': get_data_version('alerts'),
+        'alert_fences': alert_fence_index.stats(),
+        'logging': log_handler.stats(),
+        'timestamp': datetime.datetime.utcnow().isoformat() + 'Z'
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint with totals from every worker.
+
+    Accepts an admin session or 'Authorization: Bearer <METRICS_TOKEN>'.
+    """
+    token = app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and secrets.compare_digest(authorization, f'Bearer {token}')
+    if not token_ok and session.get('user_role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        # This worker's latest counts, without waiting for its next scheduled flush
+        metrics.flush()
+        response = Response(render_metrics(), mimetype='text/plain')
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except sqlite3.Error as e:
+        log.exception("Error rendering metrics")
+        return jsonify({'error': 'Metrics store unavailable'}), 503
+
 # Create database and mock users
 with app.app_context():
     db.create_all()
+    db.session.execute(text(FACILITY_FTS_SCHEMA))
+    db.session.execute(text(FACILITY_FTS_RANK_SQL))
     if not User.query.filter_by(email='admin@disastrous.com').first():
         admin_user = User(email='admin@disastrous.com', password='admin', role='admin')
         db.session.add(admin_user)
@@ -1791,6 +6029,28 @@ with app.app_context():
         )
         db.session.add(rescue_user)
     db.session.commit()
+    # Before the facility seed and index, which select these; rows without them are geocoded
+    add_missing_columns('facility_location', {'latitude': 'FLOAT', 'longitude': 'FLOAT'})
+    sync_all_responders()
+    seed_facilities()
+    sync_facility_search_index()
+    # seq first: every Alert query selects it
+    if add_missing_columns('alert', {'seq': 'INTEGER'}):
+        backfill_alert_seq()
+    if add_missing_columns('alert', {'latitude': 'FLOAT', 'longitude': 'FLOAT'}):
+        backfill_alert_fences()
+    add_missing_columns('media_upload', {'latitude': 'FLOAT', 'longitude': 'FLOAT'})
+    add_missing_columns('sos_request', {'region': 'VARCHAR(100)', 'is_emergency': 'BOOLEAN DEFAULT 1'})
+    if SOSRequest.query.first() and not SOSRollupDay.query.first():
+        rebuild_sos_rollups()
+    # Stats moved from one row per source type to one per feed; the old table is derived data
+    db.session.execute(text('DROP TABLE IF EXISTS forecast_source_stats'))
+    db.session.commit()
+    if Forecast.query.first() and not ForecastSourceStats.query.first():
+        rebuild_forecast_stats()
+    seed_alerts()
+    seed_forecasts()
+    seed_resource_counts()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
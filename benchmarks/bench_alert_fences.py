@@ -0,0 +1,62 @@
+"""Compare grid-indexed alert geo-fence lookups with a linear scan over every alert.
+
+Usage: python benchmarks/bench_alert_fences.py [alert_count] [queries]
+"""
+import datetime
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import AlertFenceIndex, app, haversine_km  # noqa: E402
+
+# Rough bounding box of India
+LAT_RANGE = (8.0, 35.0)
+LNG_RANGE = (68.0, 97.0)
+RADII_KM = [10, 25, 50, 100, 150, 300]
+
+
+def make_alert(alert_id):
+    now = datetime.datetime.utcnow()
+    return SimpleNamespace(
+        id=alert_id, alert_type='FLOOD WARNING', severity='high', title=f'Alert {alert_id}',
+        location='', impact='', action='', status='active', expires_at=None,
+        latitude=random.uniform(*LAT_RANGE), longitude=random.uniform(*LNG_RANGE),
+        radius_km=random.choice(RADII_KM), issued_at=now, updated_at=now
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    random.seed(7)
+
+    alerts = [make_alert(i) for i in range(count)]
+    index = AlertFenceIndex(app.config['ALERT_GRID_DEGREES'])
+    start = time.perf_counter()
+    for alert in alerts:
+        index._add(alert)
+    print(f"indexed {count} fences into {len(index.cells)} cells in {time.perf_counter() - start:.2f} s")
+
+    targets = [(random.uniform(*LAT_RANGE), random.uniform(*LNG_RANGE)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    indexed = [sorted(a['id'] for a in index.containing(lat, lng)) for lat, lng in targets]
+    index_ms = (time.perf_counter() - start) / queries * 1000
+
+    start = time.perf_counter()
+    scanned = [sorted(a.id for a in alerts
+                      if haversine_km(lat, lng, a.latitude, a.longitude) <= a.radius_km)
+               for lat, lng in targets[:50]]
+    scan_ms = (time.perf_counter() - start) / 50 * 1000
+
+    matched = sum(len(ids) for ids in indexed) / queries
+    print(f"grid index {index_ms:7.3f} ms/query   linear scan {scan_ms:8.1f} ms/query"
+          f"   avg matches {matched:.1f}   results match: {indexed[:50] == scanned}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measure facility search latency over a synthetic nationwide FTS5 index.
+
+Usage: python benchmarks/bench_facility_search.py [facility_count]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    FACILITY_FTS_INSERT_SQL, FACILITY_FTS_RANK_SQL, FACILITY_FTS_SCHEMA, FACILITY_SEARCH_SQL,
+    build_fts_match_query, facility_search_row
+)
+
+DISTRICTS = ['Bardhaman', 'Hooghly', 'Nadia', 'Howrah', 'Puri', 'Cuttack', 'Patna', 'Gaya',
+             'Lucknow', 'Kanpur', 'Pune', 'Nagpur', 'Chennai', 'Madurai', 'Guwahati', 'Shillong']
+TYPES = ['hospital', 'ambulance', 'fire', 'police']
+FEATURES = ['ICU Available', '24/7', 'Beds Available', 'Emergency Service', 'Trauma Centre',
+            'Blood Bank', 'Burn Unit', 'ICU Equipped', 'Police Station', 'Fire Service']
+QUERIES = ['ICU Burdwan', 'ambulance 713104', 'trauma pune', 'blood bank', 'fire 7131',
+           'police nadia', 'hospital chen', 'burn unit kolkata', 'emergency 56']
+
+
+def synthetic_facility(i):
+    district = random.choice(DISTRICTS)
+    pincode = f'{random.randint(110000, 855999)}'
+    facility_type = random.choice(TYPES)
+    return {
+        'id': i,
+        'name': f'{district} {facility_type.title()} {i}',
+        'type': facility_type,
+        'location': f'Ward {i % 97}, Main Road, {district}-{pincode}',
+        'district': district,
+        'state': 'India',
+        'pincode': pincode,
+        'features': [{'icon': None, 'text': t} for t in random.sample(FEATURES, 3)],
+        'contacts': [{'kind': 'phone', 'value': f'0{random.randint(3000000000, 9999999999)}'}]
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    random.seed(7)
+    conn = sqlite3.connect(':memory:')
+    conn.execute(FACILITY_FTS_SCHEMA)
+    conn.execute(FACILITY_FTS_RANK_SQL)
+
+    start = time.perf_counter()
+    conn.executemany(FACILITY_FTS_INSERT_SQL,
+                     (facility_search_row(synthetic_facility(i)) for i in range(1, count + 1)))
+    conn.commit()
+    print(f"indexed {count} facilities in {time.perf_counter() - start:.2f} s")
+
+    for query in QUERIES:
+        match = build_fts_match_query(query)
+        timings = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            rows = conn.execute(FACILITY_SEARCH_SQL, {'match': match, 'limit': 20}).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+        print(f"{query!r:22} hits={len(rows):3d}  p50={statistics.median(timings):6.2f} ms"
+              f"  p95={timings[int(len(timings) * 0.95) - 1]:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
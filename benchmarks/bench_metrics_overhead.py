@@ -0,0 +1,70 @@
+"""Measure what metrics instrumentation adds to each request.
+
+Usage: python benchmarks/bench_metrics_overhead.py [requests]
+
+Times the recording calls on their own, a full GET /health through the test
+client with METRICS_ENABLED on and off (interleaved, so drift hits both
+sides equally), and one flush of a worker's buffers into the runtime DB.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RUNTIME_DB_PATH', os.path.join(tempfile.mkdtemp(), 'runtime.db'))
+
+from app import app, metrics, render_metrics  # noqa: E402
+
+ROUNDS = 20
+
+
+def time_calls(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_round = max(1, iterations // ROUNDS)
+
+    observe_us = time_calls(lambda: metrics.observe(
+        'http_request_duration_seconds', 0.012, route='health', method='GET', status='200'), iterations * 10)
+    inc_us = time_calls(lambda: metrics.inc('sse_events_sent_total', type='heartbeat'), iterations * 10)
+
+    client = app.test_client()
+    client.get('/health')
+    enabled, disabled = [], []
+    for _ in range(ROUNDS):
+        for flag, results in ((True, enabled), (False, disabled)):
+            app.config['METRICS_ENABLED'] = flag
+            results.append(time_calls(lambda: client.get('/health'), per_round))
+    app.config['METRICS_ENABLED'] = True
+
+    # A busy worker's buffer: every route/status pair plus DB and LLM series
+    for route in range(40):
+        for status in ('200', '304', '404', '500'):
+            metrics.observe('http_request_duration_seconds', 0.02, route=f'route_{route}', method='GET',
+                            status=status)
+    flush_start = time.perf_counter()
+    metrics.flush()
+    flush_ms = (time.perf_counter() - flush_start) * 1000
+    render_start = time.perf_counter()
+    body = render_metrics()
+    render_ms = (time.perf_counter() - render_start) * 1000
+
+    request_on, request_off = statistics.median(enabled), statistics.median(disabled)
+    print(f"observe():              {observe_us:7.2f} us/call")
+    print(f"inc():                  {inc_us:7.2f} us/call")
+    print(f"GET /health, metrics on {request_on:7.1f} us/request")
+    print(f"GET /health, off        {request_off:7.1f} us/request")
+    print(f"overhead                {request_on - request_off:7.1f} us/request (median of {ROUNDS} rounds)")
+    print(f"flush of 160 series     {flush_ms:7.2f} ms, off the request path")
+    print(f"render /metrics         {render_ms:7.2f} ms, {len(body.splitlines())} lines")
+
+
+if __name__ == '__main__':
+    main()
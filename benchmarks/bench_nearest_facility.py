@@ -0,0 +1,57 @@
+"""Compare k-d tree nearest-facility queries with a brute-force haversine scan.
+
+Usage: python benchmarks/bench_nearest_facility.py [facility_count] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import KDTree, feature_predicate, haversine_km  # noqa: E402
+
+# Rough bounding box of India
+LAT_RANGE = (8.0, 35.0)
+LNG_RANGE = (68.0, 97.0)
+FEATURES = ['ICU Available', '24/7', 'Beds Available', 'Trauma Centre', 'Blood Bank']
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(11)
+
+    coordinates = [(random.uniform(*LAT_RANGE), random.uniform(*LNG_RANGE)) for _ in range(count)]
+    items = [{'id': i, 'features': [{'text': t} for t in random.sample(FEATURES, 2)]}
+             for i in range(count)]
+
+    start = time.perf_counter()
+    tree = KDTree(items, coordinates)
+    print(f"built tree over {count} facilities in {time.perf_counter() - start:.2f} s")
+
+    targets = [(random.uniform(*LAT_RANGE), random.uniform(*LNG_RANGE)) for _ in range(queries)]
+    icu = feature_predicate('icu')
+
+    for label, k, predicate in [('k=1', 1, None), ('k=3', 3, None), ('k=3 ICU only', 3, icu)]:
+        start = time.perf_counter()
+        tree_results = [tree.nearest(lat, lng, k, predicate) for lat, lng in targets]
+        tree_ms = (time.perf_counter() - start) / queries * 1000
+
+        start = time.perf_counter()
+        brute_results = []
+        for lat, lng in targets[:20]:
+            scored = sorted(
+                (haversine_km(lat, lng, c[0], c[1]), i) for i, c in enumerate(coordinates)
+                if predicate is None or predicate(items[i])
+            )
+            brute_results.append([i for _, i in scored[:k]])
+        brute_ms = (time.perf_counter() - start) / 20 * 1000
+
+        agree = all([item['id'] for item, _ in tree_results[n]] == brute_results[n] for n in range(20))
+        print(f"{label:14} kd-tree {tree_ms:7.3f} ms/query   brute force {brute_ms:8.1f} ms/query"
+              f"   results match: {agree}")
+
+
+if __name__ == '__main__':
+    main()
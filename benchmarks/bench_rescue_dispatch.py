@@ -0,0 +1,78 @@
+"""Show that rescue dispatch latency stays flat as responders and requests grow.
+
+Usage: python benchmarks/bench_rescue_dispatch.py [requests_per_size]
+
+Runs against the app database inside one transaction that is rolled back at
+the end, so nothing is left behind.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import RescueRequest, ResponderLoad, app, db, dispatch_rescue_request  # noqa: E402
+
+CITIES = ['Bardhaman', 'Kolkata', 'Patna', 'Puri', 'Pune', 'Chennai', 'Lucknow', 'Guwahati']
+STATES = ['West Bengal', 'Bihar', 'Odisha', 'Maharashtra', 'Tamil Nadu', 'Uttar Pradesh', 'Assam']
+SIZES = [100, 1000, 10000, 50000]
+
+
+def random_pincode():
+    return f'{random.randint(110, 855)}{random.randint(0, 999):03d}'
+
+
+def add_responders(start_id, count):
+    rows = []
+    for user_id in range(start_id, start_id + count):
+        pincode = random_pincode()
+        rows.append({'user_id': user_id, 'pincode': pincode, 'pincode_area': pincode[:3],
+                     'city': random.choice(CITIES).lower(), 'state': random.choice(STATES).lower(),
+                     'open_count': random.randint(0, 9)})
+    db.session.execute(ResponderLoad.__table__.insert(), rows)
+
+
+def main():
+    per_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    random.seed(7)
+    with app.app_context():
+        try:
+            # Synthetic responders need no matching user rows for this measurement
+            db.session.execute(text('PRAGMA foreign_keys=OFF'))
+            next_id, total_requests = 10_000_000, 0
+            for size in SIZES:
+                add_responders(next_id, size - (next_id - 10_000_000))
+                next_id = 10_000_000 + size
+                timings = []
+                for _ in range(per_size):
+                    rescue_request = RescueRequest(emergency_type='flood', contact='9999999999',
+                                                   pincode=random_pincode(), city=random.choice(CITIES),
+                                                   state=random.choice(STATES))
+                    db.session.add(rescue_request)
+                    start = time.perf_counter()
+                    db.session.flush()
+                    dispatch_rescue_request(rescue_request)
+                    db.session.flush()
+                    timings.append((time.perf_counter() - start) * 1000)
+                total_requests += per_size
+                levels = db.session.query(RescueRequest.match_level, db.func.count()) \
+                    .group_by(RescueRequest.match_level).all()
+                timings.sort()
+                print(f"{size:6d} responders {total_requests:6d} requests   "
+                      f"p50 {statistics.median(timings):6.3f} ms   p95 {timings[int(len(timings) * 0.95)]:6.3f} ms   "
+                      f"match levels {dict(levels)}")
+
+            plan = db.session.execute(text(
+                'EXPLAIN QUERY PLAN SELECT user_id FROM responder_load WHERE open_count < 10 AND pincode = :p '
+                'ORDER BY open_count, user_id LIMIT 1'), {'p': '713104'}).all()
+            print('pincode probe plan:', '; '.join(row[-1] for row in plan))
+        finally:
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Local OpenAI-compatible chat completions server for load tests.
+
+Usage: python benchmarks/llm_stub.py [--port 8099] [--latency-ms 800] [--jitter-ms 200]
+                                     [--error-rate 0.05] [--error-status 503]
+
+Answers POST /v1/chat/completions after a random delay with a canned reply,
+or with --error-status for --error-rate of the calls. Point the app at it with
+A4F_BASE_URL=http://127.0.0.1:<port>/v1 and any A4F_API_KEY.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/stats'):
+            with self.server.lock:
+                self.send_json(200, dict(self.server.stats))
+        else:
+            self.send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': {'message': 'Invalid JSON'}})
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        options = self.server.options
+        delay = max(0.0, random.gauss(options.latency_ms, options.jitter_ms)) / 1000
+        time.sleep(delay)
+        failed = random.random() < options.error_rate
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+            self.server.stats['errors'] += failed
+
+        if failed:
+            self.send_json(options.error_status, {'error': {
+                'message': f'Stub error {options.error_status}: service temporarily unavailable',
+                'type': 'server_error'
+            }})
+            return
+
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        # Translation prompts end with the text; echo it so the app's checks pass
+        reply = prompt.rsplit('Text to translate:', 1)[-1].split('Return ONLY', 1)[0].strip() or 'Stay safe.'
+        self.send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': reply}}],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(reply.split()),
+                      'total_tokens': len(prompt.split()) + len(reply.split())}
+        })
+
+
+def make_server(port, latency_ms=800.0, jitter_ms=200.0, error_rate=0.0, error_status=503):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.options = argparse.Namespace(latency_ms=latency_ms, jitter_ms=jitter_ms,
+                                        error_rate=error_rate, error_status=error_status)
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'errors': 0}
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible stub for load tests')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help='mean response delay')
+    parser.add_argument('--jitter-ms', type=float, default=200.0, help='standard deviation of the delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of failed calls')
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    print(f"LLM stub on http://127.0.0.1:{args.port}/v1 "
+          f"({args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, {args.error_rate:.0%} errors)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
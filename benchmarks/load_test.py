@@ -0,0 +1,395 @@
+"""Drive the app at scripted rates and report throughput and latency percentiles as JSON.
+
+Usage: python benchmarks/load_test.py [--profile FILE] [--duration SECONDS] [--workers N]
+                                      [--threads N] [--url URL] [--output FILE]
+
+By default this starts the LLM stub (benchmarks/llm_stub.py) in-process and
+the app under gunicorn with --preload, on a throwaway copy of the database
+with rate limiting off. It runs every scenario of the profile at once and
+then stops both. Requests are sent open-loop at each scenario's rate.
+Latency is measured from the scheduled send time, so a server that falls
+behind shows up in the percentiles instead of slowing the load down. Pass
+--url to load an app that is already running instead.
+
+The report is one JSON document, with the commit and settings, so runs can be
+diffed between commits.
+
+SSE streams are opened and held, but the app's /sse/sos-updates only replays
+recent alerts at connect and then sends heartbeats: SOS alerts posted during
+the run are not pushed to open streams. The report counts replayed, live and
+heartbeat events separately and says so when no live fan-out was observed, so
+stream numbers are not mistaken for delivery latency.
+
+Each stream holds a gunicorn thread for the whole run, so the script refuses to
+start when the streams would take every server thread.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_stub import make_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGINS = {'admin': ('admin@disastrous.com', 'admin'), 'rescue': ('rescue@disastrous.com', 'rescue')}
+
+DEFAULT_PROFILE = {
+    'duration_seconds': 30,
+    'max_in_flight': 128,
+    'scenarios': {
+        'sos': {'method': 'POST', 'path': '/api/sos', 'rate': 20,
+                'json': {'message': 'Water entering houses', 'location': 'Bardhaman', 'contact': '9999999999'}},
+        'sos_requests': {'method': 'GET', 'path': '/rescue/sos-requests', 'rate': 20, 'login': 'rescue'},
+        'translate': {'method': 'POST', 'path': '/api/translate', 'rate': 2,
+                      'json': {'text': '112: Emergency\nstay_safe: Stay indoors', 'target_language': 'Hindi'}},
+        'chat': {'method': 'POST', 'path': '/api/chat', 'rate': 2,
+                 'json': {'message': 'What should I do during a flood?', 'type': 'ai', 'language': 'en'}}
+    },
+    # Each stream holds a server thread for the whole run
+    'sse': {'clients': 16, 'path': '/sse/sos-updates'},
+    'llm_stub': {'latency_ms': 800, 'jitter_ms': 200, 'error_rate': 0.02, 'error_status': 503}
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies):
+    ordered = sorted(latencies)
+    return {f'p{int(q * 100)}_ms': round(percentile(ordered, q) * 1000, 2) if ordered else None
+            for q in (0.5, 0.95, 0.99)} | {'max_ms': round(ordered[-1] * 1000, 2) if ordered else None}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_app(port, llm_url, workers, threads, workdir):
+    database = os.path.join(workdir, 'disastrous.db')
+    if os.path.exists(os.path.join(ROOT, 'instance', 'disastrous.db')):
+        shutil.copy(os.path.join(ROOT, 'instance', 'disastrous.db'), database)
+    env = dict(os.environ,
+               SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}',
+               RUNTIME_DB_PATH=os.path.join(workdir, 'runtime.db'),
+               RATE_LIMIT_ENABLED='false',
+               A4F_API_KEY='load-test',
+               A4F_BASE_URL=llm_url,
+               LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'),
+               PORT=str(port))
+    if shutil.which('gunicorn'):
+        # --preload runs the startup seeding once, before the workers fork
+        command = ['gunicorn', '--preload', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+                   '--graceful-timeout', '5', '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    else:
+        command = [sys.executable, 'app.py']
+    log_file = open(os.path.join(workdir, 'server.log'), 'w')
+    # Own process group, so stop_app() also reaches workers stuck on open streams
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+
+def stop_app(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def wait_until_ready(base_url, process, timeout=90):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'App exited with {process.returncode} before it was ready')
+        try:
+            if requests.get(f'{base_url}/health', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'App did not answer /health within {timeout}s')
+
+
+def login_cookies(base_url):
+    cookies = {None: {}}
+    for role, (email, password) in LOGINS.items():
+        session = requests.Session()
+        session.post(f'{base_url}/authority-login', data={'email': email, 'password': password},
+                     allow_redirects=False, timeout=10)
+        cookies[role] = session.cookies.get_dict()
+    return cookies
+
+
+class ScenarioRun:
+    """Sends one scenario's requests at a fixed rate and collects their outcomes."""
+
+    def __init__(self, name, spec, base_url, cookies, pool, duration):
+        self.name = name
+        self.spec = spec
+        self.url = base_url + spec['path']
+        self.cookies = cookies.get(spec.get('login'), {})
+        self.pool = pool
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.status_counts = {}
+        self.errors = 0
+        self.local = threading.local()
+        self.futures = []
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.cookies.update(self.cookies)
+        return self.local.session
+
+    def send(self, scheduled):
+        try:
+            # Stamped like a proxy would, so admission control sees the time spent in gunicorn's queue
+            response = self.session().request(self.spec['method'], self.url, json=self.spec.get('json'),
+                                              headers={'X-Request-Start': f't={time.time():.6f}'},
+                                              allow_redirects=False, timeout=60)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - scheduled
+        with self.lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if status.startswith('2'):
+                self.latencies.append(elapsed)
+            else:
+                self.errors += 1
+
+    def run(self, started):
+        interval = 1.0 / self.spec['rate']
+        count = int(self.duration * self.spec['rate'])
+        for i in range(count):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.futures.append(self.pool.submit(self.send, scheduled))
+
+    def report(self, elapsed):
+        sent = sum(self.status_counts.values())
+        return {
+            'method': self.spec['method'],
+            'path': self.spec['path'],
+            'target_rate': self.spec['rate'],
+            'sent': sent,
+            'ok': len(self.latencies),
+            'errors': self.errors,
+            'error_rate': round(self.errors / sent, 4) if sent else None,
+            'throughput_rps': round(len(self.latencies) / elapsed, 2),
+            'status_counts': dict(sorted(self.status_counts.items())),
+            **summarize_latencies(self.latencies)
+        }
+
+
+class SSEClient(threading.Thread):
+    """Holds one event stream open and records time to first event and events received.
+
+    sos_update events before the first heartbeat are the connect-time replay;
+    any after it would be live fan-out.
+    """
+
+    def __init__(self, url, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.first_event = None
+        self.events = {'replayed': 0, 'live': 0, 'heartbeat': 0, 'other': 0}
+        self.error = None
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            with requests.get(self.url, stream=True, timeout=(10, 30),
+                              headers={'Accept': 'text/event-stream'}) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line.startswith(b'data:'):
+                        if self.first_event is None:
+                            self.first_event = time.perf_counter() - started
+                        self.count_event(line[5:])
+                    if self.stop.is_set():
+                        break
+        except requests.RequestException as e:
+            if not self.stop.is_set():
+                self.error = type(e).__name__
+
+    def count_event(self, payload):
+        try:
+            event_type = json.loads(payload).get('type')
+        except ValueError:
+            event_type = None
+        if event_type == 'heartbeat':
+            self.events['heartbeat'] += 1
+        elif event_type == 'sos_update':
+            self.events['live' if self.events['heartbeat'] else 'replayed'] += 1
+        else:
+            self.events['other'] += 1
+
+
+def run_load(base_url, profile):
+    cookies = login_cookies(base_url)
+    duration = profile['duration_seconds']
+    stop = threading.Event()
+    sse_clients = [SSEClient(base_url + profile['sse']['path'], stop) for _ in range(profile['sse']['clients'])]
+    for client in sse_clients:
+        client.start()
+
+    with ThreadPoolExecutor(max_workers=profile['max_in_flight']) as pool:
+        runs = [ScenarioRun(name, spec, base_url, cookies, pool, duration)
+                for name, spec in profile['scenarios'].items()]
+        started = time.perf_counter()
+        schedulers = [threading.Thread(target=run.run, args=(started,), daemon=True) for run in runs]
+        for scheduler in schedulers:
+            scheduler.start()
+        for scheduler in schedulers:
+            scheduler.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+
+    first_events = [client.first_event for client in sse_clients if client.first_event is not None]
+    sse_errors = {}
+    events = {kind: 0 for kind in ('replayed', 'live', 'heartbeat', 'other')}
+    for client in sse_clients:
+        if client.error:
+            sse_errors[client.error] = sse_errors.get(client.error, 0) + 1
+        for kind, count in client.events.items():
+            events[kind] += count
+    sse = {
+        'clients': len(sse_clients),
+        'connected': len(first_events),
+        'events': events,
+        'errors': sse_errors,
+        # Time to the first event of any kind, not SOS delivery latency
+        **{f'first_event_{key}': value for key, value in summarize_latencies(first_events).items()}
+    }
+    if not events['live']:
+        sse['fan_out'] = ('not exercised: the stream sent no SOS alerts after connecting, so '
+                          'delivery latency of alerts posted during the run is not measured')
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'scenarios': {run.name: run.report(elapsed) for run in runs},
+        'sse': sse
+    }
+
+
+def load_profile(path, duration):
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path, encoding='utf-8') as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and isinstance(profile.get(key), dict) and key != 'scenarios':
+                profile[key].update(value)
+            else:
+                profile[key] = value
+    if duration:
+        profile['duration_seconds'] = duration
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the app at scripted rates')
+    parser.add_argument('--profile', help='JSON file overriding parts of DEFAULT_PROFILE')
+    parser.add_argument('--duration', type=float, help='seconds per run (overrides the profile)')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn threads per worker')
+    parser.add_argument('--url', help='load an already running app instead of starting one')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    profile = load_profile(args.profile, args.duration)
+    server_threads = args.workers * args.threads
+    if not args.url and shutil.which('gunicorn'):
+        if server_threads <= profile['sse']['clients']:
+            parser.error(f"{profile['sse']['clients']} SSE streams would hold all {server_threads} server threads "
+                         f"(--workers x --threads); raise --threads or lower sse.clients")
+        if server_threads < 2 * profile['sse']['clients']:
+            # Connections are not spread evenly over workers, so one worker can run out first
+            print(f"warning: SSE streams take {profile['sse']['clients']} of {server_threads} server threads",
+                  file=sys.stderr)
+
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    stub = process = None
+    try:
+        stub_stats_url = None
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            stub = make_server(free_port(), **profile['llm_stub'])
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            llm_url = f'http://127.0.0.1:{stub.server_address[1]}/v1'
+            stub_stats_url = f'{llm_url}/stats'
+            port = free_port()
+            process = start_app(port, llm_url, args.workers, args.threads, workdir)
+            base_url = f'http://127.0.0.1:{port}'
+        wait_until_ready(base_url, process)
+
+        started_at = datetime.datetime.utcnow().isoformat() + 'Z'
+        results = run_load(base_url, profile)
+        report = {
+            'commit': git_commit(),
+            'started_at': started_at,
+            'environment': {
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'server': 'external' if args.url else ('gunicorn' if shutil.which('gunicorn') else 'flask'),
+                'workers': None if args.url else args.workers,
+                'threads': None if args.url else args.threads
+            },
+            'profile': profile,
+            **results
+        }
+        if stub_stats_url:
+            report['llm_stub_stats'] = requests.get(stub_stats_url, timeout=5).json()
+    finally:
+        if process is not None:
+            stop_app(process)
+        if stub is not None:
+            stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
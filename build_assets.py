@@ -0,0 +1,293 @@
+"""Build fingerprinted, minified and precompressed static assets.
+
+Usage: python build_assets.py [--clean]
+
+Writes static/dist/ with content-hashed copies of every file under
+static/js and static/css, the bundles listed in ASSET_BUNDLES, a .gz and
+(when the optional brotli package is installed) a .br variant of each, and
+static/dist/manifest.json mapping logical names to hashed paths. app.py reads
+the manifest through the asset_url() / bundle_urls() template helpers and
+falls back to the plain files when no build exists.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+SOURCE_DIRS = ('js', 'css')
+
+# Files loaded on every page, concatenated in the order base.html used to load them
+ASSET_BUNDLES = {
+    'core.css': [
+        'css/base.css',
+        'css/components.css',
+        'css/components/map.css'
+    ],
+    'core.js': [
+        'js/base.js',
+        'js/components/translation.js',
+        'js/components/accessibility.js',
+        'js/components/chatbot.js',
+        'js/components/pwa.js',
+        'js/collapsible.js',
+        'js/components/map.js'
+    ]
+}
+
+# Characters after which a '/' starts a regular expression rather than a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                  'throw', 'yield', 'await'}
+
+
+def _skip_quoted(source, i, quote):
+    """Return the index just past the string literal starting at source[i]."""
+    i += 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote or source[i] == '\n':
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """Return the index just past the regex literal (and flags) starting at source[i]."""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _regex_allowed(out):
+    """Decide from the code emitted so far whether a '/' begins a regex literal."""
+    text = ''.join(out[-20:]).rstrip()
+    if not text:
+        return True
+    if text[-1] in REGEX_PRECEDERS:
+        return True
+    match = re.search(r'([A-Za-z_$][\w$]*)$', text)
+    return bool(match and match.group(1) in REGEX_KEYWORDS)
+
+
+def _minify_js_code(source, i, out, stop_at_brace=False):
+    """Copy code from source[i:] into out without comments or indentation.
+
+    Strings, template literals and regex literals are copied verbatim. When
+    stop_at_brace is set (inside a template ${...}), returns after the
+    matching closing brace.
+    """
+    depth = 0
+    at_line_start = False
+    while i < len(source):
+        c = source[i]
+        nxt = source[i + 1] if i + 1 < len(source) else ''
+
+        if c == '\n':
+            while out and out[-1] in (' ', '\t'):
+                out.pop()
+            if out and out[-1] != '\n':
+                out.append('\n')
+            at_line_start = True
+            i += 1
+            continue
+        if c in ' \t\r':
+            if not at_line_start and out and out[-1] not in (' ', '\n'):
+                out.append(' ')
+            i += 1
+            continue
+        at_line_start = False
+
+        if c == '/' and nxt == '/':
+            while i < len(source) and source[i] != '\n':
+                i += 1
+            continue
+        if c == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            end = len(source) if end == -1 else end + 2
+            if '\n' in source[i:end]:
+                out.append('\n')
+                at_line_start = True
+            i = end
+            continue
+        if c in ('"', "'"):
+            end = _skip_quoted(source, i, c)
+            out.append(source[i:end])
+            i = end
+            continue
+        if c == '`':
+            i = _copy_template(source, i, out)
+            continue
+        if c == '/' and _regex_allowed(out):
+            end = _skip_regex(source, i)
+            out.append(source[i:end])
+            i = end
+            continue
+
+        if stop_at_brace:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                if depth == 0:
+                    out.append(c)
+                    return i + 1
+                depth -= 1
+        out.append(c)
+        i += 1
+    return i
+
+
+def _copy_template(source, i, out):
+    """Copy a template literal verbatim, minifying only the code inside ${...}."""
+    out.append('`')
+    i += 1
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            out.append(source[i:i + 2])
+            i += 2
+            continue
+        if c == '`':
+            out.append('`')
+            return i + 1
+        if c == '$' and source[i + 1:i + 2] == '{':
+            out.append('${')
+            i = _minify_js_code(source, i + 2, out, stop_at_brace=True)
+            continue
+        out.append(c)
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines; line breaks are kept so ASI still applies."""
+    out = []
+    _minify_js_code(source, 0, out)
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Strip comments and collapse whitespace outside string literals."""
+    out = []
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c in ('"', "'"):
+            end = _skip_quoted(source, i, c)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+        elif c.isspace():
+            while i < len(source) and source[i].isspace():
+                i += 1
+            if out and out[-1] not in ('{', '}', ';', ',', ':', '>', ' '):
+                out.append(' ')
+        elif c in '{};,>':
+            while out and out[-1] == ' ':
+                out.pop()
+            out.append(c)
+            i += 1
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify(logical_name, source):
+    if logical_name.endswith('.js'):
+        return minify_js(source)
+    if logical_name.endswith('.css'):
+        return minify_css(source)
+    return source
+
+
+def read_source(logical_name):
+    with open(os.path.join(STATIC_DIR, logical_name), encoding='utf-8') as f:
+        return f.read()
+
+
+def write_asset(logical_name, content, manifest):
+    """Write content under a content-hashed name plus precompressed variants."""
+    data = content.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(logical_name)
+    hashed_name = f'{stem}.{digest}{ext}'
+    target = os.path.join(DIST_DIR, hashed_name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with open(target, 'wb') as f:
+        f.write(data)
+    with open(target + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(target + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+    manifest[logical_name] = hashed_name
+    return len(data)
+
+
+def build(clean=False):
+    # Files from earlier builds are kept by default so pages still cached by
+    # browsers can load the asset versions they reference
+    if clean and os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    manifest = {}
+    original_bytes = built_bytes = 0
+    for source_dir in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(STATIC_DIR, source_dir)):
+            for filename in sorted(files):
+                logical_name = os.path.relpath(os.path.join(root, filename), STATIC_DIR).replace(os.sep, '/')
+                source = read_source(logical_name)
+                original_bytes += len(source.encode('utf-8'))
+                built_bytes += write_asset(logical_name, minify(logical_name, source), manifest)
+
+    for bundle_name, members in ASSET_BUNDLES.items():
+        separator = ';\n' if bundle_name.endswith('.js') else '\n'
+        content = separator.join(minify(name, read_source(name)) for name in members)
+        write_asset(f'bundles/{bundle_name}', content, manifest)
+
+    build_version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'version': build_version, 'assets': manifest}, f, indent=2, sort_keys=True)
+
+    print(f"Built {len(manifest)} assets into {os.path.relpath(DIST_DIR, BASE_DIR)} "
+          f"({original_bytes} -> {built_bytes} bytes before compression, version {build_version})")
+    if brotli is None:
+        print("brotli not installed: only .gz variants were written")
+
+
+if __name__ == '__main__':
+    build(clean='--clean' in sys.argv[1:])
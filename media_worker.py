@@ -0,0 +1,203 @@
+"""Process uploaded report media in the background.
+
+Usage: python media_worker.py [--processes N] [--poll SECONDS] [--once]
+
+Claims MediaJob rows from the app database (claim_media_jobs() in app.py) and
+runs them on a process pool: JPEG thumbnails and EXIF GPS extraction for
+photos (needs the optional Pillow package) and low-bandwidth copies of video
+and audio (needs the ffmpeg binary). The worker never claims more jobs than it
+has idle processes, so a backlog stays in the queue where the upload API sees
+it and pushes back. Failed jobs are retried with backoff by fail_media_job().
+"""
+import argparse
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:
+    Image = None
+
+FFMPEG = shutil.which('ffmpeg')
+TRANSCODE_TIMEOUT = 300
+EXIF_GPS_IFD = 0x8825
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+# Written as JSON by the app's logging setup once main() imports the app
+log = logging.getLogger('disastrous.media_worker')
+
+
+class PermanentJobError(Exception):
+    """A job that would fail the same way on every attempt (missing tool, unreadable file)."""
+
+
+def blob_path(media_dir, digest):
+    return os.path.join(media_dir, 'blobs', digest[:2], digest)
+
+
+def write_derivative(derived_dir, filename, produce):
+    """Let produce(tmp_path) write a file, then move it into place; returns its size."""
+    target = os.path.join(derived_dir, filename)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f'{target}.{os.getpid()}.tmp'
+    try:
+        produce(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(target)
+
+
+def open_image(source):
+    if Image is None:
+        raise PermanentJobError('Pillow is not installed')
+    try:
+        return Image.open(source)
+    except UnidentifiedImageError as e:
+        raise PermanentJobError(f'Not a readable image: {e}')
+
+
+def make_thumbnail(source, digest, derived_dir, options):
+    filename = f'{digest[:2]}/{digest}-thumbnail.jpg'
+
+    def produce(tmp_path):
+        with open_image(source) as image:
+            # Phones store portrait photos sideways plus an orientation tag
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((options['thumbnail_size'], options['thumbnail_size']))
+            image.convert('RGB').save(tmp_path, 'JPEG', quality=80, optimize=True)
+
+    size = write_derivative(derived_dir, filename, produce)
+    return {'variant': 'thumbnail', 'filename': filename, 'mime_type': 'image/jpeg', 'size': size}
+
+
+def gps_degrees(value, ref):
+    degrees, minutes, seconds = (float(part) for part in value)
+    result = degrees + minutes / 60 + seconds / 3600
+    return -result if ref in ('S', 'W') else result
+
+
+def extract_gps(source):
+    """Latitude and longitude from the photo's EXIF GPS block; empty when it has none."""
+    with open_image(source) as image:
+        gps = image.getexif().get_ifd(EXIF_GPS_IFD)
+    try:
+        lat = gps_degrees(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF, 'N'))
+        lng = gps_degrees(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF, 'E'))
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return {}
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return {}
+    return {'latitude': round(lat, 6), 'longitude': round(lng, 6)}
+
+
+def transcode(source, digest, media_type, derived_dir, options):
+    """Small H.264/AAC copy of a video, or AAC copy of an audio clip, for slow connections."""
+    if FFMPEG is None:
+        raise PermanentJobError('ffmpeg is not installed')
+    if media_type == 'video':
+        filename, mime_type = f'{digest[:2]}/{digest}-low.mp4', 'video/mp4'
+        height = options['low_video_height']
+        codec_args = ['-vf', f"scale=-2:'min({height},ih)'", '-c:v', 'libx264', '-preset', 'veryfast',
+                      '-crf', '30', '-c:a', 'aac', '-b:a', '64k', '-movflags', '+faststart']
+    else:
+        filename, mime_type = f'{digest[:2]}/{digest}-low.m4a', 'audio/mp4'
+        codec_args = ['-vn', '-c:a', 'aac', '-b:a', options['low_audio_bitrate']]
+
+    def produce(tmp_path):
+        command = [FFMPEG, '-nostdin', '-y', '-loglevel', 'error', '-i', source,
+                   *codec_args, '-f', 'mp4', tmp_path]
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=TRANSCODE_TIMEOUT)
+        if completed.returncode != 0:
+            raise RuntimeError(f'ffmpeg exited with {completed.returncode}: {completed.stderr[-500:]}')
+
+    size = write_derivative(derived_dir, filename, produce)
+    return {'variant': 'low', 'filename': filename, 'mime_type': mime_type, 'size': size}
+
+
+def run_job(job, media_dir, options):
+    """Entry point in the pool processes; returns what complete_media_job() records."""
+    source = blob_path(media_dir, job['sha256'])
+    if not os.path.exists(source):
+        raise PermanentJobError('Blob is missing')
+    derived_dir = os.path.join(media_dir, 'derived')
+    if job['kind'] == 'thumbnail':
+        return make_thumbnail(source, job['sha256'], derived_dir, options)
+    if job['kind'] == 'exif_gps':
+        return extract_gps(source)
+    if job['kind'] == 'transcode':
+        return transcode(source, job['sha256'], job['media_type'], derived_dir, options)
+    raise PermanentJobError(f"Unknown job kind {job['kind']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process uploaded report media')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--poll', type=float, default=2.0, help='seconds between queue checks when idle')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    # Imported here so pool processes, which import this module, do not load the app
+    from app import (app, claim_media_jobs, complete_media_job, fail_media_job,
+                     media_worker_options, requeue_expired_media_jobs)
+
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    with app.app_context():
+        media_dir = app.config['MEDIA_DIR']
+        options = media_worker_options()
+        pool = ProcessPoolExecutor(max_workers=args.processes)
+        in_flight = {}
+        next_requeue = 0.0
+        log.info("Media worker started", extra={'worker_id': worker_id, 'processes': args.processes})
+        try:
+            while True:
+                if time.monotonic() >= next_requeue:
+                    requeued = requeue_expired_media_jobs()
+                    if requeued:
+                        log.warning("Requeued media jobs with expired leases", extra={'count': requeued})
+                    next_requeue = time.monotonic() + 60
+
+                idle = args.processes - len(in_flight)
+                if idle > 0:
+                    for job in claim_media_jobs(worker_id, idle):
+                        in_flight[pool.submit(run_job, job, media_dir, options)] = job
+                if not in_flight:
+                    if args.once:
+                        break
+                    time.sleep(args.poll)
+                    continue
+
+                done, _ = wait(in_flight, timeout=args.poll, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except PermanentJobError as e:
+                        fail_media_job(job, e, retryable=False)
+                        log.error("Media job failed permanently: %s", e,
+                                  extra={'job_id': job['id'], 'kind': job['kind']})
+                    except Exception as e:
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        status = fail_media_job(job, e)
+                        log.warning("Media job failed: %s", e,
+                                    extra={'job_id': job['id'], 'kind': job['kind'], 'job_status': status})
+                    else:
+                        complete_media_job(job, result)
+                if broken:
+                    # A crashed child poisons the whole pool; its jobs were requeued above
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=args.processes)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -142,15 +142,16 @@ async function handleApproval(card, isApproved, forecastType, retryCount = 0) {
             return;
         }
         
-        // Update trust scores on successful approval
-        if (isApproved && response.ok) {
-            const trustScores = card.querySelectorAll('.trust-score');
-            trustScores.forEach(score => {
-                const currentScore = parseInt(score.textContent.replace('Trust: ', ''));
-                const newScore = Math.min(100, currentScore + 2);
-                score.textContent = `Trust: ${newScore}%`;
-                score.setAttribute('aria-label', `Trust score: ${newScore}%`);
-            });
+        // Show the source's updated running aggregates
+        const result = await response.json();
+        card.querySelectorAll('.trust-score').forEach(score => {
+            score.textContent = `Trust: ${result.trust_score}%`;
+            score.dataset.score = result.trust_score;
+            score.setAttribute('aria-label', `Trust score: ${result.trust_score}%`);
+        });
+        const pendingCount = card.querySelector('.pending-count');
+        if (pendingCount) {
+            pendingCount.textContent = `${result.pending_count} pending`;
         }
     } catch (error) {
         // Silent error logging
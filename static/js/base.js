@@ -273,7 +273,10 @@ async function sendSOSMessage(message) {
 
         const data = await response.json();
         
-        if (response.ok) {
+        if (response.status === 202 && data.status === 'queued') {
+            // Stored by the service worker; it is sent automatically once back online
+            showNotification(data.message, 'warning');
+        } else if (response.ok) {
             showNotification('Emergency services have been notified', 'success');
         } else {
             throw new Error(data.error || 'Failed to send SOS');
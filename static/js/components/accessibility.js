@@ -1,12 +1,10 @@
 // Accessibility Component JavaScript
 
 // Initialize Web Speech API and Panel State
-let speechSynthesis = window.speechSynthesis;
-let speechRecognition = null;
-let isTextToSpeechEnabled = false;
+// speechSynthesis, speechRecognition, isTextToSpeechEnabled and
+// isAccessibilityPanelOpen are declared in base.js, which loads first
 let isSpeaking = false;
 let currentUtterance = null;
-let isAccessibilityPanelOpen = false;
 
 window.toggleAccessibilityPanel = function() {
     const panel = document.getElementById('accessibilityPanel');
@@ -72,31 +72,35 @@ function initializeUserActivityChart() {
     });
 }
 
-// Alert Distribution Chart
-function initializeAlertDistributionChart() {
+// SOS Distribution Chart: requests per region over the last 7 days, from the SOS rollups
+async function initializeAlertDistributionChart() {
     const ctx = document.getElementById('alertDistributionChart');
     if (!ctx) return;
 
+    let stats;
+    try {
+        const response = await fetch('/api/sos-stats?granularity=day&buckets=7&group_by=region', {
+            credentials: 'same-origin'
+        });
+        if (!response.ok) {
+            throw new Error(`SOS stats request failed: ${response.status}`);
+        }
+        stats = await response.json();
+    } catch (error) {
+        console.error('Admin Charts: Failed to load SOS stats', error);
+        return;
+    }
+
+    const colors = ['255, 99, 132', '54, 162, 235', '255, 206, 86', '75, 192, 192', '153, 102, 255'];
+    const regions = Object.keys(stats.totals).sort((a, b) => stats.totals[b] - stats.totals[a]);
     new Chart(ctx, {
         type: 'pie',
         data: {
-            labels: ['Natural Disasters', 'Medical Emergencies', 'Infrastructure Issues', 'Fire Hazards', 'Other'],
+            labels: regions.map(region => region === 'unknown' ? 'Unknown location' : region),
             datasets: [{
-                data: [35, 25, 20, 15, 5],
-                backgroundColor: [
-                    'rgba(255, 99, 132, 0.8)',
-                    'rgba(54, 162, 235, 0.8)',
-                    'rgba(255, 206, 86, 0.8)',
-                    'rgba(75, 192, 192, 0.8)',
-                    'rgba(153, 102, 255, 0.8)'
-                ],
-                borderColor: [
-                    'rgba(255, 99, 132, 1)',
-                    'rgba(54, 162, 235, 1)',
-                    'rgba(255, 206, 86, 1)',
-                    'rgba(75, 192, 192, 1)',
-                    'rgba(153, 102, 255, 1)'
-                ],
+                data: regions.map(region => stats.totals[region]),
+                backgroundColor: regions.map((_, i) => `rgba(${colors[i % colors.length]}, 0.8)`),
+                borderColor: regions.map((_, i) => `rgba(${colors[i % colors.length]}, 1)`),
                 borderWidth: 1
             }]
         },
@@ -113,7 +117,7 @@ function initializeAlertDistributionChart() {
                         label: function(context) {
                             const label = context.label || '';
                             const value = context.parsed || 0;
-                            return `${label}: ${value}%`;
+                            return `${label}: ${value} requests`;
                         }
                     }
                 }
@@ -122,31 +126,42 @@ function initializeAlertDistributionChart() {
     });
 }
 
-// Resource Allocation Chart
-function initializeResourceAllocationChart() {
+// Resource Allocation Chart: category totals from the cached resource summary
+async function initializeResourceAllocationChart() {
     const ctx = document.getElementById('resourceAllocationChart');
     if (!ctx) return;
 
+    let summary;
+    try {
+        const response = await fetch('/api/admin/resource-summary', { credentials: 'same-origin' });
+        if (!response.ok) {
+            throw new Error(`Resource summary request failed: ${response.status}`);
+        }
+        summary = (await response.json()).data;
+    } catch (error) {
+        console.error('Admin Charts: Failed to load resource summary', error);
+        return;
+    }
+
+    const categories = Object.keys(summary.category_labels);
     new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: ['Personnel', 'Vehicles', 'Equipment', 'Supplies', 'Medical'],
+            labels: categories.map(category => summary.category_labels[category]),
             datasets: [{
                 label: 'Resource Distribution',
-                data: [120, 45, 75, 60, 35],
+                data: categories.map(category => summary.categories[category]),
                 backgroundColor: [
                     'rgba(54, 162, 235, 0.8)',
                     'rgba(255, 99, 132, 0.8)',
                     'rgba(255, 206, 86, 0.8)',
-                    'rgba(75, 192, 192, 0.8)',
-                    'rgba(153, 102, 255, 0.8)'
+                    'rgba(75, 192, 192, 0.8)'
                 ],
                 borderColor: [
                     'rgba(54, 162, 235, 1)',
                     'rgba(255, 99, 132, 1)',
                     'rgba(255, 206, 86, 1)',
-                    'rgba(75, 192, 192, 1)',
-                    'rgba(153, 102, 255, 1)'
+                    'rgba(75, 192, 192, 1)'
                 ],
                 borderWidth: 1
             }]
@@ -45,6 +45,8 @@ function initPWA() {
         
         // Sync any pending data when back online
         syncPendingData();
+        replayQueuedSOS();
+        syncDistrictPack();
     });
 
     window.addEventListener('offline', () => {
@@ -228,12 +230,29 @@ function trackPWAInstallation() {
 function setupBackgroundSync() {
     if ('serviceWorker' in navigator && 'sync' in window.ServiceWorkerRegistration.prototype) {
         navigator.serviceWorker.ready.then(registration => {
-            // Register for background sync
-            return registration.sync.register('emergency-data-sync');
+            // Flushes any SOS alerts the service worker queued while offline
+            return registration.sync.register('sos-queue');
         }).catch(error => {
             console.warn('Background sync not supported:', error);
         });
     }
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.addEventListener('message', event => {
+            if (event.data && event.data.type === 'sos-queue-flushed') {
+                showNotification(`🚨 ${event.data.count} queued SOS alert(s) sent to rescue teams`, 'success');
+            }
+        });
+    }
+}
+
+// Browsers without Background Sync replay the SOS queue when the page comes back online
+function replayQueuedSOS() {
+    if ('serviceWorker' in navigator && !('sync' in window.ServiceWorkerRegistration.prototype)) {
+        navigator.serviceWorker.ready.then(registration => {
+            registration.active.postMessage({ type: 'replay-sos-queue' });
+        });
+    }
 }
 
 // Push notifications setup
@@ -313,11 +332,87 @@ function checkForAppUpdates() {
     }
 }
 
+// Offline district data packs: guidelines, facilities and helplines kept in localStorage.
+// Packs are public; rescue staff also keep their district's resource counts next to them.
+function getDistrictPack(slug) {
+    try {
+        const stored = localStorage.getItem(`data_pack_${slug || localStorage.getItem('data_pack_district')}`);
+        return stored ? JSON.parse(stored) : null;
+    } catch (error) {
+        console.warn('Failed to read district data pack:', error);
+        return null;
+    }
+}
+
+function applyPackDelta(pack, delta) {
+    const resources = new Map(pack.resources.map(item => [item.id, item]));
+    delta.remove.forEach(id => resources.delete(id));
+    delta.upsert.forEach(item => resources.set(item.id, item));
+    return {
+        ...pack,
+        ...delta.replace,
+        resources: [...resources.values()].sort((a, b) => a.id - b.id)
+    };
+}
+
+async function updateDistrictResources(slug) {
+    const response = await fetch(`/api/data-packs/${slug}/resources`, { redirect: 'manual' });
+    if (!response.ok) return;
+    localStorage.setItem(`data_pack_${slug}_resources`, JSON.stringify(await response.json()));
+}
+
+async function updateDistrictPack(district, withResources) {
+    const listResponse = await fetch('/api/data-packs');
+    if (!listResponse.ok || listResponse.redirected) return null;
+    const packs = (await listResponse.json()).data;
+    const wanted = district || localStorage.getItem('data_pack_district');
+    const meta = packs.find(p => p.district === wanted || p.slug === wanted) || packs[0];
+    if (!meta) return null;
+
+    if (withResources) {
+        updateDistrictResources(meta.slug).catch(error => {
+            console.warn('Failed to update district resource counts:', error);
+        });
+    }
+
+    let pack = getDistrictPack(meta.slug);
+    if (pack && pack.version === meta.version) return pack;
+
+    if (pack) {
+        // Only download what changed since the version we already hold
+        const deltaResponse = await fetch(`/api/data-packs/${meta.slug}/delta?since=${encodeURIComponent(pack.version)}`);
+        const result = deltaResponse.ok ? await deltaResponse.json() : null;
+        pack = result && result.changed && !result.full
+            ? { ...applyPackDelta(pack, result.delta), version: result.version }
+            : null;
+    }
+    if (!pack) {
+        const packResponse = await fetch(meta.url);
+        if (!packResponse.ok) return null;
+        pack = { ...(await packResponse.json()), version: meta.version };
+    }
+
+    localStorage.setItem(`data_pack_${meta.slug}`, JSON.stringify(pack));
+    localStorage.setItem('data_pack_district', meta.slug);
+    console.log(`📦 District data pack ${meta.district} at version ${meta.version}`);
+    return pack;
+}
+
+function syncDistrictPack(district, withResources) {
+    // Until a district is chosen on the resources page the first listed pack is kept; guidelines
+    // and helplines are the same in every pack
+    if (!navigator.onLine) return;
+    updateDistrictPack(district, withResources).catch(error => {
+        console.warn('Failed to update district data pack:', error);
+    });
+}
+
 // Initialize PWA features
 function initPWAFeatures() {
     initPWA();
     trackPWAPerformance();
     setupBackgroundSync();
+    syncDistrictPack();
     setupPushNotifications();
     checkForAppUpdates();
     
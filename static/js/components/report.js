@@ -13,12 +13,26 @@ document.addEventListener('DOMContentLoaded', () => {
     const location = document.getElementById('location');
     location.value = "Bardhaman";
 
-    // Media handling configuration
-    const MAX_FILE_SIZE = 50 * 1024 * 1024; // 50MB
+    // Exact coordinates let nearby reports be grouped into one crowdsourced forecast
+    if (navigator.geolocation) {
+        navigator.geolocation.getCurrentPosition(position => {
+            document.getElementById('latitude').value = position.coords.latitude.toFixed(5);
+            document.getElementById('longitude').value = position.coords.longitude.toFixed(5);
+        }, () => {
+            // The server geocodes the typed location instead
+        });
+    }
+
+    // Media handling configuration (limits come from the server, in bytes per media type)
+    const UPLOAD_LIMITS = window.mediaUploadLimits || {
+        photo: 5 * 1024 * 1024,
+        video: 50 * 1024 * 1024,
+        audio: 10 * 1024 * 1024
+    };
     const ACCEPTED_TYPES = {
-        'image/jpeg': 'image',
-        'image/png': 'image',
-        'image/gif': 'image',
+        'image/jpeg': 'photo',
+        'image/png': 'photo',
+        'image/gif': 'photo',
         'video/mp4': 'video',
         'video/webm': 'video',
         'video/quicktime': 'video',
@@ -26,6 +40,11 @@ document.addEventListener('DOMContentLoaded', () => {
         'audio/wav': 'audio',
         'audio/ogg': 'audio'
     };
+    const DEFAULT_CHUNK_SIZE = 256 * 1024;
+    const MAX_RETRIES = 8;
+    const mediaIds = document.getElementById('media_ids');
+    // preview item -> { file, id, promise, cancelled }
+    const uploads = new Map();
 
     // Initialize media container and file input
     const mediaContainer = document.querySelector('.media-container');
@@ -75,18 +94,19 @@ document.addEventListener('DOMContentLoaded', () => {
     // Handle multiple files
     function handleFiles(files) {
         const validFiles = files.filter(file => {
-            if (!ACCEPTED_TYPES[file.type]) {
+            const mediaType = ACCEPTED_TYPES[file.type];
+            if (!mediaType) {
                 showError('Invalid file type: ' + file.type);
                 return false;
             }
-            if (file.size > MAX_FILE_SIZE) {
-                showError(`File too large: ${file.name}. Maximum size is ${MAX_FILE_SIZE / 1024 / 1024}MB`);
+            if (file.size > UPLOAD_LIMITS[mediaType]) {
+                showError(`File too large: ${file.name}. Maximum ${mediaType} size is ${UPLOAD_LIMITS[mediaType] / 1024 / 1024}MB`);
                 return false;
             }
             return true;
         });
 
-        validFiles.forEach(addFilePreview);
+        validFiles.forEach(file => startUpload(addFilePreview(file), file));
     }
 
     // Create preview for a file
@@ -100,14 +120,163 @@ document.addEventListener('DOMContentLoaded', () => {
         filename.textContent = file.name.length > 20 ? file.name.substring(0, 17) + '...' : file.name;
         previewItem.appendChild(filename);
 
+        const progress = document.createElement('span');
+        progress.className = 'upload-progress';
+        previewItem.appendChild(progress);
+
         // Add remove button
         const removeBtn = document.createElement('span');
         removeBtn.className = 'remove-btn';
         removeBtn.innerHTML = '×';
-        removeBtn.addEventListener('click', () => previewItem.remove());
+        removeBtn.addEventListener('click', () => {
+            const upload = uploads.get(previewItem);
+            if (upload) {
+                upload.cancelled = true;
+                uploads.delete(previewItem);
+            }
+            previewItem.remove();
+        });
         previewItem.appendChild(removeBtn);
         
         mediaPreview.appendChild(previewItem);
+        return previewItem;
+    }
+
+    // Resumable uploads: the file goes up in small checksummed chunks. After a
+    // dropped connection only the current chunk is resent, and an upload id kept
+    // in localStorage lets a reloaded page carry on from the server's offset.
+    class UploadError extends Error {
+        constructor(message, retryable) {
+            super(message);
+            this.retryable = retryable;
+        }
+    }
+
+    function startUpload(previewItem, file) {
+        const upload = { file, id: null, cancelled: false };
+        const progress = previewItem.querySelector('.upload-progress');
+        upload.promise = uploadFile(upload, fraction => {
+            progress.textContent = ` ${Math.floor(fraction * 100)}%`;
+        }).then(id => {
+            upload.id = id;
+            progress.innerHTML = ' <i class="fas fa-check"></i>';
+        }).catch(error => {
+            if (!upload.cancelled) {
+                progress.innerHTML = ' <i class="fas fa-exclamation-circle"></i>';
+                showError(`Upload failed: ${file.name}. ${error.message}`);
+            }
+            throw error;
+        });
+        upload.promise.catch(() => {});
+        uploads.set(previewItem, upload);
+    }
+
+    function resumeKey(file) {
+        return `media_upload_${file.name}_${file.size}_${file.lastModified}`;
+    }
+
+    async function uploadFile(upload, onProgress) {
+        const file = upload.file;
+        const session = await withRetry(() => openUploadSession(file));
+        let offset = session.offset;
+        onProgress(offset / file.size);
+        while (offset < file.size) {
+            if (upload.cancelled) {
+                throw new UploadError('Upload cancelled', false);
+            }
+            const chunk = file.slice(offset, offset + session.chunkSize);
+            offset = await withRetry(() => sendChunk(session.id, chunk, offset));
+            onProgress(offset / file.size);
+        }
+        localStorage.removeItem(resumeKey(file));
+        return session.id;
+    }
+
+    async function openUploadSession(file) {
+        const savedId = localStorage.getItem(resumeKey(file));
+        if (savedId) {
+            // HEAD is never cached by the service worker, so this is the server's real offset
+            const response = await fetch(`/api/uploads/${savedId}`, { method: 'HEAD', cache: 'no-store' });
+            if (response.ok) {
+                return {
+                    id: savedId,
+                    offset: parseInt(response.headers.get('Upload-Offset'), 10) || 0,
+                    chunkSize: DEFAULT_CHUNK_SIZE
+                };
+            }
+            if (response.status >= 500) {
+                throw new UploadError('Server unavailable', true);
+            }
+            localStorage.removeItem(resumeKey(file));
+        }
+
+        const response = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, mime_type: file.type })
+        });
+        const result = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            throw new UploadError(result.message || 'Could not start upload',
+                response.status >= 500 || response.status === 429);
+        }
+        localStorage.setItem(resumeKey(file), result.data.id);
+        return { id: result.data.id, offset: 0, chunkSize: result.chunk_size || DEFAULT_CHUNK_SIZE };
+    }
+
+    async function sha256Hex(buffer) {
+        // SubtleCrypto only exists on secure origins; the chunk then goes without a checksum
+        if (!(window.crypto && crypto.subtle)) {
+            return null;
+        }
+        const digest = await crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    // Returns the server's offset after the chunk: past it on success, or where
+    // the server actually is when it reports a conflict
+    async function sendChunk(uploadId, chunk, offset) {
+        const body = await chunk.arrayBuffer();
+        const headers = {
+            'Content-Type': 'application/offset+octet-stream',
+            'Upload-Offset': String(offset)
+        };
+        const digest = await sha256Hex(body);
+        if (digest) {
+            headers['Upload-Checksum'] = `sha256 ${digest}`;
+        }
+
+        const response = await fetch(`/api/uploads/${uploadId}`, { method: 'PATCH', headers, body });
+        const result = await response.json().catch(() => ({}));
+        if (response.ok) {
+            return result.data.offset;
+        }
+        if (response.status === 409) {
+            return result.offset;
+        }
+        // Corrupted in transit (422), cut short (400 with an offset) or a server error: send it again
+        const retryable = response.status >= 500 || response.status === 422 ||
+            response.status === 429 || (response.status === 400 && result.offset !== undefined);
+        throw new UploadError(result.message || `Upload failed with status ${response.status}`, retryable);
+    }
+
+    async function withRetry(attempt) {
+        for (let tries = 1; ; tries++) {
+            try {
+                return await attempt();
+            } catch (error) {
+                // fetch() rejects with a TypeError when the connection drops
+                const retryable = error instanceof TypeError || error.retryable;
+                if (!retryable || tries >= MAX_RETRIES) {
+                    throw error;
+                }
+                if (!navigator.onLine) {
+                    await new Promise(resolve => window.addEventListener('online', resolve, { once: true }));
+                } else {
+                    await new Promise(resolve => setTimeout(resolve, Math.min(30000, 1000 * 2 ** tries)));
+                }
+            }
+        }
     }
 
     // Create remove button for preview
@@ -190,14 +359,29 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Form submission handler
-    form.addEventListener('submit', (e) => {
+    form.addEventListener('submit', async (e) => {
+        e.preventDefault();
         if (!validateForm()) {
-            e.preventDefault();
             return;
         }
 
         submitButton.disabled = true;
+        submitButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Uploading media...';
+        const pending = Array.from(uploads.entries());
+        const results = await Promise.allSettled(pending.map(([, upload]) => upload.promise));
+        const failed = pending.filter((_, index) => results[index].status === 'rejected');
+        if (failed.length) {
+            // Failed files restart (resuming where they stopped) on the next submit
+            failed.forEach(([previewItem, upload]) => startUpload(previewItem, upload.file));
+            showError('Some media could not be uploaded. Remove it or submit again to retry.');
+            submitButton.disabled = false;
+            submitButton.innerHTML = '<i class="fas fa-paper-plane"></i> Submit Report';
+            return;
+        }
+
+        mediaIds.value = pending.map(([, upload]) => upload.id).join(',');
         submitButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Submitting...';
+        form.submit();
     });
 
     // Initialize form state based on URL parameters
@@ -205,6 +389,7 @@ document.addEventListener('DOMContentLoaded', () => {
         showError('Report submitted successfully', 'success');
         form.reset();
         mediaPreview.innerHTML = '';
+        uploads.clear();
         
         const url = new URL(window.location);
         url.searchParams.delete('success');
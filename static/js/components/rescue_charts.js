@@ -6,26 +6,38 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeResponseTimeTrendsChart();
 });
 
-// Active Operations Status Chart (Doughnut)
-function initializeOperationsStatusChart() {
+// Active Operations Status Chart (Doughnut): SOS status mix over the last 7 days, from the rollups
+async function initializeOperationsStatusChart() {
     const ctx = document.getElementById('operationsStatusChart');
     if (!ctx) return;
 
+    let stats;
+    try {
+        const response = await fetch('/api/sos-stats?granularity=day&buckets=7&group_by=status', {
+            credentials: 'same-origin'
+        });
+        if (!response.ok) {
+            throw new Error(`SOS stats request failed: ${response.status}`);
+        }
+        stats = await response.json();
+    } catch (error) {
+        console.error('Rescue Charts: Failed to load SOS stats', error);
+        return;
+    }
+
     const data = {
-        labels: ['In Progress', 'Pending', 'Completed', 'Critical'],
+        labels: ['Pending', 'Handled', 'Closed'],
         datasets: [{
-            data: [35, 25, 30, 10],
+            data: [stats.totals.pending, stats.totals.handled, stats.totals.closed],
             backgroundColor: [
-                'rgba(54, 162, 235, 0.8)',  // Blue - In Progress
                 'rgba(255, 206, 86, 0.8)',  // Yellow - Pending
-                'rgba(75, 192, 192, 0.8)',  // Green - Completed
-                'rgba(255, 99, 132, 0.8)'   // Red - Critical
+                'rgba(54, 162, 235, 0.8)',  // Blue - Handled
+                'rgba(75, 192, 192, 0.8)'   // Green - Closed
             ],
             borderColor: [
-                'rgba(54, 162, 235, 1)',
                 'rgba(255, 206, 86, 1)',
-                'rgba(75, 192, 192, 1)',
-                'rgba(255, 99, 132, 1)'
+                'rgba(54, 162, 235, 1)',
+                'rgba(75, 192, 192, 1)'
             ],
             borderWidth: 1
         }]
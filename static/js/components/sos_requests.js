@@ -45,6 +45,53 @@ class SOSRequests {
         }
     }
 
+    async showNearestFacilities(id, cardElement) {
+        const container = cardElement.querySelector('.nearest-facilities');
+        if (!container.hidden) {
+            container.hidden = true;
+            return;
+        }
+
+        try {
+            const response = await fetch(`/api/sos-requests/${id}/nearest-facilities`);
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error || 'Failed to load nearest facilities');
+            }
+
+            const labels = { hospital: 'ICU Hospitals', ambulance: 'Ambulance', fire: 'Fire Station', police: 'Police' };
+            container.innerHTML = '';
+            Object.entries(result.data).forEach(([type, facilities]) => {
+                if (!facilities.length) return;
+                const heading = document.createElement('h4');
+                heading.textContent = labels[type] || type;
+                container.appendChild(heading);
+
+                const list = document.createElement('ul');
+                facilities.forEach(facility => {
+                    const phone = facility.contacts.find(c => ['phone', 'emergency', 'helpline'].includes(c.kind));
+                    const item = document.createElement('li');
+                    item.textContent = `${facility.name} · ${facility.distance_km} km`;
+                    if (phone) {
+                        const link = document.createElement('a');
+                        link.href = `tel:${phone.value.replace(/\s/g, '')}`;
+                        link.textContent = phone.value;
+                        item.append(' · ', link);
+                    }
+                    list.appendChild(item);
+                });
+                container.appendChild(list);
+            });
+            if (!container.children.length) {
+                container.textContent = 'No facilities found near this location';
+            }
+            container.hidden = false;
+        } catch (error) {
+            console.error('Error loading nearest facilities:', error);
+            alert(error.message);
+        }
+    }
+
     addNewRequest(request) {
         // Check if a card with this ID already exists
         if (document.querySelector(`.sos-card[data-id="${request.id}"]`)) {
@@ -78,10 +125,15 @@ class SOSRequests {
                     ${request.location}
                 </div>` : ''}
             </div>
+            <div class="nearest-facilities" hidden></div>
             <div class="sos-actions">
                 <button class="btn remove-btn" onclick="sosRequests.removeRequest('${request.id}', this.closest('.sos-card'))">
                     Mark as Handled
                 </button>
+                ${request.location ? `
+                <button class="btn secondary nearest-btn" onclick="sosRequests.showNearestFacilities('${request.id}', this.closest('.sos-card'))">
+                    <i class="fas fa-hospital"></i> Nearest Help
+                </button>` : ''}
             </div>
         `;
 
@@ -0,0 +1,231 @@
+// Generated by the /service-worker.js route from the asset build manifest.
+// A new asset build changes SW_CONFIG.version, which installs a fresh precache
+// and drops the caches of the previous version on activate.
+const SW_CONFIG = {{ sw_config|tojson }};
+
+const PRECACHE = `disastrous-precache-${SW_CONFIG.version}`;
+const PAGE_CACHE = `disastrous-pages-${SW_CONFIG.version}`;
+const API_CACHE = `disastrous-api-${SW_CONFIG.version}`;
+const STATIC_CACHE = `disastrous-static-${SW_CONFIG.version}`;
+const CURRENT_CACHES = [PRECACHE, PAGE_CACHE, API_CACHE, STATIC_CACHE];
+
+const SOS_QUEUE_DB = 'disastrous-sw';
+const SOS_QUEUE_STORE = 'sos-queue';
+
+// Install: precache the app shell and every fingerprinted asset
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(PRECACHE).then(cache => Promise.all([
+            cache.addAll(SW_CONFIG.precache),
+            // Third-party files are best effort: a CDN outage must not block install
+            ...SW_CONFIG.optionalPrecache.map(url => cache.add(url).catch(error => {
+                console.warn('Optional precache failed:', url, error);
+            }))
+        ])).then(() => self.skipWaiting())
+    );
+});
+
+// Activate: delete caches from earlier versions and replay queued SOS alerts
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys().then(cacheNames => Promise.all(
+            cacheNames
+                .filter(cacheName => !CURRENT_CACHES.includes(cacheName))
+                .map(cacheName => {
+                    console.log('Deleting old cache:', cacheName);
+                    return caches.delete(cacheName);
+                })
+        )).then(() => self.clients.claim())
+            .then(() => replaySOSQueue().catch(error => console.warn('SOS replay failed:', error)))
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    // Streams (SSE) and anything we cannot cache go straight to the network
+    if (request.headers.get('Accept') === 'text/event-stream' ||
+        SW_CONFIG.streamPaths.includes(url.pathname)) {
+        return;
+    }
+
+    if (url.origin !== self.location.origin) {
+        if (request.method === 'GET' && SW_CONFIG.optionalPrecache.includes(request.url)) {
+            event.respondWith(cacheFirst(request, PRECACHE));
+        }
+        return;
+    }
+
+    if (request.method === 'POST' && url.pathname === SW_CONFIG.sosPath) {
+        event.respondWith(sendOrQueueSOS(request));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    if (url.pathname === '/logout') {
+        // Rendered pages and API answers can belong to the signed-in user
+        event.waitUntil(Promise.all([caches.delete(PAGE_CACHE), caches.delete(API_CACHE)]));
+        return;
+    }
+    if (url.pathname.startsWith('/assets/')) {
+        event.respondWith(cacheFirst(request, PRECACHE));
+    } else if (url.pathname.startsWith('/api/')) {
+        event.respondWith(networkFirst(request, API_CACHE, SW_CONFIG.apiTimeoutMs));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(staleWhileRevalidate(request, STATIC_CACHE));
+    } else if (request.mode === 'navigate' || (request.headers.get('Accept') || '').includes('text/html')) {
+        // Signed-in pages (SOS lists, dashboards) must be current whenever the network answers;
+        // the cached copy is only an offline fallback
+        const strategy = SW_CONFIG.privatePaths.some(path => url.pathname.startsWith(path))
+            ? networkFirst(request, PAGE_CACHE, null)
+            : staleWhileRevalidate(request, PAGE_CACHE);
+        event.respondWith(strategy.catch(() => offlineFallback()));
+    }
+});
+
+// Caching strategies
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    const revalidate = fetch(request).then(response => {
+        // Only plain successful responses: redirects (e.g. to /login) are not cached
+        if (response.ok && !response.redirected) {
+            cache.put(request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        revalidate.catch(() => {});
+        return cached;
+    }
+    return revalidate;
+}
+
+// A null timeoutMs waits for the network and uses the cache only when the network fails
+async function networkFirst(request, cacheName, timeoutMs) {
+    const cache = await caches.open(cacheName);
+    const network = fetch(request).then(response => {
+        if (response.ok && !response.redirected) {
+            cache.put(request, response.clone());
+        }
+        return response;
+    });
+    try {
+        if (timeoutMs === null) {
+            return await network;
+        }
+        return await Promise.race([
+            network,
+            new Promise((_, reject) => setTimeout(() => reject(new Error('Network timeout')), timeoutMs))
+        ]);
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) {
+            network.catch(() => {});
+            return cached;
+        }
+        // Nothing cached: keep waiting on the slow network rather than failing early
+        return network;
+    }
+}
+
+async function offlineFallback() {
+    const cached = await caches.match('/');
+    return cached || new Response('You are offline', {
+        status: 503,
+        headers: { 'Content-Type': 'text/plain' }
+    });
+}
+
+// SOS queue: alerts sent while offline are stored in IndexedDB and replayed by Background Sync
+function openQueueDB() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(SOS_QUEUE_DB, 1);
+        open.onupgradeneeded = () => {
+            open.result.createObjectStore(SOS_QUEUE_STORE, { keyPath: 'id', autoIncrement: true });
+        };
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+function queueTransaction(mode, work) {
+    return openQueueDB().then(db => new Promise((resolve, reject) => {
+        const tx = db.transaction(SOS_QUEUE_STORE, mode);
+        const result = work(tx.objectStore(SOS_QUEUE_STORE));
+        tx.oncomplete = () => resolve(result.result);
+        tx.onerror = () => reject(tx.error);
+    }));
+}
+
+async function sendOrQueueSOS(request) {
+    const body = await request.clone().text();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        await queueTransaction('readwrite', store => store.add({
+            body: body,
+            contentType: request.headers.get('Content-Type') || 'application/json',
+            queuedAt: Date.now()
+        }));
+        if (self.registration.sync) {
+            await self.registration.sync.register(SW_CONFIG.sosSyncTag).catch(() => {});
+        }
+        return new Response(JSON.stringify({
+            status: 'queued',
+            message: 'You are offline. The SOS alert will be sent automatically when the connection returns.'
+        }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+    }
+}
+
+async function replaySOSQueue() {
+    const entries = await queueTransaction('readonly', store => store.getAll());
+    let sent = 0;
+    for (const entry of entries) {
+        const response = await fetch(SW_CONFIG.sosPath, {
+            method: 'POST',
+            headers: { 'Content-Type': entry.contentType },
+            body: entry.body,
+            credentials: 'same-origin'
+        });
+        // 4xx means the request itself is bad and retrying will not help
+        if (response.status >= 500 || response.status === 429) {
+            throw new Error(`SOS replay failed with status ${response.status}`);
+        }
+        await queueTransaction('readwrite', store => store.delete(entry.id));
+        sent += 1;
+    }
+    if (sent > 0) {
+        const clients = await self.clients.matchAll();
+        clients.forEach(client => client.postMessage({ type: 'sos-queue-flushed', count: sent }));
+    }
+}
+
+self.addEventListener('sync', event => {
+    if (event.tag === SW_CONFIG.sosSyncTag) {
+        event.waitUntil(replaySOSQueue());
+    }
+});
+
+// Browsers without Background Sync: the page asks for a replay when it comes back online
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'replay-sos-queue') {
+        event.waitUntil(replaySOSQueue().catch(error => console.warn('SOS replay failed:', error)));
+    }
+});
@@ -0,0 +1,161 @@
+"""Every route stays within its SQL query budget and does not grow with data.
+
+Usage: python -m pytest tests/test_query_budgets.py [-q]
+
+Works on a throwaway copy of instance/disastrous.db. Each route is requested
+cold: all data versions are bumped and the page, alert feed and resource
+summary caches are emptied before every request, so no cached answer hides
+its queries. Then SEED responders, SOS alerts and rescue requests are added
+through the real endpoints and every route is requested again. Event streams
+are opened and read up to their first heartbeat, which covers the replay sent
+at connect. A route fails when it goes over query_budget() or when its count
+rises with the extra data, which is how an N+1 loop shows up.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix='query-budgets-')
+if os.path.exists(os.path.join(ROOT, 'instance', 'disastrous.db')):
+    shutil.copy(os.path.join(ROOT, 'instance', 'disastrous.db'), os.path.join(WORKDIR, 'disastrous.db'))
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(WORKDIR, 'disastrous.db')}"
+os.environ['RUNTIME_DB_PATH'] = os.path.join(WORKDIR, 'runtime.db')
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+from app import (QueryCounter, SOSRequest, alert_feed_cache, app, bump_data_version,  # noqa: E402
+                 page_cache, query_budget, resource_summary_cache)
+
+DATASETS = ('facilities', 'alerts', 'forecasts', 'guidelines', 'rescue', 'resources')
+CACHES = (page_cache, alert_feed_cache, resource_summary_cache)
+SEED = 25
+
+# (role, method, path, json body); the endpoint name is read from the URL map
+ROUTES = [
+    (None, 'GET', '/', None),
+    (None, 'GET', '/forecasts', None),
+    (None, 'GET', '/alerts', None),
+    ('rescue', 'GET', '/resources', None),
+    (None, 'GET', '/guidelines', None),
+    (None, 'GET', '/health', None),
+    (None, 'GET', '/api/emergency-alerts', None),
+    ('rescue', 'GET', '/api/facilities', None),
+    ('rescue', 'GET', '/api/facilities/nearest?lat=23.25&lng=87.86&type=hospital', None),
+    (None, 'POST', '/api/sos', {'message': 'Water rising', 'location': 'Bardhaman'}),
+    (None, 'POST', '/rescue', {'emergency_type': 'flood', 'contact': '9999999999', 'city': 'Bardhaman',
+                               'state': 'West Bengal', 'pincode': '713104'}),
+    ('rescue', 'GET', '/rescue/sos-requests', None),
+    ('rescue', 'GET', '/rescue/profile', None),
+    ('rescue', 'GET', '/rescue-dashboard', None),
+    ('rescue', 'GET', '/api/rescue/assignments', None),
+    ('rescue', 'GET', '/api/sos-stats?granularity=hour&group_by=region', None),
+    ('rescue', 'POST', '/rescue/sos-requests/{sos_id}/status', {'status': 'handled'}),
+    ('admin', 'GET', '/admin-dashboard', None),
+    ('admin', 'GET', '/admin/rescue-management', None),
+    ('admin', 'GET', '/admin/forecasts', None),
+    ('admin', 'GET', '/api/admin/rescue-personnel', None),
+    ('admin', 'GET', '/api/admin/resource-summary', None),
+    ('admin', 'GET', '/api/admin/forecasts', None),
+]
+
+# (role, path) of event streams; the replay they send at connect is what gets counted
+STREAMS = [
+    (None, '/sse/sos-updates'),
+]
+
+LOGINS = {'admin': ('admin@disastrous.com', 'admin'), 'rescue': ('rescue@disastrous.com', 'rescue')}
+
+
+def endpoint_for(method, path):
+    return app.url_map.bind('localhost').match(path.split('?')[0].format(sos_id=1), method=method)[0]
+
+
+ENDPOINTS = [endpoint_for(method, path) for _, method, path, _ in ROUTES] + \
+            [endpoint_for('GET', path) for _, path in STREAMS]
+
+
+def clients():
+    result = {None: app.test_client()}
+    for role, (email, password) in LOGINS.items():
+        result[role] = app.test_client()
+        result[role].post('/authority-login', data={'email': email, 'password': password})
+    return result
+
+
+def latest_sos_id():
+    with app.app_context():
+        latest = SOSRequest.query.order_by(SOSRequest.id.desc()).first()
+        return latest.id if latest else 0
+
+
+def make_cold():
+    for name in DATASETS:
+        bump_data_version(name)
+    for cache in CACHES:
+        cache.invalidate()
+
+
+def measure(by_role):
+    counts = {}
+    for role, method, path, body in ROUTES:
+        # The alert posted just before, so both rounds update an equally fresh request
+        path = path.format(sos_id=latest_sos_id()) if '{sos_id}' in path else path
+        make_cold()
+        with QueryCounter() as counter:
+            response = by_role[role].open(path, method=method, json=body)
+        counts[endpoint_for(method, path)] = (response.status_code, counter.count)
+    for role, path in STREAMS:
+        make_cold()
+        with QueryCounter() as counter:
+            response = by_role[role].get(path, buffered=False)
+            for chunk in response.response:
+                if b'"heartbeat"' in (chunk if isinstance(chunk, bytes) else chunk.encode()):
+                    break
+            response.close()
+        counts[endpoint_for('GET', path)] = (response.status_code, counter.count)
+    return counts
+
+
+def seed(by_role, n):
+    for i in range(n):
+        by_role[None].post('/authority-register', data={
+            'email': f'budget-check-{i}@example.com', 'password': 'x', 'city': 'Bardhaman',
+            'state': 'West Bengal', 'pincode': f'713{i % 1000:03d}'})
+        by_role[None].post('/api/sos', json={'message': f'Alert {i}', 'location': 'Bardhaman'})
+        # Spread over the new responders: a full responder makes dispatch try wider tiers,
+        # which is bounded extra work rather than a per-row loop
+        by_role[None].post('/rescue', json={'emergency_type': 'flood', 'contact': '9999999999',
+                                            'city': 'Bardhaman', 'state': 'West Bengal',
+                                            'pincode': f'713{i % 1000:03d}'})
+
+
+@pytest.fixture(scope='module')
+def counts():
+    """(before, after) {endpoint: (status, queries)} around seeding SEED rows of each kind."""
+    try:
+        by_role = clients()
+        before = measure(by_role)
+        seed(by_role, SEED)
+        yield before, measure(by_role)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_within_budget(counts, endpoint):
+    status, queries = counts[1][endpoint]
+    assert status < 400, f'{endpoint} answered {status}'
+    assert queries <= query_budget(endpoint), \
+        f'{endpoint}: {queries} queries, budget {query_budget(endpoint)}'
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_does_not_grow_with_data(counts, endpoint):
+    (_, before), (_, after) = counts[0][endpoint], counts[1][endpoint]
+    assert after <= before, f'{endpoint}: {before} -> {after} queries after adding {SEED} rows (N+1?)'